@@ -0,0 +1,57 @@
+"""Benchmark HTTP client settings against the local fake API server.
+
+Runs the same concurrent generation with a single pooled connection, with keep-alive
+disabled (a new connection per call), and with the pool sized to the concurrency, and
+reports throughput and connections opened for each.
+
+Run with: python -m benchmarks.bench_http [endpoint_count] [concurrency] [latency_seconds]
+"""
+import contextlib
+import io
+import sys
+import time
+
+from src import generator
+from src.fakeapi import FakeAPIConfig, FakeAPIServer, Latency
+from src.models import APIEndpoint, APISpec, HTTPMethod
+
+_MODEL = "claude-sonnet-4-6"
+
+
+def _spec(count: int) -> APISpec:
+    endpoints = [APIEndpoint(path=f"/items/{n}", method=HTTPMethod.GET) for n in range(count)]
+    return APISpec(title="Bench", version="1", endpoints=endpoints)
+
+
+def _run(label: str, spec: APISpec, concurrency: int, latency: float, **client_options) -> None:
+    """Generate docs for spec against a fresh fake server and print requests/sec."""
+    config = FakeAPIConfig(latency=Latency("fixed", latency), output_tokens=200)
+    with FakeAPIServer(config) as server:
+        generator.configure_client(base_url=server.base_url, **client_options)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator.generate_full_docs(spec, _MODEL, stream=False, concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        generator.client.close()
+        connections = server.stats["connections"]
+    rate = len(spec.endpoints) / elapsed
+    print(
+        f"  {label:<28} {elapsed * 1000:>9.1f} ms {rate:>9.1f} req/s "
+        f"{connections:>6} connections"
+    )
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.02
+    spec = _spec(count)
+    print(f"{count} calls at concurrency {concurrency}, {latency * 1000:.0f} ms server latency")
+    _run("pool 1", spec, concurrency, latency, pool_size=1)
+    _run(f"pool {concurrency}, no keep-alive", spec, concurrency, latency,
+         pool_size=concurrency, keepalive_expiry=0)
+    _run(f"pool {concurrency}, keep-alive", spec, concurrency, latency, pool_size=concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""End-to-end benchmark suite on seeded synthetic OpenAPI specs.
+
+Times parsing (YAML and JSON), $ref resolution, prompt construction, Markdown/HTML
+formatting and a full generate-and-format run against an instant fake API client, then
+compares medians with a stored baseline.
+
+Run with: python -m benchmarks.run [--endpoints N] [--rounds N] [--save] [--threshold 0.25]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from types import SimpleNamespace
+from typing import Any
+
+from benchmarks.synthetic import generate_spec, write_spec
+from src import formatter, generator, parser, prompts
+from src.models import GeneratedDoc, GenerationResult
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+_MODEL = "claude-sonnet-4-6"
+_CANNED_DOC = """## Example
+
+Fetches the resource.
+
+| Name | In | Type |
+|------|----|------|
+| id | path | string |
+
+```bash
+curl https://api.example.com/v1/items/42
+```
+"""
+
+
+class _FakeClient:
+    """Anthropic client stand-in whose messages.create answers instantly with a canned doc."""
+
+    def __init__(self) -> None:
+        self.messages = SimpleNamespace(create=self._create)
+
+    @staticmethod
+    def _create(**kwargs: Any) -> SimpleNamespace:
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=_CANNED_DOC)],
+            usage=SimpleNamespace(input_tokens=400, output_tokens=120),
+            stop_reason="end_turn",
+        )
+
+
+def measure(fn: Callable[[], Any], rounds: int) -> dict[str, float]:
+    """Run fn once to warm up, then rounds times; return min/median/mean/stddev in seconds."""
+    fn()
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "stddev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "rounds": rounds,
+    }
+
+
+def _run_pipeline(spec_path: str) -> None:
+    """Parse, generate against the fake client and format, with progress output discarded."""
+    previous = generator.client
+    generator.client = _FakeClient()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            spec = parser.parse_spec(spec_path)
+            result = generator.generate_full_docs(spec, _MODEL, stream=False)
+            formatter.format_markdown(result, "Overview.")
+    finally:
+        generator.client = previous
+
+
+def build_cases(params: dict[str, int], workdir: str) -> dict[str, Callable[[], Any]]:
+    """Write the synthetic spec to workdir and return the benchmark cases by name."""
+    spec = generate_spec(**params)
+    yaml_path = os.path.join(workdir, "spec.yaml")
+    json_path = os.path.join(workdir, "spec.json")
+    write_spec(spec, yaml_path)
+    write_spec(spec, json_path)
+    raw = parser._load_file(json_path)
+    parsed = parser.parse_spec(json_path)
+    docs = [
+        GeneratedDoc(
+            endpoint_ref=f"{ep.method.value} {ep.path}", markdown=_CANNED_DOC,
+            tokens_used=520, model=_MODEL,
+        )
+        for ep in parsed.endpoints
+    ]
+    result = GenerationResult(
+        api_title=parsed.title, api_version=parsed.version, docs=docs,
+        total_tokens=520 * len(docs), total_cost_usd=0.0, model=_MODEL,
+    )
+    return {
+        "parse_spec[yaml]": lambda: parser.parse_spec(yaml_path),
+        "parse_spec[json]": lambda: parser.parse_spec(json_path),
+        "resolve_refs": lambda: parser._resolve_refs(raw),
+        "build_endpoint_prompt": lambda: [
+            prompts.build_endpoint_prompt(ep) for ep in parsed.endpoints
+        ],
+        "format_markdown": lambda: formatter.format_markdown(result, "Overview."),
+        "format_html": lambda: formatter.format_html(result, "Overview."),
+        "pipeline[fake client]": lambda: _run_pipeline(json_path),
+    }
+
+
+def compare(
+    results: dict[str, dict[str, float]], baseline: dict[str, Any], threshold: float
+) -> list[str]:
+    """Return the cases whose median is more than threshold slower than the baseline's."""
+    regressions = []
+    for name, stats in results.items():
+        base = baseline["results"].get(name)
+        if base is not None and stats["median"] > base["median"] * (1 + threshold):
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--endpoints", type=int, default=500)
+    p.add_argument("--schema-depth", type=int, default=3)
+    p.add_argument("--ref-fanout", type=int, default=3)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--rounds", type=int, default=5)
+    p.add_argument("--only", action="append", metavar="CASE", help="Run only matching cases")
+    p.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    p.add_argument("--save", action="store_true", help="Store these results as the baseline")
+    p.add_argument(
+        "--threshold", type=float, default=0.25,
+        help="Fail if a median is this fraction slower than the baseline (default: 0.25)",
+    )
+    args = p.parse_args(argv)
+
+    params = {
+        "endpoints": args.endpoints,
+        "schema_depth": args.schema_depth,
+        "ref_fanout": args.ref_fanout,
+        "seed": args.seed,
+    }
+    baseline = None
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["params"] != params:
+            print(f"Baseline {args.baseline} was recorded with {baseline['params']}; not comparing")
+            baseline = None
+
+    print(
+        f"Synthetic spec: {args.endpoints:,} endpoints, schema depth {args.schema_depth}, "
+        f"$ref fan-out {args.ref_fanout}, seed {args.seed}; {args.rounds} rounds"
+    )
+    print(f"  {'case':<24} {'min ms':>9} {'median ms':>10} {'stddev':>8} {'baseline':>10}")
+    results: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, fn in build_cases(params, workdir).items():
+            if args.only and not any(pattern in name for pattern in args.only):
+                continue
+            stats = results[name] = measure(fn, args.rounds)
+            change = ""
+            if baseline is not None and name in baseline["results"]:
+                change = f"{stats['median'] / baseline['results'][name]['median'] - 1:+.1%}"
+            print(
+                f"  {name:<24} {stats['min'] * 1000:>9.1f} {stats['median'] * 1000:>10.1f} "
+                f"{stats['stddev'] * 1000:>8.1f} {change:>10}"
+            )
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {"params": params, "python": platform.python_version(), "results": results},
+                f, indent=2,
+            )
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"Regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Seeded synthetic OpenAPI specs for benchmarks.
+
+The same parameters and seed always produce the same spec, so timings are comparable
+across runs and machines.
+"""
+import json
+import random
+from typing import Any
+
+import yaml
+
+_METHODS = ["get", "post", "put", "patch", "delete"]
+_FIELD_TYPES = ["string", "integer", "number", "boolean"]
+_WORDS = [
+    "account", "order", "invoice", "member", "reward", "store", "payment", "address",
+    "shipment", "product", "coupon", "review", "ticket", "session", "report", "webhook",
+]
+
+
+def _schema(rng: random.Random, depth: int, width: int) -> dict[str, Any]:
+    """Return an object schema nested depth levels deep with width fields per level."""
+    properties: dict[str, Any] = {}
+    for n in range(width):
+        name = f"{rng.choice(_WORDS)}_{n}"
+        if depth > 0 and n == 0:
+            properties[name] = _schema(rng, depth - 1, width)
+        elif n % 5 == 4:
+            properties[name] = {"type": "array", "items": {"type": rng.choice(_FIELD_TYPES)}}
+        else:
+            properties[name] = {"type": rng.choice(_FIELD_TYPES)}
+    return {"type": "object", "properties": properties}
+
+
+def generate_spec(
+    endpoints: int = 100,
+    schema_depth: int = 3,
+    ref_fanout: int = 3,
+    schema_count: int = 20,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """Return an OpenAPI 3 spec dict.
+
+    Each operation references ref_fanout component schemas via $ref (request body, response
+    and a wrapper schema whose properties are themselves $refs), and every component schema
+    is nested schema_depth levels deep.
+    """
+    rng = random.Random(seed)
+    schemas = {
+        f"Model{n}": _schema(rng, schema_depth, width=6) for n in range(schema_count)
+    }
+    paths: dict[str, Any] = {}
+    for n in range(endpoints):
+        resource = f"{_WORDS[n % len(_WORDS)]}s{n // len(_WORDS)}"
+        path = f"/v1/{resource}/{{id}}" if n % 3 else f"/v1/{resource}"
+        method = _METHODS[n % len(_METHODS)]
+        refs = [
+            {"$ref": f"#/components/schemas/Model{rng.randrange(schema_count)}"}
+            for _ in range(max(ref_fanout, 1))
+        ]
+        wrapper = {"type": "object", "properties": {f"part{i}": ref for i, ref in enumerate(refs)}}
+        parameters = [
+            {
+                "name": "limit", "in": "query", "required": False,
+                "description": "Maximum number of items to return",
+                "schema": {"type": "integer"},
+            },
+            {
+                "name": "status", "in": "query", "required": False,
+                "schema": {"type": "string", "enum": [f"status_{i}" for i in range(12)]},
+            },
+        ]
+        if "{id}" in path:
+            parameters.insert(0, {
+                "name": "id", "in": "path", "required": True, "schema": {"type": "string"},
+            })
+        operation: dict[str, Any] = {
+            "operationId": f"{method}{resource.title()}{n}",
+            "summary": f"{method.upper()} {resource}",
+            "description": f"Operation {n} on {resource}.",
+            "tags": [_WORDS[n % len(_WORDS)]],
+            "parameters": parameters,
+            "responses": {
+                "200": {
+                    "description": "OK",
+                    "content": {"application/json": {"schema": wrapper}},
+                },
+                "404": {"description": "Not found"},
+            },
+        }
+        if method in {"post", "put", "patch"}:
+            operation["requestBody"] = {
+                "required": True,
+                "content": {"application/json": {"schema": refs[0]}},
+            }
+        paths.setdefault(path, {})[method] = operation
+    return {
+        "openapi": "3.0.3",
+        "info": {"title": "Synthetic API", "version": "1.0.0", "description": "Benchmark spec."},
+        "servers": [{"url": "https://api.example.com"}],
+        "paths": paths,
+        "components": {"schemas": schemas},
+    }
+
+
+def write_spec(spec: dict[str, Any], path: str) -> None:
+    """Write a spec as YAML or JSON, chosen by the file extension."""
+    with open(path, "w", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            json.dump(spec, f)
+        else:
+            yaml.safe_dump(spec, f, sort_keys=False)
@@ -0,0 +1,386 @@
+"""Async documentation generation on AsyncAnthropic, for embedding in asyncio services.
+
+Mirrors the blocking functions in src.generator: agenerate_endpoint_doc, agenerate_overview
+and agenerate_full_docs return the same GeneratedDoc and GenerationResult models, and
+aiter_endpoint_docs yields the same DocEvents as iter_endpoint_docs. Retry and continuation
+decisions are the generator's own. Nothing is printed: progress is reported through the
+on_doc and on_text callbacks or by iterating, and retry messages go to the module logger.
+Backoff uses asyncio.sleep, and cancelling the awaiting task cancels every call in flight.
+Budgets, batching, deduplication and hedging are only available in the blocking API.
+"""
+import asyncio
+import contextlib
+import inspect
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+import anthropic
+
+from src import calls, prompts
+from src.generator import DocCache, OutputCapPredictor
+from src.routing import ModelRouter
+from src.models import (
+    APIEndpoint,
+    APISpec,
+    DocEvent,
+    GeneratedDoc,
+    GenerationResult,
+    ModelUsage,
+)
+from src.telemetry import RequestStats, RunRecorder
+
+logger = logging.getLogger(__name__)
+
+client: anthropic.AsyncAnthropic | None = None
+
+
+def configure_client(
+    base_url: str | None = None,
+    pool_size: int | None = None,
+    keepalive_expiry: float | None = None,
+    http2: bool = False,
+    connect_timeout: float | None = None,
+    read_timeout: float | None = None,
+) -> anthropic.AsyncAnthropic:
+    """Create the shared AsyncAnthropic client; options are as for generator.configure_client.
+
+    Kept-alive connections belong to the event loop that opened them, so configure the
+    client again when starting a new loop (e.g. a second asyncio.run).
+    """
+    global client
+    pool_limits, timeout = calls.http_settings(
+        pool_size, keepalive_expiry, connect_timeout, read_timeout
+    )
+    try:
+        http_client = anthropic.DefaultAsyncHttpxClient(limits=pool_limits, http2=http2)
+    except ImportError as exc:
+        raise RuntimeError(f"HTTP/2 is unavailable: {exc}") from exc
+    client = anthropic.AsyncAnthropic(base_url=base_url, timeout=timeout, http_client=http_client)
+    return client
+
+
+def _get_client() -> anthropic.AsyncAnthropic:
+    """Return the shared AsyncAnthropic client, creating it on first use."""
+    if client is None:
+        return configure_client()
+    return client
+
+
+async def _call_api(
+    messages: list[dict],
+    model: str,
+    stream: bool,
+    max_tokens: int = calls.MAX_TOKENS,
+    on_text: Callable[[str], None] | None = None,
+    stats: RequestStats | None = None,
+) -> tuple[str, int, int, str | None]:
+    """Make a single API call. Returns (text, input_tokens, output_tokens, stop_reason)."""
+    if stream:
+        async with _get_client().messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            system=prompts.SYSTEM_PROMPT,
+            messages=messages,
+        ) as stream_ctx:
+            async for text in stream_ctx.text_stream:
+                if stats is not None:
+                    stats.mark_first_token()
+                if on_text is not None:
+                    on_text(text)
+            final = await stream_ctx.get_final_message()
+        response = final
+    else:
+        response = await _get_client().messages.create(
+            model=model,
+            max_tokens=max_tokens,
+            system=prompts.SYSTEM_PROMPT,
+            messages=messages,
+        )
+    if stats is not None:
+        stats.add_cache_usage(response.usage)
+    return (
+        response.content[0].text,
+        response.usage.input_tokens,
+        response.usage.output_tokens,
+        response.stop_reason,
+    )
+
+
+async def _call_with_retry(
+    messages: list[dict],
+    model: str,
+    stream: bool,
+    max_tokens: int = calls.MAX_TOKENS,
+    on_text: Callable[[str], None] | None = None,
+    stats: RequestStats | None = None,
+) -> tuple[str, int, int, str | None]:
+    """Call _call_api, retrying rate limits and server errors as generator._call_with_retry."""
+    retry = calls.RetryState()
+    while True:
+        try:
+            return await _call_api(messages, model, stream, max_tokens, on_text, stats)
+        except anthropic.APIStatusError as e:
+            delay, notice = retry.next_delay(e, stats)
+        logger.info(notice)
+        await asyncio.sleep(delay)
+
+
+async def _complete(
+    messages: list[dict],
+    model: str,
+    stream: bool,
+    max_tokens: int = calls.MAX_TOKENS,
+    on_text: Callable[[str], None] | None = None,
+    stats: RequestStats | None = None,
+    usage: dict[str, ModelUsage] | None = None,
+) -> tuple[str, int, int, bool]:
+    """Call the API and continue a response that stops on max_tokens, as generator._complete.
+
+    With a usage table, every call is recorded in it as it returns.
+    """
+    first = await _call_with_retry(messages, model, stream, max_tokens, on_text, stats)
+    if usage is not None:
+        calls.record_usage(usage, model, first[1], first[2])
+    response = calls.Continuation(messages, first)
+    while response.pending:
+        more = await _call_with_retry(
+            response.followup(), model, stream, max_tokens, on_text, stats
+        )
+        if usage is not None:
+            calls.record_usage(usage, model, more[1], more[2])
+        response.add(more)
+    return response.result()
+
+
+async def _generate_doc(
+    endpoint: APIEndpoint,
+    model: str,
+    prompt: str,
+    max_tokens: int,
+    stream: bool,
+    on_text: Callable[[str], None] | None,
+    recorder: RunRecorder | None,
+    usage: dict[str, ModelUsage] | None = None,
+) -> GeneratedDoc:
+    """Generate one endpoint's doc from its prompt, recording the request and usage if asked."""
+    endpoint_ref = calls.endpoint_ref(endpoint)
+    stats = RequestStats(endpoint_ref, model)
+    messages = [{"role": "user", "content": prompt}]
+    try:
+        markdown, stats.input_tokens, stats.output_tokens, complete = await _complete(
+            messages, model, stream, max_tokens, on_text, stats, usage
+        )
+    except BaseException as e:
+        stats.stop("cancelled" if isinstance(e, asyncio.CancelledError) else "error", e)
+        raise
+    else:
+        stats.stop("ok" if complete else "truncated")
+        if not complete:
+            logger.warning("%s is still cut off after continuation", endpoint_ref)
+    finally:
+        if recorder is not None:
+            recorder.record(stats)
+    return GeneratedDoc(
+        endpoint_ref=endpoint_ref,
+        markdown=markdown,
+        tokens_used=stats.input_tokens + stats.output_tokens,
+        model=model,
+        output_tokens=stats.output_tokens,
+    )
+
+
+async def agenerate_endpoint_doc(
+    endpoint: APIEndpoint,
+    model: str,
+    stream: bool = False,
+    on_text: Callable[[str], None] | None = None,
+) -> GeneratedDoc:
+    """Generate documentation for a single endpoint; streamed text is passed to on_text."""
+    return await _generate_doc(
+        endpoint,
+        model,
+        prompts.build_endpoint_prompt(endpoint),
+        OutputCapPredictor().predict(endpoint, model),
+        stream,
+        on_text,
+        None,
+    )
+
+
+async def agenerate_overview(
+    spec: APISpec,
+    model: str,
+    recorder: RunRecorder | None = None,
+    doc_cache: DocCache | None = None,
+) -> str:
+    """Generate an API overview/introduction section, reusing a cached one if given."""
+    prompt = prompts.build_overview_prompt(spec)
+    if doc_cache is not None:
+        cached = doc_cache.get(model, prompt)
+        if cached is not None:
+            return cached.markdown
+    stats = RequestStats("overview", model, endpoints=0)
+    try:
+        text, stats.input_tokens, stats.output_tokens, _ = await _complete(
+            [{"role": "user", "content": prompt}], model, False, stats=stats
+        )
+    except BaseException as e:
+        stats.stop("cancelled" if isinstance(e, asyncio.CancelledError) else "error", e)
+        raise
+    else:
+        stats.stop()
+    finally:
+        if recorder is not None:
+            recorder.record(stats)
+    if doc_cache is not None:
+        doc_cache.put(
+            model,
+            prompt,
+            GeneratedDoc(
+                endpoint_ref="overview",
+                markdown=text,
+                tokens_used=stats.input_tokens + stats.output_tokens,
+                model=model,
+                output_tokens=stats.output_tokens,
+            ),
+        )
+    return text
+
+
+async def aiter_endpoint_docs(
+    spec: APISpec,
+    model: str,
+    stream: bool = False,
+    router: ModelRouter | None = None,
+    output_caps: OutputCapPredictor | None = None,
+    concurrency: int = 4,
+    doc_cache: DocCache | None = None,
+    recorder: RunRecorder | None = None,
+    on_text: Callable[[str, str], None] | None = None,
+) -> AsyncIterator[DocEvent]:
+    """Yield a DocEvent as each endpoint settles; the async counterpart of iter_endpoint_docs.
+
+    Up to concurrency calls run at once. Cached docs (model and prompt unchanged) are
+    yielded first without a call. An endpoint whose call fails is logged and yielded with
+    no doc; an authentication failure raises RuntimeError. Closing the iterator early, or
+    cancelling the task iterating it, cancels the calls still in flight; use
+    contextlib.aclosing when breaking out of the loop. Streamed text is passed to
+    on_text(endpoint_ref, text). Raises ValueError if concurrency is below 1.
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1, not {concurrency}")
+    endpoints = spec.endpoints
+    total = len(endpoints)
+    models = [router.route(ep, model) if router is not None else model for ep in endpoints]
+    endpoint_prompts = [prompts.build_endpoint_prompt(ep) for ep in endpoints]
+    if output_caps is None:
+        output_caps = OutputCapPredictor()
+    usage: dict[str, ModelUsage] = {}
+    completed = 0
+
+    def settle(i: int, doc: GeneratedDoc | None) -> DocEvent:
+        nonlocal completed
+        completed += 1
+        if doc is not None:
+            # Tokens are recorded per call as they return, so continuations and failed
+            # calls are counted like the sync generator; here only the doc is.
+            calls.record_usage(usage, doc.model, 0, 0).docs += 1
+        return DocEvent(
+            index=i,
+            endpoint_ref=calls.endpoint_ref(endpoints[i]),
+            doc=doc,
+            completed=completed,
+            total=total,
+            model_usage=calls.snapshot_usage(usage),
+        )
+
+    todo = []
+    for i, (ep, ep_model, prompt) in enumerate(zip(endpoints, models, endpoint_prompts)):
+        cached = doc_cache.get(ep_model, prompt) if doc_cache is not None else None
+        if cached is not None:
+            yield settle(i, cached.model_copy(update={"tokens_used": 0, "output_tokens": 0}))
+        else:
+            todo.append(i)
+
+    results: asyncio.Queue[tuple[int, GeneratedDoc | BaseException | None]] = asyncio.Queue()
+    pending = iter(todo)
+
+    async def worker() -> None:
+        for i in pending:
+            ref = calls.endpoint_ref(endpoints[i])
+            text_sink = None
+            if on_text is not None:
+                text_sink = lambda text, ref=ref: on_text(ref, text)  # noqa: E731
+            try:
+                doc = await _generate_doc(
+                    endpoints[i], models[i], endpoint_prompts[i],
+                    output_caps.predict(endpoints[i], models[i]), stream, text_sink, recorder,
+                    usage,
+                )
+            except RuntimeError as e:
+                await results.put((i, e))
+                return
+            except Exception as e:
+                logger.warning("Skipping %s: %s", ref, e)
+                doc = None
+            else:
+                if doc_cache is not None:
+                    doc_cache.put(models[i], endpoint_prompts[i], doc)
+            await results.put((i, doc))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(todo)))]
+    try:
+        for _ in range(len(todo)):
+            i, outcome = await results.get()
+            if isinstance(outcome, BaseException):
+                raise outcome
+            yield settle(i, outcome)
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def agenerate_full_docs(
+    spec: APISpec,
+    model: str,
+    stream: bool = False,
+    router: ModelRouter | None = None,
+    output_caps: OutputCapPredictor | None = None,
+    concurrency: int = 4,
+    doc_cache: DocCache | None = None,
+    recorder: RunRecorder | None = None,
+    on_doc: Callable[[int, GeneratedDoc], Awaitable[None] | None] | None = None,
+    on_text: Callable[[str, str], None] | None = None,
+) -> GenerationResult:
+    """Generate docs for every endpoint; the async counterpart of generate_full_docs.
+
+    on_doc(index, doc) is called (and awaited, if it is a coroutine function) as each doc
+    finishes. Docs in the result are in spec order; per-model usage and cost are totalled
+    from the docs, so cached docs cost nothing.
+    """
+    docs: dict[int, GeneratedDoc] = {}
+    usage: dict[str, ModelUsage] = {}
+    async with contextlib.aclosing(
+        aiter_endpoint_docs(
+            spec, model, stream, router, output_caps, concurrency, doc_cache, recorder, on_text
+        )
+    ) as events:
+        async for event in events:
+            usage = event.model_usage
+            if event.doc is None:
+                continue
+            docs[event.index] = event.doc
+            if on_doc is not None:
+                outcome = on_doc(event.index, event.doc)
+                if inspect.isawaitable(outcome):
+                    await outcome
+    return GenerationResult(
+        api_title=spec.title,
+        api_version=spec.version,
+        docs=[docs[i] for i in sorted(docs)],
+        total_tokens=sum(u.input_tokens + u.output_tokens for u in usage.values()),
+        total_cost_usd=sum(u.cost_usd for u in usage.values()),
+        model=model,
+        model_usage=usage,
+    )
@@ -0,0 +1,143 @@
+"""API-call helpers shared by the blocking (src.generator) and async (src.agenerator) paths.
+
+Each path makes its calls its own way (threads and time.sleep, or asyncio); the decisions
+about retrying, continuing a cut-off response and totalling usage live here so the two
+stay in step.
+"""
+import threading
+from typing import Any
+
+import anthropic
+
+from src import utils
+from src.models import APIEndpoint, ModelUsage
+from src.telemetry import RequestStats
+
+RETRY_DELAYS = [2, 4, 8]
+MAX_TOKENS = 4096
+MAX_CONTINUATIONS = 2
+
+
+def http_settings(
+    pool_size: int | None,
+    keepalive_expiry: float | None,
+    connect_timeout: float | None,
+    read_timeout: float | None,
+) -> tuple[Any, anthropic.Timeout]:
+    """Return the SDK connection limits and timeout for configure_client's options."""
+    limits = anthropic.DEFAULT_CONNECTION_LIMITS
+    timeout = anthropic.DEFAULT_TIMEOUT
+    if keepalive_expiry is None:
+        keepalive_expiry = limits.keepalive_expiry
+    # Built from the SDK's own Limits class: it may bundle a different httpx than ours.
+    pool_limits = type(limits)(
+        max_connections=pool_size or limits.max_connections,
+        max_keepalive_connections=pool_size or limits.max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    return pool_limits, anthropic.Timeout(
+        timeout.read if read_timeout is None else read_timeout,
+        connect=timeout.connect if connect_timeout is None else connect_timeout,
+    )
+
+
+class RetryState:
+    """Retry decisions for one call, shared by the blocking and async call paths.
+
+    Rate limits are retried after each of RETRY_DELAYS in turn and server errors once
+    after a second; anything else is not retried.
+    """
+
+    def __init__(self) -> None:
+        self.rate_limits = 0
+        self.server_errors = 0
+
+    def next_delay(
+        self, error: anthropic.APIStatusError, stats: RequestStats | None = None
+    ) -> tuple[float, str]:
+        """Return (seconds to wait, notice) before retrying error, or raise if it is final.
+
+        An authentication failure is raised as RuntimeError. The retry is counted on stats.
+        """
+        if isinstance(error, anthropic.AuthenticationError):
+            raise RuntimeError(
+                "Authentication failed: check that ANTHROPIC_API_KEY is set and valid."
+            ) from error
+        if isinstance(error, anthropic.RateLimitError):
+            if self.rate_limits >= len(RETRY_DELAYS):
+                raise error
+            delay = RETRY_DELAYS[self.rate_limits]
+            self.rate_limits += 1
+            notice = f"Rate limit hit, retrying in {delay}s..."
+        elif error.status_code >= 500 and self.server_errors < 1:
+            delay = 1
+            self.server_errors += 1
+            notice = f"Server error ({error.status_code}), retrying once..."
+        else:
+            raise error
+        if stats is not None:
+            stats.retries += 1
+            stats.wait_seconds += delay
+        return delay, notice
+
+
+class Continuation:
+    """A response being continued across max_tokens stops.
+
+    Built from the first call's (text, input_tokens, output_tokens, stop_reason); each
+    continuation's result is added with add(). Token counts are totals over every call.
+    """
+
+    def __init__(self, messages: list[dict], first: tuple[str, int, int, str | None]) -> None:
+        self.messages = messages
+        self.text, self.input_tokens, self.output_tokens, self.stop_reason = first
+        self.last_input = self.input_tokens
+        self.calls = 0
+
+    @property
+    def pending(self) -> bool:
+        """True while the response is cut off and another continuation is allowed."""
+        return self.stop_reason == "max_tokens" and self.calls < MAX_CONTINUATIONS
+
+    def followup(self) -> list[dict]:
+        """Return the next call's messages: the prompt and the partial text as an assistant turn."""
+        self.text = self.text.rstrip()
+        return self.messages + [{"role": "assistant", "content": self.text}]
+
+    def add(self, more: tuple[str, int, int, str | None]) -> None:
+        text, input_tokens, output_tokens, self.stop_reason = more
+        self.text += text
+        self.last_input = input_tokens
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.calls += 1
+
+    def result(self) -> tuple[str, int, int, bool]:
+        """Return (text, input_tokens, output_tokens, complete)."""
+        return self.text, self.input_tokens, self.output_tokens, self.stop_reason != "max_tokens"
+
+
+def endpoint_ref(endpoint: APIEndpoint) -> str:
+    """Return the "METHOD /path" label used for an endpoint in docs, logs and reports."""
+    return f"{endpoint.method.value} {endpoint.path}"
+
+
+_usage_lock = threading.Lock()
+
+
+def record_usage(
+    usage: dict[str, ModelUsage], model: str, input_tokens: int, output_tokens: int
+) -> ModelUsage:
+    """Add one call's tokens and cost to the per-model usage table and return its entry."""
+    with _usage_lock:
+        entry = usage.setdefault(model, ModelUsage())
+        entry.input_tokens += input_tokens
+        entry.output_tokens += output_tokens
+        entry.cost_usd += utils.estimate_cost(input_tokens, output_tokens, model)
+    return entry
+
+
+def snapshot_usage(usage: dict[str, ModelUsage]) -> dict[str, ModelUsage]:
+    """Return a copy of the per-model usage table, safe to hand to another thread."""
+    with _usage_lock:
+        return {m: u.model_copy() for m, u in usage.items()}
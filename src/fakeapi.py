@@ -0,0 +1,512 @@
+"""Local stand-in for the Anthropic Messages API, for load and failure testing without network.
+
+Point a client at ``FakeAPIServer.base_url`` (or run ``python -m src.fakeapi`` and pass its
+URL to ``--base-url``). Implemented routes:
+
+- ``POST /v1/messages``, both JSON and ``stream: true`` server-sent events
+- ``POST /v1/messages/count_tokens``
+- ``POST /v1/messages/batches``, ``GET /v1/messages/batches/{id}`` and ``.../results``
+- ``GET /_stats``: connection, request and token counters for assertions
+
+Responses are canned Markdown whose length is config.output_tokens words, one word per
+output token, cut off with ``stop_reason: "max_tokens"`` when the request's max_tokens is
+lower. A request ending in an assistant turn continues from the words already written, so
+continuation logic can be exercised. Batch prompts get one ``=== DOC n ===`` section per
+endpoint. Input tokens use the offline estimator.
+
+Latency and injected errors are drawn from a random generator seeded with config.seed, the
+request body and how many times that body has been seen, so a run makes the same decisions
+whatever order concurrent requests arrive in, and a retry of a failed request gets a fresh
+draw.
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import math
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from src import utils
+
+_ERROR_TYPES = {
+    400: "invalid_request_error",
+    404: "not_found_error",
+    429: "rate_limit_error",
+    500: "api_error",
+    503: "api_error",
+    529: "overloaded_error",
+}
+_ENDPOINT_MARKER_RE = re.compile(r"^--- Endpoint (\d+) ---$", re.MULTILINE)
+_BATCH_PATH_RE = re.compile(r"^/v1/messages/batches/([\w-]+)(/results)?$")
+_FILLER = (
+    "Call this endpoint with a valid API key in the x-api-key header and check the status "
+    "code before reading the body because rate limits apply per key and retries should "
+    "back off exponentially"
+).split()
+
+
+@dataclass(frozen=True)
+class Latency:
+    """A latency distribution in seconds.
+
+    Kinds: ``fixed`` (a), ``uniform`` (a to b), ``lognormal`` (median a, sigma b) and
+    ``exp`` (mean a). Parse one from text with ``Latency.parse("lognormal:0.4:0.5")``.
+    """
+
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, text: str) -> "Latency":
+        """Parse ``SECONDS`` or ``KIND:A[:B]``."""
+        kind, _, rest = text.partition(":")
+        if not rest:
+            return cls("fixed", float(kind))
+        values = [float(v) for v in rest.split(":")]
+        if kind not in {"fixed", "uniform", "lognormal", "exp"} or len(values) > 2:
+            raise ValueError(f"Invalid latency {text!r}")
+        return cls(kind, *values)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(self.a), self.b) if self.a > 0 else 0.0
+        if self.kind == "exp":
+            return rng.expovariate(1 / self.a) if self.a > 0 else 0.0
+        return self.a
+
+
+@dataclass
+class FakeAPIConfig:
+    """Behaviour of a FakeAPIServer.
+
+    latency is the time to the first byte (for streams, the first token); with
+    tokens_per_second set, output is additionally paced at that rate. error_rates maps an
+    HTTP status (429, 529, 500, ...) to the probability a request fails with it; error
+    responses carry a retry-after header of retry_after seconds when set.
+    """
+
+    latency: Latency = field(default_factory=Latency)
+    tokens_per_second: float | None = None
+    error_rates: dict[int, float] = field(default_factory=dict)
+    retry_after: float | None = 1.0
+    output_tokens: int = 300
+    batch_seconds: float = 0.0
+    seed: int = 0
+
+
+def _message_text(messages: list[dict[str, Any]]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get("text", "") for block in content)
+    return "\n".join(parts)
+
+
+def _words(count: int, start: int = 0) -> list[str]:
+    return [_FILLER[i % len(_FILLER)] for i in range(start, start + count)]
+
+
+def _response_words(params: dict[str, Any], total: int) -> list[str]:
+    """Return the words of the full response the model would write for these params."""
+    user = next(
+        (m for m in reversed(params.get("messages", [])) if m.get("role") == "user"), {}
+    )
+    prompt = _message_text([user])
+    sections = len(_ENDPOINT_MARKER_RE.findall(prompt))
+    if not sections:
+        return ["##", "Overview\n\n", *_words(total - 2)]
+    words: list[str] = []
+    per_section = max(total // sections, 4)
+    for n in range(1, sections + 1):
+        words += [f"\n=== DOC {n} ===\n", "##", f"Endpoint {n}\n\n", *_words(per_section - 3)]
+    return words
+
+
+def build_message(params: dict[str, Any], config: FakeAPIConfig) -> dict[str, Any]:
+    """Return the Messages API response object for request params."""
+    messages = params.get("messages", [])
+    system = params.get("system") or ""
+    if not isinstance(system, str):
+        system = _message_text([{"content": system}])
+    model = params.get("model", "claude")
+    input_tokens = utils.estimate_tokens(system + _message_text(messages), model)
+
+    words = _response_words(params, config.output_tokens)
+    prefix = ""
+    if messages and messages[-1].get("role") == "assistant":
+        written, position = len(_message_text(messages[-1:])), 0
+        while words and position + len(words[0].rstrip()) <= written:
+            position += len(words.pop(0)) + 1
+        prefix = " "
+    stop_reason = "end_turn"
+    if len(words) > params.get("max_tokens", len(words)):
+        words = words[:params["max_tokens"]]
+        stop_reason = "max_tokens"
+    text = prefix + " ".join(words)
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": stop_reason,
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": input_tokens,
+            "output_tokens": max(len(words), 1),
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        },
+    }
+
+
+def _error_body(status: int, message: str) -> dict[str, Any]:
+    return {
+        "type": "error",
+        "error": {"type": _ERROR_TYPES.get(status, "api_error"), "message": message},
+    }
+
+
+def _iso(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+class FakeAPIServer(ThreadingHTTPServer):
+    """Threaded HTTP server speaking enough of the Messages API for the generator.
+
+    Use as a context manager, or call start() and stop(). Port 0 picks a free port.
+    """
+
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(
+        self, config: FakeAPIConfig | None = None, host: str = "127.0.0.1", port: int = 0
+    ) -> None:
+        super().__init__((host, port), _Handler)
+        self.config = config or FakeAPIConfig()
+        self.stats: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._attempts: Counter[str] = Counter()
+        self._batches: dict[str, dict[str, Any]] = {}
+        self._connections: set[socket.socket] = set()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAPIServer":
+        self._thread = threading.Thread(
+            target=self.serve_forever, args=(0.05,), name="fake-api", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close kept-alive connections so their handler threads exit."""
+        self.shutdown()
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            with contextlib.suppress(OSError):
+                connection.shutdown(socket.SHUT_RDWR)
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeAPIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        """Ignore clients hanging up mid-response (e.g. a cancelled stream); report the rest."""
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def count(self, **amounts: int) -> None:
+        with self._lock:
+            self.stats.update(amounts)
+
+    def rng_for(self, body: bytes) -> random.Random:
+        """Return the generator for this request: seeded by body and attempt number."""
+        key = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            attempt = self._attempts[key]
+            self._attempts[key] += 1
+        return random.Random(f"{self.config.seed}:{key}:{attempt}")
+
+    def injected_error(self, rng: random.Random) -> int | None:
+        """Return the status to fail this request with, if any."""
+        for status, rate in sorted(self.config.error_rates.items()):
+            if rng.random() < rate:
+                return status
+        return None
+
+    def create_batch(self, requests: list[dict[str, Any]], base_url: str) -> dict[str, Any]:
+        """Process a batch up front; it reports as ended after config.batch_seconds."""
+        batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+        results = []
+        for item in requests:
+            params = item["params"]
+            rng = self.rng_for(json.dumps(params, sort_keys=True).encode())
+            status = self.injected_error(rng)
+            if status is None:
+                message = build_message(params, self.config)
+                self.count(input_tokens=message["usage"]["input_tokens"],
+                           output_tokens=message["usage"]["output_tokens"])
+                result = {"type": "succeeded", "message": message}
+            else:
+                result = {"type": "errored", "error": _error_body(status, "Injected failure")}
+            results.append({"custom_id": item["custom_id"], "result": result})
+        now = time.time()
+        batch = {
+            "id": batch_id,
+            "created": now,
+            "results": results,
+            "results_url": f"{base_url}/v1/messages/batches/{batch_id}/results",
+        }
+        with self._lock:
+            self._batches[batch_id] = batch
+        self.count(batches=1, batch_requests=len(requests))
+        return self.batch_object(batch)
+
+    def batch_object(self, batch: dict[str, Any]) -> dict[str, Any]:
+        ended = time.time() >= batch["created"] + self.config.batch_seconds
+        outcomes = Counter(r["result"]["type"] for r in batch["results"])
+        return {
+            "id": batch["id"],
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else len(batch["results"]),
+                "succeeded": outcomes["succeeded"] if ended else 0,
+                "errored": outcomes["errored"] if ended else 0,
+                "canceled": 0,
+                "expired": 0,
+            },
+            "created_at": _iso(batch["created"]),
+            "expires_at": _iso(batch["created"] + 86400),
+            "ended_at": _iso(batch["created"] + self.config.batch_seconds) if ended else None,
+            "cancel_initiated_at": None,
+            "archived_at": None,
+            "results_url": batch["results_url"] if ended else None,
+        }
+
+    def get_batch(self, batch_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            return self._batches.get(batch_id)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: FakeAPIServer
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server._lock:
+            self.server._connections.add(self.connection)
+        self.server.count(connections=1)
+
+    def finish(self) -> None:
+        with self.server._lock:
+            self.server._connections.discard(self.connection)
+        super().finish()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Any, headers: dict[str, str] | None = None) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("request-id", f"req_{uuid.uuid4().hex[:24]}")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, message: str) -> None:
+        headers = {}
+        if status in (429, 529) or status >= 500:
+            self.server.count(**{f"status_{status}": 1})
+            if self.server.config.retry_after is not None:
+                headers["retry-after"] = f"{self.server.config.retry_after:g}"
+        self._send_json(status, _error_body(status, message), headers)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def do_GET(self) -> None:
+        if self.path == "/_stats":
+            self._send_json(200, dict(self.server.stats))
+            return
+        match = _BATCH_PATH_RE.match(self.path.split("?")[0])
+        batch = self.server.get_batch(match.group(1)) if match else None
+        if batch is None:
+            self._send_error(404, f"Not found: {self.path}")
+            return
+        obj = self.server.batch_object(batch)
+        if not match.group(2):
+            self._send_json(200, obj)
+            return
+        if obj["processing_status"] != "ended":
+            self._send_error(400, "Batch has not ended")
+            return
+        data = "".join(json.dumps(r) + "\n" for r in batch["results"]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-jsonl")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:
+        body = self._read_body()
+        try:
+            params = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            self._send_error(400, "Request body is not valid JSON")
+            return
+        path = self.path.split("?")[0]
+        if path == "/v1/messages/count_tokens":
+            system = params.get("system") or ""
+            text = (system if isinstance(system, str) else "") + _message_text(
+                params.get("messages", [])
+            )
+            self._send_json(200, {"input_tokens": utils.estimate_tokens(text)})
+        elif path == "/v1/messages/batches":
+            self._send_json(200, self.server.create_batch(params.get("requests", []), self._base()))
+        elif path == "/v1/messages":
+            self._messages(params, body)
+        else:
+            self._send_error(404, f"Not found: {self.path}")
+
+    def _base(self) -> str:
+        return f"http://{self.headers.get('Host') or self.server.base_url[7:]}"
+
+    def _messages(self, params: dict[str, Any], body: bytes) -> None:
+        config = self.server.config
+        rng = self.server.rng_for(body)
+        self.server.count(requests=1)
+        time.sleep(config.latency.sample(rng))
+        status = self.server.injected_error(rng)
+        if status is not None:
+            self._send_error(status, f"Injected {status} failure")
+            return
+        message = build_message(params, config)
+        usage = message["usage"]
+        self.server.count(
+            status_200=1, input_tokens=usage["input_tokens"], output_tokens=usage["output_tokens"]
+        )
+        pace = 1 / config.tokens_per_second if config.tokens_per_second else 0.0
+        if not params.get("stream"):
+            time.sleep(pace * usage["output_tokens"])
+            self._send_json(200, message)
+            return
+        self._stream(message, pace)
+
+    def _stream(self, message: dict[str, Any], pace: float) -> None:
+        """Send message as server-sent events in chunked encoding, one delta per word."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(name: str, data: dict[str, Any]) -> None:
+            payload = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+            self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+            self.wfile.flush()
+
+        start = {**message, "content": [], "stop_reason": None,
+                 "usage": {**message["usage"], "output_tokens": 1}}
+        event("message_start", {"type": "message_start", "message": start})
+        event("content_block_start", {
+            "type": "content_block_start",
+            "index": 0,
+            "content_block": {"type": "text", "text": ""},
+        })
+        text = message["content"][0]["text"]
+        chunks = re.findall(r"\s*\S+", text)
+        tail = text[sum(map(len, chunks)):]
+        for n, word in enumerate(chunks + [tail] if tail or not chunks else chunks):
+            if n and pace:
+                time.sleep(pace)
+            event("content_block_delta", {
+                "type": "content_block_delta", "index": 0,
+                "delta": {"type": "text_delta", "text": word},
+            })
+        event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        event("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+            "usage": {"output_tokens": message["usage"]["output_tokens"]},
+        })
+        event("message_stop", {"type": "message_stop"})
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def _error_rate(text: str) -> tuple[int, float]:
+    status, _, rate = text.partition("=")
+    return int(status), float(rate)
+
+
+def main(argv: list[str] | None = None) -> None:
+    p = argparse.ArgumentParser(description="Run a local fake Anthropic Messages API server.")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8787)
+    p.add_argument(
+        "--latency", type=Latency.parse, default=Latency(),
+        help="SECONDS or KIND:A[:B] with KIND fixed, uniform, lognormal or exp (default: 0)",
+    )
+    p.add_argument("--tokens-per-second", type=float, help="Pace output at this rate")
+    p.add_argument(
+        "--error-rate", type=_error_rate, action="append", default=[], metavar="STATUS=RATE",
+        help="Fail this fraction of requests with STATUS, e.g. 429=0.05 (repeatable)",
+    )
+    p.add_argument("--retry-after", type=float, default=1.0, help="retry-after header on errors")
+    p.add_argument("--output-tokens", type=int, default=300, help="Response length in tokens")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args(argv)
+
+    config = FakeAPIConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rates=dict(args.error_rate),
+        retry_after=args.retry_after,
+        output_tokens=args.output_tokens,
+        seed=args.seed,
+    )
+    server = FakeAPIServer(config, args.host, args.port)
+    print(f"Fake Anthropic API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
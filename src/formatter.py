@@ -1,9 +1,12 @@
-from datetime import datetime
+import html
+import os
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timezone
+from typing import TextIO
 
-import markdown as md_pkg
-
-from src.models import GenerationResult
-from src.utils import format_cost, sanitize_anchor
+from src.models import GeneratedDoc, GenerationResult
+from src.profiling import span
+from src.utils import AnchorAllocator, format_cost
 
 _CSS = """
 body {
@@ -31,49 +34,144 @@ th { background: #f5f5f5; }
 """
 
 
-def format_markdown(result: GenerationResult, overview: str) -> str:
-    """Assemble a complete Markdown document from a GenerationResult and overview text."""
-    lines: list[str] = []
+def _generated_at(reproducible: bool) -> str | None:
+    """Return the stats timestamp; in reproducible mode use SOURCE_DATE_EPOCH or omit it."""
+    if not reproducible:
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if not epoch:
+        return None
+    try:
+        return datetime.fromtimestamp(int(epoch), tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def _allocate_anchors(
+    result: GenerationResult, overview: str, docs: Iterable[GeneratedDoc]
+) -> list[str]:
+    """Return one unique anchor per doc, allocated in the order headings appear in the document."""
+    allocator = AnchorAllocator()
+    allocator.allocate(f"{result.api_title} — API Documentation")
+    allocator.allocate("Overview")
+    allocator.reserve_headings(overview)
+    allocator.allocate("Table of Contents")
+    allocator.allocate("Endpoints")
+    anchors = []
+    for doc in docs:
+        anchors.append(allocator.allocate(doc.endpoint_ref))
+        allocator.reserve_headings(doc.markdown)
+    return anchors
+
+
+def _iter_markdown(
+    result: GenerationResult,
+    overview: str,
+    reproducible: bool,
+    explicit_ids: bool,
+    docs: Iterable[GeneratedDoc],
+) -> Iterator[str]:
+    """Yield the document line by line; explicit_ids emits endpoint headings as HTML with ids.
+
+    ``docs`` is iterated three times (anchors, table of contents, bodies), so it must be a
+    re-iterable collection such as a list or a SpooledDocStore rather than a one-shot generator.
+    """
+    anchors = _allocate_anchors(result, overview, docs)
 
-    lines.append(f"# {result.api_title} — API Documentation")
-    lines.append(f"> Version {result.api_version}")
-    lines.append("> Generated by AI Doc Generator")
-    lines.append("")
+    yield f"# {result.api_title} — API Documentation"
+    yield f"> Version {result.api_version}"
+    yield "> Generated by AI Doc Generator"
+    yield ""
 
-    lines.append("## Overview")
-    lines.append(overview)
-    lines.append("")
+    yield "## Overview"
+    yield overview
+    yield ""
 
-    lines.append("## Table of Contents")
-    for doc in result.docs:
-        anchor = sanitize_anchor(doc.endpoint_ref)
-        lines.append(f"- [{doc.endpoint_ref}](#{anchor})")
-    lines.append("")
+    yield "## Table of Contents"
+    for doc, anchor in zip(docs, anchors):
+        yield f"- [{doc.endpoint_ref}](#{anchor})"
+    yield ""
 
-    lines.append("## Endpoints")
-    lines.append("")
-    for doc in result.docs:
-        lines.append(f"### {doc.endpoint_ref}")
-        lines.append("")
-        lines.append(doc.markdown)
-        lines.append("")
-        lines.append("---")
-        lines.append("")
+    yield "## Endpoints"
+    yield ""
+    for doc, anchor in zip(docs, anchors):
+        if explicit_ids:
+            yield f'<h3 id="{anchor}">{html.escape(doc.endpoint_ref)}</h3>'
+        else:
+            yield f"### {doc.endpoint_ref}"
+        yield ""
+        yield doc.markdown
+        yield ""
+        yield "---"
+        yield ""
 
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    lines.append("## Generation Stats")
-    lines.append(f"- Model: {result.model}")
-    lines.append(f"- Total tokens: {result.total_tokens}")
-    lines.append(f"- Estimated cost: {format_cost(result.total_cost_usd)}")
-    lines.append(f"- Generated at: {timestamp}")
+    if result.pending:
+        yield "## Pending Endpoints"
+        yield "Generation stopped at the budget limit before these endpoints were documented:"
+        yield ""
+        for ref in result.pending:
+            yield f"- {ref}"
+        yield ""
 
-    return "\n".join(lines)
+    timestamp = _generated_at(reproducible)
+    yield "## Generation Stats"
+    yield f"- Model: {result.model}"
+    if len(result.model_usage) > 1:
+        for name, usage in sorted(result.model_usage.items()):
+            tokens = usage.input_tokens + usage.output_tokens
+            yield f"  - {name}: {usage.docs} docs, {tokens} tokens, {format_cost(usage.cost_usd)}"
+    yield f"- Total tokens: {result.total_tokens}"
+    yield f"- Estimated cost: {format_cost(result.total_cost_usd)}"
+    if reproducible and result.input_hash:
+        yield f"- Input hash: {result.input_hash}"
+    if timestamp:
+        yield f"- Generated at: {timestamp}"
 
 
-def format_html(result: GenerationResult, overview: str) -> str:
+def format_markdown(
+    result: GenerationResult,
+    overview: str,
+    reproducible: bool = False,
+    docs: Iterable[GeneratedDoc] | None = None,
+) -> str:
+    """Assemble a complete Markdown document from a GenerationResult and overview text.
+
+    With ``reproducible=True`` the output depends only on its inputs: the wall-clock timestamp
+    is replaced by SOURCE_DATE_EPOCH (or dropped) and the result's input hash is embedded.
+    ``docs`` overrides ``result.docs``, e.g. with a SpooledDocStore.
+    """
+    docs = result.docs if docs is None else docs
+    return "\n".join(_iter_markdown(result, overview, reproducible, False, docs))
+
+
+def write_markdown(
+    result: GenerationResult,
+    overview: str,
+    out: TextIO,
+    reproducible: bool = False,
+    docs: Iterable[GeneratedDoc] | None = None,
+) -> None:
+    """Write the same document as format_markdown to out without building it in memory."""
+    docs = result.docs if docs is None else docs
+    for i, line in enumerate(_iter_markdown(result, overview, reproducible, False, docs)):
+        if i:
+            out.write("\n")
+        out.write(line)
+
+
+def format_html(
+    result: GenerationResult,
+    overview: str,
+    reproducible: bool = False,
+    docs: Iterable[GeneratedDoc] | None = None,
+) -> str:
     """Render the documentation as a self-contained HTML page with embedded CSS."""
-    markdown_text = format_markdown(result, overview)
-    body_html = md_pkg.markdown(markdown_text, extensions=["fenced_code", "tables"])
+    import markdown as md_pkg  # deferred: only HTML output needs the renderer
+
+    docs = result.docs if docs is None else docs
+    markdown_text = "\n".join(_iter_markdown(result, overview, reproducible, True, docs))
+    with span("format.markdown_to_html"):
+        body_html = md_pkg.markdown(markdown_text, extensions=["fenced_code", "tables"])
     return f"""<!DOCTYPE html>
 <html lang="en">
 <head>
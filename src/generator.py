@@ -1,67 +1,621 @@
+import math
+import queue
+import threading
 import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, wait
+from typing import Any
 
 import anthropic
 
-from src import prompts, utils
-from src.models import APIEndpoint, APISpec, GeneratedDoc, GenerationResult
+from src import calls, history, prompts, utils
+from src.models import (
+    APIEndpoint,
+    APISpec,
+    DocEvent,
+    GeneratedDoc,
+    GenerationResult,
+    ModelUsage,
+)
+from src.progress import ProgressDisplay
+from src.routing import EndpointCanonicalizer, ModelRouter, PriorityScheduler
+from src.telemetry import RequestStats, RunRecorder, percentile
+from src.store import SpooledDocStore
 
-client = anthropic.Anthropic()
+client: anthropic.Anthropic | None = None
 
-_RETRY_DELAYS = [2, 4, 8]
+_MIN_OUTPUT_TOKENS = 256
+_MAX_BATCH_SIZE = 6
+_MAX_BATCH_OUTPUT_TOKENS = 16384
 
 
-def _call_api(messages: list[dict], model: str, stream: bool) -> tuple[str, int, int]:
-    """Make a single API call. Returns (text, input_tokens, output_tokens)."""
+class BudgetExceeded(Exception):
+    """Raised when a call cannot be made within the remaining generation budget."""
+
+
+class Budget:
+    """Hard token and/or USD limit for a run, charged with live usage from each response.
+
+    A reservation holds its worst case (input plus max_tokens) against the budget until the
+    same thread charges the call's real usage, so concurrent calls cannot jointly overrun it.
+    Input is sized offline before the call, so reserve() pads the estimate by input_margin;
+    a prompt underestimated by more than that can still overrun the limit slightly.
+    """
+
+    def __init__(
+        self,
+        max_cost: float | None = None,
+        max_tokens: int | None = None,
+        input_margin: float = 1.25,
+    ) -> None:
+        self.max_cost = max_cost
+        self.max_tokens = max_tokens
+        self.input_margin = input_margin
+        self.cost = 0.0
+        self.tokens = 0
+        self._stopped = False
+        self._lock = threading.RLock()
+        self._holds: dict[object, tuple[int, float]] = {}
+
+    def charge(self, model: str, input_tokens: int, output_tokens: int) -> None:
+        """Record the usage of a completed call and release this thread's reservation."""
+        with self._lock:
+            self._holds.pop(threading.get_ident(), None)
+            self.tokens += input_tokens + output_tokens
+            self.cost += utils.estimate_cost(input_tokens, output_tokens, model)
+
+    def release(self, key: object | None = None) -> None:
+        """Drop a reservation without charging (the call was not made or failed).
+
+        key is a hold() key; by default this thread's reservation is dropped.
+        """
+        with self._lock:
+            self._holds.pop(threading.get_ident() if key is None else key, None)
+
+    def stop(self) -> None:
+        """Mark the budget as spent so no further calls are started."""
+        self._stopped = True
+
+    @property
+    def exhausted(self) -> bool:
+        if self._stopped:
+            return True
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            return True
+        return self.max_cost is not None and self.cost >= self.max_cost
+
+    def output_allowance(self, model: str, input_tokens: int) -> int | None:
+        """Return how many output tokens a call with this input can afford, or None if unlimited."""
+        held_tokens = sum(tokens for tokens, _ in self._holds.values())
+        held_cost = sum(cost for _, cost in self._holds.values())
+        allowances = []
+        if self.max_tokens is not None:
+            allowances.append(self.max_tokens - self.tokens - held_tokens - input_tokens)
+        if self.max_cost is not None:
+            rates = utils.PRICING[model]
+            remaining = (
+                self.max_cost - self.cost - held_cost - input_tokens * rates["input"] / 1_000_000
+            )
+            allowances.append(int(remaining * 1_000_000 / rates["output"]))
+        return min(allowances) if allowances else None
+
+    def reserve(self, model: str, prompt: str, ceiling: int = calls.MAX_TOKENS) -> int:
+        """Return the max_tokens (at most ceiling) to request for a prompt, or raise BudgetExceeded.
+
+        max_tokens is capped at what the budget can still pay for after the prompt's
+        estimated input, padded by input_margin, so a long response cannot overrun it; only
+        an input estimate that is off by more than the margin can.
+        """
+        estimate = utils.estimate_tokens(prompts.SYSTEM_PROMPT + prompt, model)
+        return self.reserve_tokens(model, math.ceil(estimate * self.input_margin), ceiling)
+
+    def reserve_tokens(self, model: str, input_tokens: int, ceiling: int = calls.MAX_TOKENS) -> int:
+        """Like reserve, for a call whose input token count is already known."""
+        with self._lock:
+            if self.exhausted:
+                raise BudgetExceeded("budget exhausted")
+            allowance = self.output_allowance(model, input_tokens)
+            if allowance is None:
+                return ceiling
+            if allowance < _MIN_OUTPUT_TOKENS:
+                if not self._holds:
+                    self.stop()
+                raise BudgetExceeded("remaining budget is too small for another call")
+            max_tokens = min(ceiling, allowance)
+            self._holds[threading.get_ident()] = (
+                input_tokens + max_tokens,
+                utils.estimate_cost(input_tokens, max_tokens, model),
+            )
+            return max_tokens
+
+    def hold(self, key: object, model: str, prompt: str, max_tokens: int) -> bool:
+        """Reserve the full worst case of an extra call (e.g. a hedge) under key, if affordable.
+
+        Unlike reserve(), max_tokens is not shrunk to fit: the call is either covered in full,
+        alongside this thread's own reservation, or not made. Drop the hold with release(key).
+        """
+        estimate = utils.estimate_tokens(prompts.SYSTEM_PROMPT + prompt, model)
+        input_tokens = math.ceil(estimate * self.input_margin)
+        with self._lock:
+            if self.exhausted:
+                return False
+            allowance = self.output_allowance(model, input_tokens)
+            if allowance is not None and allowance < max_tokens:
+                return False
+            self._holds[key] = (
+                input_tokens + max_tokens,
+                utils.estimate_cost(input_tokens, max_tokens, model),
+            )
+            return True
+
+
+class OutputCapPredictor:
+    """Predict a per-endpoint max_tokens, tightened from the 4096 ceiling by run history.
+
+    An endpoint seen in run history is expected to produce about what it produced before,
+    and its cap is that plus ``headroom``, clamped to [floor, ceiling]. An endpoint with no
+    history gets the ``cold_start`` cap: a guess that comes in under the real output would
+    pay for continuation calls that resend the prompt and partial output, which costs more
+    than one call with a generous cap. Tight caps keep rate-limit reservations small; a
+    response that still hits its cap is continued, not truncated.
+    """
+
+    def __init__(
+        self,
+        run_history: dict[str, Any] | None = None,
+        headroom: float = 1.25,
+        base_tokens: int = 400,
+        tokens_per_point: int = 150,
+        floor: int = 512,
+        ceiling: int = calls.MAX_TOKENS,
+        cold_start: int = calls.MAX_TOKENS,
+    ) -> None:
+        self.run_history = run_history
+        self.headroom = headroom
+        self.base_tokens = base_tokens
+        self.tokens_per_point = tokens_per_point
+        self.floor = floor
+        self.ceiling = ceiling
+        self.cold_start = cold_start
+
+    def _observed(self, endpoint: APIEndpoint, model: str) -> float | None:
+        if self.run_history is None:
+            return None
+        return history.endpoint_output_tokens(self.run_history, model, calls.endpoint_ref(endpoint))
+
+    def expected(self, endpoint: APIEndpoint, model: str) -> float:
+        """Return the expected output tokens: from history, else from the complexity score.
+
+        Used to rank calls by size (e.g. longest-first scheduling), not to cap them.
+        """
+        observed = self._observed(endpoint, model)
+        if observed is not None:
+            return observed
+        return self.base_tokens + self.tokens_per_point * ModelRouter.score(endpoint)
+
+    def predict(self, endpoint: APIEndpoint, model: str) -> int:
+        """Return the max_tokens to request for an endpoint."""
+        observed = self._observed(endpoint, model)
+        if observed is None:
+            return min(self.ceiling, self.cold_start)
+        return max(self.floor, min(self.ceiling, math.ceil(observed * self.headroom)))
+
+
+class DocCache:
+    """Generated docs keyed by model and prompt, reused when a later run sends the same prompt.
+
+    A long-lived process (watch mode) keeps one across runs so only endpoints whose prompt
+    changed are regenerated. Holds at most max_entries docs, evicting the least recently used.
+    """
+
+    def __init__(self, max_entries: int = 10_000) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self._docs: OrderedDict[str, GeneratedDoc] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model: str, prompt: str) -> GeneratedDoc | None:
+        """Return the doc last generated for this model and prompt, or None."""
+        key = utils.content_hash(model, prompt)
+        with self._lock:
+            doc = self._docs.get(key)
+            if doc is not None:
+                self._docs.move_to_end(key)
+                self.hits += 1
+            return doc
+
+    def put(self, model: str, prompt: str, doc: GeneratedDoc) -> None:
+        """Remember the doc generated for this model and prompt."""
+        key = utils.content_hash(model, prompt)
+        with self._lock:
+            self._docs[key] = doc
+            self._docs.move_to_end(key)
+            while len(self._docs) > self.max_entries:
+                self._docs.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+
+def configure_client(
+    base_url: str | None = None,
+    pool_size: int | None = None,
+    keepalive_expiry: float | None = None,
+    http2: bool = False,
+    connect_timeout: float | None = None,
+    read_timeout: float | None = None,
+) -> anthropic.Anthropic:
+    """Create the shared Anthropic client with the given API base URL and HTTP settings.
+
+    base_url defaults to ANTHROPIC_BASE_URL or the public API; point it at a local
+    src.fakeapi server to exercise the generator without network access. pool_size caps
+    open connections and keeps that many alive between calls, so it should be at least the
+    number of concurrent calls. Options left as None keep the SDK defaults. Raises
+    RuntimeError if http2 is requested but HTTP/2 support is not installed.
+    """
+    global client
+    pool_limits, timeout = calls.http_settings(
+        pool_size, keepalive_expiry, connect_timeout, read_timeout
+    )
+    try:
+        http_client = anthropic.DefaultHttpxClient(limits=pool_limits, http2=http2)
+    except ImportError as exc:
+        raise RuntimeError(f"HTTP/2 is unavailable: {exc}") from exc
+    client = anthropic.Anthropic(base_url=base_url, timeout=timeout, http_client=http_client)
+    return client
+
+
+def _get_client() -> anthropic.Anthropic:
+    """Return the shared Anthropic client, creating it on first use."""
+    if client is None:
+        return configure_client()
+    return client
+
+
+class HedgePolicy:
+    """Opt-in request hedging: duplicate a call that runs past the usual latency.
+
+    Once min_samples calls have completed, a call still running after the quantile-th
+    percentile of their latencies gets a duplicate; whichever finishes first is used and
+    the other is cancelled. A hedge is only fired while the duplicates' estimated cost stays
+    within max_extra (a fraction) of the cost of the calls themselves.
+    """
+
+    def __init__(
+        self, quantile: float = 95.0, min_samples: int = 20, max_extra: float = 0.1
+    ) -> None:
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.max_extra = max_extra
+        self.latencies: list[float] = []
+        self.cost = 0.0
+        self.extra_cost = 0.0
+        self.hedges = 0
+        self.wins = 0
+        self._lock = threading.Lock()
+
+    def delay(self) -> float | None:
+        """Return how long a call may run before it is hedged, or None while warming up."""
+        with self._lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            return percentile(self.latencies, self.quantile)
+
+    def observe(self, latency: float, cost: float) -> None:
+        """Record a completed call's latency and cost."""
+        with self._lock:
+            self.latencies.append(latency)
+            self.cost += cost
+
+    def try_hedge(self) -> float | None:
+        """Reserve the expected cost of one hedge; return it, or None if over the cap."""
+        with self._lock:
+            expected = self.cost / len(self.latencies) if self.latencies else 0.0
+            if self.extra_cost + expected > self.max_extra * self.cost:
+                return None
+            self.extra_cost += expected
+            self.hedges += 1
+            return expected
+
+    def settle(self, reserved: float, cost: float, won: bool) -> None:
+        """Replace a hedge's reserved cost with the cost of the attempt that lost."""
+        with self._lock:
+            self.extra_cost += cost - reserved
+            self.wins += won
+
+
+class _Cancelled(Exception):
+    """Raised inside a streamed call whose hedge partner has already finished."""
+
+
+class _Attempt:
+    """One streamed API call on its own thread, cancellable from another thread.
+
+    Streamed text is buffered in chunks until the hedge race is decided; chars counts it,
+    to estimate what a cancelled attempt used.
+    """
+
+    def __init__(
+        self, messages: list[dict], model: str, max_tokens: int, stats: RequestStats | None
+    ) -> None:
+        self.cancelled = threading.Event()
+        self.chunks: list[str] = []
+        self.chars = 0
+        self.future: Future = Future()
+        self._stream: Any = None
+        self._lock = threading.Lock()
+        threading.Thread(
+            target=self._run, args=(messages, model, max_tokens, stats),
+            name="hedged-call", daemon=True,
+        ).start()
+
+    def _run(
+        self, messages: list[dict], model: str, max_tokens: int, stats: RequestStats | None
+    ) -> None:
+        try:
+            result = _call_api(
+                messages, model, True, max_tokens, self.chunks.append, stats, attempt=self
+            )
+        except BaseException as e:
+            # Closing the stream from cancel() surfaces as a read error in this thread.
+            self.future.set_exception(_Cancelled() if self.cancelled.is_set() else e)
+        else:
+            self.future.set_result(result)
+
+    def bind(self, stream: Any) -> None:
+        """Record the open stream for cancel() to close; raise _Cancelled if already cancelled."""
+        with self._lock:
+            self._stream = stream
+            if self.cancelled.is_set():
+                raise _Cancelled()
+
+    def cancel(self) -> None:
+        """Stop the attempt, closing its stream now rather than at its next chunk."""
+        with self._lock:
+            self.cancelled.set()
+            stream = self._stream
+        if stream is not None:
+            stream.close()
+
+    def usage(self, input_tokens: int) -> tuple[int, int]:
+        """Return the (input, output) tokens this attempt is billed for so far."""
+        if self.future.done():
+            error = self.future.exception()
+            if error is None:
+                return self.future.result()[1:3]
+            if not isinstance(error, _Cancelled):
+                return 0, 0
+        return input_tokens, math.ceil(self.chars / 4)
+
+
+def _hedged_call(
+    messages: list[dict],
+    model: str,
+    stream: bool,
+    max_tokens: int,
+    on_text: Callable[[str], None] | None,
+    stats: RequestStats | None,
+    policy: HedgePolicy,
+    budget: Budget | None = None,
+) -> tuple[str, int, int, str | None]:
+    """Make one call under a HedgePolicy. Returns like _call_api.
+
+    Calls are streamed so the losing attempt can be cancelled. Their text is buffered and
+    only the winner's reaches on_text (or stdout when stream is set), once it has won. With
+    a budget, a hedge is only fired if its worst case can be held alongside the first call.
+    The loser's input tokens and the output it had streamed are added to the returned
+    counts, since they are billed, so the caller's charge covers both attempts.
+    """
+    started = time.monotonic()
+    attempts = [_Attempt(messages, model, max_tokens, stats)]
+    reserved = None
+    delay = policy.delay()
+    if delay is not None and not wait([attempts[0].future], timeout=delay).done:
+        prompt = "".join(m["content"] for m in messages if isinstance(m["content"], str))
+        if budget is None or budget.hold(attempts[0], model, prompt, max_tokens):
+            reserved = policy.try_hedge()
+        if reserved is not None:
+            attempts.append(_Attempt(messages, model, max_tokens, stats))
+            if stats is not None:
+                stats.hedges += 1
+
+    try:
+        winner = None
+        remaining = list(attempts)
+        while remaining and winner is None:
+            wait([a.future for a in remaining], return_when=FIRST_COMPLETED)
+            for attempt in list(remaining):
+                if attempt.future.done():
+                    remaining.remove(attempt)
+                    if winner is None and attempt.future.exception() is None:
+                        winner = attempt
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancel()
+        if winner is None:
+            if reserved is not None:
+                policy.settle(reserved, 0.0, won=False)
+            raise attempts[0].future.exception()
+
+        text, in_tok, out_tok, stop_reason = winner.future.result()
+        policy.observe(time.monotonic() - started, utils.estimate_cost(in_tok, out_tok, model))
+        if reserved is not None:
+            loser = attempts[0] if winner is attempts[1] else attempts[1]
+            extra_in, extra_out = loser.usage(in_tok)
+            policy.settle(
+                reserved, utils.estimate_cost(extra_in, extra_out, model),
+                won=winner is attempts[1],
+            )
+            in_tok += extra_in
+            out_tok += extra_out
+    finally:
+        if budget is not None:
+            budget.release(attempts[0])
+
     if stream:
-        with client.messages.stream(
+        for chunk in winner.chunks:
+            if on_text is None:
+                print(chunk, end="", flush=True)
+            else:
+                on_text(chunk)
+        if on_text is None:
+            print()
+    return text, in_tok, out_tok, stop_reason
+
+
+def _call_api(
+    messages: list[dict],
+    model: str,
+    stream: bool,
+    max_tokens: int = calls.MAX_TOKENS,
+    on_text: Callable[[str], None] | None = None,
+    stats: RequestStats | None = None,
+    attempt: _Attempt | None = None,
+) -> tuple[str, int, int, str | None]:
+    """Make a single API call. Returns (text, input_tokens, output_tokens, stop_reason).
+
+    Streamed text is printed as it arrives, or passed to on_text if given. When stats is
+    given, time-to-first-token and prompt-cache usage are recorded on it. A streamed call
+    made for a hedged _Attempt registers its stream so cancelling the attempt closes it.
+    """
+    if stream:
+        with _get_client().messages.stream(
             model=model,
-            max_tokens=4096,
+            max_tokens=max_tokens,
             system=prompts.SYSTEM_PROMPT,
             messages=messages,
         ) as stream_ctx:
+            if attempt is not None:
+                attempt.bind(stream_ctx)
             for text in stream_ctx.text_stream:
-                print(text, end="", flush=True)
+                if attempt is not None:
+                    attempt.chars += len(text)
+                if stats is not None:
+                    stats.mark_first_token()
+                if on_text is None:
+                    print(text, end="", flush=True)
+                else:
+                    on_text(text)
             final = stream_ctx.get_final_message()
-        print()
-        return final.content[0].text, final.usage.input_tokens, final.usage.output_tokens
+        if on_text is None:
+            print()
+        if stats is not None:
+            stats.add_cache_usage(final.usage)
+        return (
+            final.content[0].text,
+            final.usage.input_tokens,
+            final.usage.output_tokens,
+            final.stop_reason,
+        )
     else:
-        response = client.messages.create(
+        response = _get_client().messages.create(
             model=model,
-            max_tokens=4096,
+            max_tokens=max_tokens,
             system=prompts.SYSTEM_PROMPT,
             messages=messages,
         )
-        return response.content[0].text, response.usage.input_tokens, response.usage.output_tokens
+        if stats is not None:
+            stats.add_cache_usage(response.usage)
+        return (
+            response.content[0].text,
+            response.usage.input_tokens,
+            response.usage.output_tokens,
+            response.stop_reason,
+        )
 
 
-def _call_with_retry(messages: list[dict], model: str, stream: bool) -> tuple[str, int, int]:
-    """Call _call_api with retry logic for transient errors."""
-    rate_limit_attempts = 0
-    server_error_attempts = 0
+def _call_with_retry(
+    messages: list[dict],
+    model: str,
+    stream: bool,
+    max_tokens: int = calls.MAX_TOKENS,
+    on_text: Callable[[str], None] | None = None,
+    stats: RequestStats | None = None,
+    hedge: HedgePolicy | None = None,
+    budget: Budget | None = None,
+    say: Callable[[str], None] = print,
+) -> tuple[str, int, int, str | None]:
+    """Call _call_api with retry logic for transient errors, counting retries on stats.
 
+    With a hedge policy, each attempt is made through _hedged_call, whose hedges are held
+    against budget. Retry notices go to say (e.g. a progress display's log, so they don't
+    corrupt a live display).
+    """
+    retry = calls.RetryState()
     while True:
         try:
-            return _call_api(messages, model, stream)
-        except anthropic.AuthenticationError:
-            raise RuntimeError(
-                "Authentication failed: check that ANTHROPIC_API_KEY is set and valid."
+            if hedge is not None:
+                return _hedged_call(
+                    messages, model, stream, max_tokens, on_text, stats, hedge, budget
+                )
+            return _call_api(
+                messages, model, stream, max_tokens=max_tokens, on_text=on_text, stats=stats
             )
-        except anthropic.RateLimitError:
-            if rate_limit_attempts >= len(_RETRY_DELAYS):
-                raise
-            delay = _RETRY_DELAYS[rate_limit_attempts]
-            rate_limit_attempts += 1
-            print(f"Rate limit hit, retrying in {delay}s...")
-            time.sleep(delay)
         except anthropic.APIStatusError as e:
-            if e.status_code >= 500:
-                if server_error_attempts >= 1:
-                    raise
-                server_error_attempts += 1
-                print(f"Server error ({e.status_code}), retrying once...")
-                time.sleep(1)
-            else:
-                raise
+            delay, notice = retry.next_delay(e, stats)
+        say(notice)
+        time.sleep(delay)
+
+
+def _complete(
+    messages: list[dict],
+    model: str,
+    stream: bool,
+    max_tokens: int = calls.MAX_TOKENS,
+    budget: Budget | None = None,
+    on_text: Callable[[str], None] | None = None,
+    stats: RequestStats | None = None,
+    hedge: HedgePolicy | None = None,
+    say: Callable[[str], None] = print,
+    usage: dict[str, ModelUsage] | None = None,
+) -> tuple[str, int, int, bool]:
+    """Call the API and continue a response that stops on max_tokens.
+
+    The partial text is sent back as an assistant turn so the model picks up where it left
+    off, up to calls.MAX_CONTINUATIONS times. With a budget, every call is charged to it and a
+    continuation is only made if the budget can afford it; with a usage table, every call is
+    recorded in it. Returns (text, input_tokens, output_tokens, complete), where complete is
+    False if the response is still cut off.
+    """
+    first = _call_with_retry(
+        messages, model, stream, max_tokens=max_tokens, on_text=on_text, stats=stats, hedge=hedge,
+        budget=budget, say=say,
+    )
+    if budget is not None:
+        budget.charge(model, first[1], first[2])
+    if usage is not None:
+        calls.record_usage(usage, model, first[1], first[2])
+    response = calls.Continuation(messages, first)
+    while response.pending:
+        cap = max_tokens
+        if budget is not None:
+            try:
+                cap = budget.reserve_tokens(
+                    model, response.last_input + response.output_tokens, ceiling=max_tokens
+                )
+            except BudgetExceeded:
+                break
+        more = _call_with_retry(
+            response.followup(), model, stream, max_tokens=cap, on_text=on_text, stats=stats,
+            hedge=hedge, budget=budget, say=say,
+        )
+        if budget is not None:
+            budget.charge(model, more[1], more[2])
+        if usage is not None:
+            calls.record_usage(usage, model, more[1], more[2])
+        response.add(more)
+    return response.result()
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Return the exact input-token count for a user prompt via the count_tokens endpoint."""
+    response = _get_client().messages.count_tokens(
+        model=model,
+        system=prompts.SYSTEM_PROMPT,
+        messages=[{"role": "user", "content": text}],
+    )
+    return response.input_tokens
 
 
 def generate_endpoint_doc(
@@ -69,60 +623,570 @@ def generate_endpoint_doc(
 ) -> GeneratedDoc:
     """Generate documentation for a single endpoint."""
     messages = [{"role": "user", "content": prompts.build_endpoint_prompt(endpoint)}]
-    markdown, input_tokens, output_tokens = _call_with_retry(messages, model, stream)
+    max_tokens = OutputCapPredictor().predict(endpoint, model)
+    markdown, input_tokens, output_tokens, _ = _complete(messages, model, stream, max_tokens)
     return GeneratedDoc(
         endpoint_ref=f"{endpoint.method.value} {endpoint.path}",
         markdown=markdown,
         tokens_used=input_tokens + output_tokens,
         model=model,
+        output_tokens=output_tokens,
     )
 
 
-def generate_overview(spec: APISpec, model: str) -> str:
-    """Generate an API overview/introduction section."""
-    messages = [{"role": "user", "content": prompts.build_overview_prompt(spec)}]
-    text, _, _ = _call_with_retry(messages, model, stream=False)
+def generate_overview(
+    spec: APISpec,
+    model: str,
+    budget: Budget | None = None,
+    recorder: RunRecorder | None = None,
+    doc_cache: DocCache | None = None,
+) -> str:
+    """Generate an API overview/introduction section.
+
+    With a doc cache, a cached overview for the same model and prompt is returned without a
+    call. Raises BudgetExceeded if the budget cannot cover the call.
+    """
+    prompt = prompts.build_overview_prompt(spec)
+    if doc_cache is not None:
+        cached = doc_cache.get(model, prompt)
+        if cached is not None:
+            return cached.markdown
+    messages = [{"role": "user", "content": prompt}]
+    max_tokens = budget.reserve(model, prompt) if budget is not None else calls.MAX_TOKENS
+    stats = RequestStats("overview", model, endpoints=0)
+    try:
+        text, stats.input_tokens, stats.output_tokens, _ = _complete(
+            messages, model, False, max_tokens, budget, stats=stats
+        )
+    except Exception as e:
+        stats.stop("error", e)
+        raise
+    else:
+        stats.stop()
+    finally:
+        if recorder is not None:
+            recorder.record(stats)
+    if doc_cache is not None:
+        doc_cache.put(
+            model,
+            prompt,
+            GeneratedDoc(
+                endpoint_ref="overview",
+                markdown=text,
+                tokens_used=stats.input_tokens + stats.output_tokens,
+                model=model,
+                output_tokens=stats.output_tokens,
+            ),
+        )
     return text
 
 
-def generate_full_docs(
-    spec: APISpec, model: str, stream: bool = True
-) -> GenerationResult:
-    """Orchestrate documentation generation for all endpoints."""
-    total_input_tokens = 0
-    total_output_tokens = 0
-    docs = []
-    total = len(spec.endpoints)
-
-    for i, endpoint in enumerate(spec.endpoints):
-        endpoint_ref = f"{endpoint.method.value} {endpoint.path}"
-        print(f"Generating: {endpoint_ref} [{i + 1}/{total}]")
-        messages = [{"role": "user", "content": prompts.build_endpoint_prompt(endpoint)}]
+class _OrderedSink:
+    """Collect per-endpoint outcomes and release docs in spec order.
+
+    A doc finished ahead of earlier endpoints waits until every earlier slot is filled, so a
+    store receives docs in spec order while only out-of-order docs are held in memory.
+    """
+
+    def __init__(self, store: SpooledDocStore | None) -> None:
+        self._store = store
+        self._waiting: dict[int, GeneratedDoc | None] = {}
+        self._next = 0
+        self.docs: list[GeneratedDoc] = []
+
+    def put(self, index: int, doc: GeneratedDoc | None) -> None:
+        """Record the outcome for an endpoint index; None means no doc (skipped or pending)."""
+        self._waiting[index] = doc
+        while self._next in self._waiting:
+            ready = self._waiting.pop(self._next)
+            self._next += 1
+            if ready is None:
+                continue
+            if self._store is not None:
+                self._store.append(ready)
+            else:
+                self.docs.append(ready)
+
+
+def _batch_key(endpoint: APIEndpoint) -> str:
+    """Return the grouping key for batching: the first tag, else the first path segment."""
+    if endpoint.tags:
+        return f"tag:{endpoint.tags[0]}"
+    return "path:" + endpoint.path.strip("/").split("/", 1)[0]
+
+
+def _plan_units(
+    endpoints: list[APIEndpoint],
+    models: list[str],
+    prompt_tokens: list[int],
+    batch_tokens: int | None,
+    indices: list[int] | None = None,
+) -> list[list[int]]:
+    """Split endpoint indices (default: all) into work units, one API call each.
+
+    Without batch_tokens every endpoint is its own unit. Otherwise endpoints whose prompt
+    is at most half of batch_tokens are grouped by model and tag/path prefix and packed
+    into batches of up to batch_tokens input tokens and _MAX_BATCH_SIZE endpoints.
+    """
+    if indices is None:
+        indices = list(range(len(endpoints)))
+    if not batch_tokens:
+        return [[i] for i in indices]
+    units: list[list[int]] = []
+    groups: dict[tuple[str, str], list[int]] = {}
+    for i in indices:
+        endpoint = endpoints[i]
+        if prompt_tokens[i] > batch_tokens // 2:
+            units.append([i])
+        else:
+            groups.setdefault((models[i], _batch_key(endpoint)), []).append(i)
+    for group in groups.values():
+        batch: list[int] = []
+        size = 0
+        for i in group:
+            if batch and (size + prompt_tokens[i] > batch_tokens or len(batch) >= _MAX_BATCH_SIZE):
+                units.append(batch)
+                batch, size = [], 0
+            batch.append(i)
+            size += prompt_tokens[i]
+        units.append(batch)
+    units.sort(key=lambda unit: unit[0])
+    return units
+
+
+def _split_batch_response(text: str, count: int) -> list[str] | None:
+    """Split a batched response into per-endpoint sections, or None if it is malformed."""
+    matches = list(prompts.BATCH_SECTION_RE.finditer(text))
+    if [int(m.group(1)) for m in matches] != list(range(1, count + 1)):
+        return None
+    sections = []
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following is not None else len(text)
+        section = text[match.end():end].strip()
+        if not section:
+            return None
+        sections.append(section)
+    return sections
+
+
+def _split_proportionally(total: int, weights: list[int]) -> list[int]:
+    """Divide an integer total across weights, giving any rounding remainder to the last share."""
+    if not any(weights):
+        weights = [1] * len(weights)
+    weight_sum = sum(weights)
+    shares = [total * w // weight_sum for w in weights]
+    shares[-1] += total - sum(shares)
+    return shares
+
+
+def _generate_batch(
+    endpoints: list[APIEndpoint],
+    model: str,
+    weights: list[int],
+    caps: list[int],
+    stream: bool,
+    budget: Budget | None,
+    usage: dict[str, ModelUsage],
+    on_text: Callable[[str], None] | None = None,
+    stats: RequestStats | None = None,
+    hedge: HedgePolicy | None = None,
+    say: Callable[[str], None] = print,
+) -> list[GeneratedDoc] | None:
+    """Document several endpoints with one call.
+
+    Returns None when the response cannot be split back into one section per endpoint, in
+    which case the caller falls back to single-endpoint calls. Input tokens are attributed
+    to each doc in proportion to its estimated prompt size, output tokens in proportion to
+    the length of its section. Raises BudgetExceeded if the budget cannot cover the batch.
+    """
+    prompt = prompts.build_batch_prompt(endpoints)
+    max_tokens = min(sum(caps), _MAX_BATCH_OUTPUT_TOKENS)
+    if budget is not None:
+        max_tokens = budget.reserve(model, prompt, ceiling=max_tokens)
+    messages = [{"role": "user", "content": prompt}]
+    try:
+        text, in_tok, out_tok, complete = _complete(
+            messages, model, stream, max_tokens, budget, on_text, stats, hedge, say, usage
+        )
+    except Exception:
+        if budget is not None:
+            budget.release()
+        raise
+    if stats is not None:
+        stats.input_tokens, stats.output_tokens = in_tok, out_tok
+    if not complete and budget is not None and budget.exhausted:
+        budget.stop()
+        raise BudgetExceeded("budget reached mid-response")
+    sections = _split_batch_response(text, len(endpoints))
+    if sections is None:
+        return None
+    in_shares = _split_proportionally(in_tok, weights)
+    out_shares = _split_proportionally(out_tok, [len(section) for section in sections])
+    return [
+        GeneratedDoc(
+            endpoint_ref=calls.endpoint_ref(endpoint),
+            markdown=section,
+            tokens_used=in_share + out_share,
+            model=model,
+            output_tokens=out_share,
+        )
+        for endpoint, section, in_share, out_share in zip(
+            endpoints, sections, in_shares, out_shares
+        )
+    ]
+
+
+def iter_endpoint_docs(
+    spec: APISpec,
+    model: str,
+    stream: bool = True,
+    budget: Budget | None = None,
+    router: ModelRouter | None = None,
+    batch_tokens: int | None = None,
+    canonicalizer: EndpointCanonicalizer | None = None,
+    max_prompt_tokens: int | None = None,
+    output_caps: OutputCapPredictor | None = None,
+    concurrency: int = 1,
+    progress: ProgressDisplay | None = None,
+    recorder: RunRecorder | None = None,
+    hedge: HedgePolicy | None = None,
+    scheduler: PriorityScheduler | None = None,
+    doc_cache: DocCache | None = None,
+    executor: Executor | None = None,
+    prompt_endpoints: list[APIEndpoint] | None = None,
+) -> Iterator[DocEvent]:
+    """Generate docs for all endpoints, yielding a DocEvent as each endpoint settles.
+
+    Every endpoint is yielded exactly once, in completion order: its spec index, its doc
+    (None if it failed or was left pending by the budget), and the run's per-model usage so
+    far, so a caller can restore spec order and format, upload or cache docs while later
+    calls are still running. Work starts on the first next() and runs ahead of the consumer
+    on worker threads when concurrency is above 1 or an executor is given; closing the
+    iterator early cancels the calls not yet started. Options are as for generate_full_docs.
+    """
+    say = progress.log if progress is not None else print
+    endpoints = list(spec.endpoints)
+    total = len(endpoints)
+    models = [router.route(ep, model) if router is not None else model for ep in endpoints]
+    compressed: set[int] = set()
+    if prompt_endpoints is not None:
+        endpoints = list(prompt_endpoints)
+        compressed = {i for i, ep in enumerate(endpoints) if ep != spec.endpoints[i]}
+    elif max_prompt_tokens is not None:
+        for i, ep in enumerate(endpoints):
+            endpoints[i], steps = prompts.compress_endpoint(ep, max_prompt_tokens, models[i])
+            if steps:
+                compressed.add(i)
+                say(f"Compressed prompt for {calls.endpoint_ref(ep)}: {', '.join(steps)}")
+    endpoint_prompts = [prompts.build_endpoint_prompt(ep) for ep in endpoints]
+    if output_caps is None:
+        output_caps = OutputCapPredictor()
+    caps = [output_caps.predict(ep, m) for ep, m in zip(spec.endpoints, models)]
+    prompt_tokens = [utils.estimate_tokens(p, m) for p, m in zip(endpoint_prompts, models)]
+    usage: dict[str, ModelUsage] = {}
+    pending: set[int] = set()
+    events: queue.SimpleQueue[DocEvent | Future] = queue.SimpleQueue()
+    completed = 0
+    lock = threading.Lock()
+
+    duplicates: dict[int, list[int]] = {i: [] for i in range(total)}
+    if canonicalizer is not None:
+        duplicates = canonicalizer.classes(endpoints, models)
+        reused = total - len(duplicates)
+        if reused:
+            say(f"Deduplicated {reused} endpoint(s) into {len(duplicates)} generation(s)")
+
+    def finish(i: int, doc: GeneratedDoc | None) -> None:
+        """Queue the events for an endpoint's doc and, retargeted, its duplicates' docs."""
+        nonlocal completed
+        with lock:
+            settled = [(i, doc)]
+            if doc is not None:
+                calls.record_usage(usage, doc.model, 0, 0).docs += 1
+                if doc_cache is not None:
+                    doc_cache.put(models[i], endpoint_prompts[i], doc)
+            for j in duplicates[i]:
+                copy = None
+                if doc is not None and canonicalizer is not None:
+                    copy = GeneratedDoc(
+                        endpoint_ref=calls.endpoint_ref(endpoints[j]),
+                        markdown=canonicalizer.retarget(doc.markdown, endpoints[i], endpoints[j]),
+                        tokens_used=0,
+                        model=doc.model,
+                    )
+                    calls.record_usage(usage, doc.model, 0, 0).docs += 1
+                settled.append((j, copy))
+            totals = calls.snapshot_usage(usage)
+            for k, settled_doc in settled:
+                completed += 1
+                events.put(DocEvent(
+                    index=k,
+                    endpoint_ref=calls.endpoint_ref(endpoints[k]),
+                    doc=settled_doc,
+                    pending=k in pending,
+                    compressed=k in compressed,
+                    completed=completed,
+                    total=total,
+                    model_usage=totals,
+                ))
+
+    def defer(i: int) -> None:
+        """Mark an endpoint and its duplicates as pending on budget exhaustion."""
+        with lock:
+            pending.add(i)
+            pending.update(duplicates[i])
+        if progress is not None:
+            progress.skip()
+        finish(i, None)
+
+    def text_sink(label: str) -> Callable[[str], None] | None:
+        """Return the streamed-text callback for a call, or None to print to stdout."""
+        if progress is None:
+            return None
+        return lambda text: progress.update(label, text)
+
+    def record(stats: RequestStats, status: str = "ok", error: Exception | None = None) -> None:
+        """Close a request's stats and hand them to the recorder."""
+        stats.stop(status, error)
+        if recorder is not None:
+            recorder.record(stats)
+
+    def run_batch(unit: list[int]) -> bool:
+        """Generate a batch unit; return False if it must fall back to single calls."""
+        refs = ", ".join(calls.endpoint_ref(endpoints[i]) for i in unit)
+        say(f"Generating batch: {refs} [{unit[-1] + 1}/{total}]")
+        if progress is not None:
+            progress.start(refs)
+        stats = RequestStats(refs, models[unit[0]], endpoints=len(unit))
         try:
-            markdown, in_tok, out_tok = _call_with_retry(messages, model, stream)
-            docs.append(
-                GeneratedDoc(
-                    endpoint_ref=endpoint_ref,
-                    markdown=markdown,
-                    tokens_used=in_tok + out_tok,
-                    model=model,
-                )
+            batch_docs = _generate_batch(
+                [endpoints[i] for i in unit], models[unit[0]],
+                [prompt_tokens[i] for i in unit], [caps[i] for i in unit],
+                stream, budget, usage, on_text=text_sink(refs), stats=stats, hedge=hedge,
+                say=say,
             )
-            total_input_tokens += in_tok
-            total_output_tokens += out_tok
-            print(f"Done: {endpoint_ref}")
-        except RuntimeError:
+        except BudgetExceeded:
+            if stats.output_tokens:
+                record(stats, "discarded")
+            if progress is not None:
+                progress.finish(refs, 0, count=0)
+            for i in unit:
+                defer(i)
+            return True
+        except RuntimeError as e:
+            record(stats, "error", e)
             raise
         except Exception as e:
-            print(f"Warning: skipping {endpoint_ref} — {e}")
+            record(stats, "error", e)
+            say(f"Warning: batch failed ({e}); falling back to single-endpoint calls")
+            batch_docs = None
+        else:
+            record(stats, "ok" if batch_docs is not None else "unsplit")
+        if progress is not None:
+            if batch_docs is None:
+                progress.finish(refs, 0, count=0)
+            else:
+                progress.finish(refs, sum(d.output_tokens for d in batch_docs), count=len(unit))
+        if batch_docs is None:
+            say("Warning: could not split batched response; falling back to single-endpoint calls")
+            return False
+        for i, doc in zip(unit, batch_docs):
+            finish(i, doc)
+        say(f"Done: {refs}")
+        return True
+
+    def run_endpoint(i: int) -> None:
+        """Generate one endpoint's doc."""
+        endpoint_ref = calls.endpoint_ref(endpoints[i])
+        endpoint_model = models[i]
+        max_tokens = caps[i]
+        if budget is not None:
+            try:
+                max_tokens = budget.reserve(endpoint_model, endpoint_prompts[i], max_tokens)
+            except BudgetExceeded:
+                defer(i)
+                return
+        say(f"Generating: {endpoint_ref} [{i + 1}/{total}]")
+        if progress is not None:
+            progress.start(endpoint_ref)
+        stats = RequestStats(endpoint_ref, endpoint_model)
+        messages = [{"role": "user", "content": endpoint_prompts[i]}]
+        doc = None
+        try:
+            markdown, in_tok, out_tok, complete = _complete(
+                messages, endpoint_model, stream, max_tokens, budget, text_sink(endpoint_ref),
+                stats, hedge, say, usage,
+            )
+            stats.input_tokens, stats.output_tokens = in_tok, out_tok
+            if not complete:
+                if budget is not None and budget.exhausted:
+                    budget.stop()
+                    record(stats, "discarded")
+                    say(f"Budget reached while generating {endpoint_ref}; output discarded")
+                    if progress is not None:
+                        progress.finish(endpoint_ref, out_tok, count=0)
+                    defer(i)
+                    return
+                say(f"Warning: {endpoint_ref} is still cut off after continuation")
+            doc = GeneratedDoc(
+                endpoint_ref=endpoint_ref,
+                markdown=markdown,
+                tokens_used=in_tok + out_tok,
+                model=endpoint_model,
+                output_tokens=out_tok,
+            )
+            record(stats, "ok" if complete else "truncated")
+            if progress is not None:
+                progress.finish(endpoint_ref, out_tok)
+            say(f"Done: {endpoint_ref}")
+        except RuntimeError as e:
+            record(stats, "error", e)
+            raise
+        except Exception as e:
+            record(stats, "error", e)
+            if budget is not None:
+                budget.release()
+            if progress is not None:
+                progress.fail(endpoint_ref)
+            say(f"Warning: skipping {endpoint_ref} — {e}")
+        finish(i, doc)
+
+    def run_unit(unit: list[int]) -> None:
+        """Generate a planned unit: one batch call, or one call per endpoint."""
+        if len(unit) > 1 and run_batch(unit):
+            return
+        for i in unit:
+            run_endpoint(i)
+
+    def drain() -> Iterator[DocEvent]:
+        while not events.empty():
+            yield events.get()
+
+    if doc_cache is not None:
+        cached = {}
+        for i in duplicates:
+            doc = doc_cache.get(models[i], endpoint_prompts[i])
+            if doc is not None:
+                cached[i] = doc.model_copy(update={"tokens_used": 0, "output_tokens": 0})
+        if cached:
+            say(f"Reusing {len(cached)} unchanged endpoint doc(s) from the cache")
+        for i, doc in cached.items():
+            calls.record_usage(usage, doc.model, 0, 0)
+            if progress is not None:
+                progress.skip()
+            finish(i, doc)
+            del duplicates[i]
+
+    units = _plan_units(endpoints, models, prompt_tokens, batch_tokens, list(duplicates))
+    if scheduler is not None:
+        sizes = [output_caps.expected(ep, m) for ep, m in zip(spec.endpoints, models)]
+        units = scheduler.order(units, endpoints, sizes)
+    try:
+        yield from drain()
+        if executor is None and concurrency <= 1:
+            for unit in units:
+                run_unit(unit)
+                yield from drain()
+        else:
+            pool = executor if executor is not None else ThreadPoolExecutor(max_workers=concurrency)
+            futures = [pool.submit(run_unit, unit) for unit in units]
+            try:
+                # Each future queues a marker once its events are queued, so the events
+                # come out as they settle and a worker's exception surfaces in turn.
+                for future in futures:
+                    future.add_done_callback(events.put)
+                outstanding = len(futures)
+                while outstanding:
+                    item = events.get()
+                    if isinstance(item, Future):
+                        outstanding -= 1
+                        if not item.cancelled():
+                            item.result()
+                    else:
+                        yield item
+            finally:
+                for future in futures:
+                    future.cancel()
+                if pool is not executor:
+                    pool.shutdown(cancel_futures=True)
+    finally:
+        if progress is not None:
+            progress.close()
+
+    if pending:
+        say(f"Budget exhausted: {len(pending)} endpoint(s) left pending")
+
+
+def generate_full_docs(
+    spec: APISpec,
+    model: str,
+    stream: bool = True,
+    store: SpooledDocStore | None = None,
+    budget: Budget | None = None,
+    router: ModelRouter | None = None,
+    batch_tokens: int | None = None,
+    canonicalizer: EndpointCanonicalizer | None = None,
+    max_prompt_tokens: int | None = None,
+    output_caps: OutputCapPredictor | None = None,
+    concurrency: int = 1,
+    progress: ProgressDisplay | None = None,
+    recorder: RunRecorder | None = None,
+    hedge: HedgePolicy | None = None,
+    scheduler: PriorityScheduler | None = None,
+    doc_cache: DocCache | None = None,
+    executor: Executor | None = None,
+    prompt_endpoints: list[APIEndpoint] | None = None,
+) -> GenerationResult:
+    """Orchestrate documentation generation for all endpoints.
 
-    total_cost = utils.estimate_cost(total_input_tokens, total_output_tokens, model)
+    When a store is given, docs are appended to it instead of being held in ``result.docs``.
+    When a budget is given, each call's max_tokens is capped at what the budget can still
+    afford; once it runs out, the remaining endpoints are listed in ``result.pending``.
+    When a router is given, each endpoint is sent to the model it picks; per-model usage is
+    reported in ``result.model_usage``. When batch_tokens is given, small endpoints sharing
+    a tag or path prefix are packed into one prompt of up to that many input tokens. When a
+    canonicalizer is given, structurally identical endpoints are generated once and the doc
+    is retargeted to each duplicate. When max_prompt_tokens is given, endpoints whose prompt
+    exceeds it have their schemas compressed; they are listed in ``result.compressed``.
+    prompt_endpoints, when given, are the endpoints as already compressed by the caller (one
+    per spec endpoint) and are used instead of compressing again.
+    Each call's max_tokens comes from output_caps (by default an OutputCapPredictor without
+    history), and responses cut off at that cap are continued. With concurrency above 1,
+    up to that many calls run at once on worker threads. When a progress display is given,
+    status messages and streamed text go to it instead of stdout. When a recorder is given,
+    every request's latency, retries and token usage are recorded on it. When a hedge
+    policy is given, slow calls are duplicated per the policy. When a scheduler is given,
+    calls are made in its priority order (by default, spec order). When a doc cache is
+    given, endpoints whose model and prompt are cached reuse the cached doc without a call,
+    and new docs are added to it. When an executor is given, calls run on it instead of a
+    private pool of concurrency threads, so several runs can share one limit on calls in
+    flight. Docs are always returned in spec order, and reach the store as soon as every
+    earlier endpoint has settled; see iter_endpoint_docs to consume them as they finish.
+    """
+    sink = _OrderedSink(store)
+    usage: dict[str, ModelUsage] = {}
+    pending: list[int] = []
+    compressed: list[int] = []
+    for event in iter_endpoint_docs(
+        spec, model, stream, budget, router, batch_tokens, canonicalizer, max_prompt_tokens,
+        output_caps, concurrency, progress, recorder, hedge, scheduler, doc_cache, executor,
+        prompt_endpoints,
+    ):
+        sink.put(event.index, event.doc)
+        if event.pending:
+            pending.append(event.index)
+        if event.compressed:
+            compressed.append(event.index)
+        usage = event.model_usage
 
     return GenerationResult(
         api_title=spec.title,
         api_version=spec.version,
-        docs=docs,
-        total_tokens=total_input_tokens + total_output_tokens,
-        total_cost_usd=total_cost,
+        docs=sink.docs,
+        total_tokens=sum(u.input_tokens + u.output_tokens for u in usage.values()),
+        total_cost_usd=sum(u.cost_usd for u in usage.values()),
         model=model,
+        pending=[calls.endpoint_ref(spec.endpoints[i]) for i in sorted(pending)],
+        model_usage=usage,
+        compressed=[calls.endpoint_ref(spec.endpoints[i]) for i in sorted(compressed)],
     )
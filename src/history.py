@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+from collections.abc import Iterable
+from typing import Any, Protocol
+
+from src import utils
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FILENAME = ".docgen-history.json"
+DEFAULT_OUTPUT_TOKENS_PER_ENDPOINT = 800
+OVERVIEW_OUTPUT_TOKENS = 500
+_SMOOTHING = 0.3
+
+
+class _DocUsage(Protocol):
+    endpoint_ref: str
+    model: str
+    output_tokens: int
+
+
+def default_history_path(output_path: str) -> str:
+    """Return the history file path that sits next to the given output file."""
+    return os.path.join(os.path.dirname(output_path), HISTORY_FILENAME)
+
+
+def load_history(path: str) -> dict[str, Any]:
+    """Load run history from path, returning an empty history if it is missing or unreadable."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            history = json.load(f)
+    except FileNotFoundError:
+        return {"models": {}}
+    except (OSError, ValueError) as exc:
+        logger.warning("Ignoring unreadable run history '%s': %s", path, exc)
+        return {"models": {}}
+    if not isinstance(history, dict) or not isinstance(history.get("models"), dict):
+        return {"models": {}}
+    if not isinstance(history.get("prompts", {}), dict):
+        del history["prompts"]
+    return history
+
+
+def save_history(path: str, history: dict[str, Any]) -> None:
+    """Write run history to path atomically, creating its directory if needed.
+
+    A run interrupted mid-write, or two runs saving at once, leave the old history or a
+    complete new one rather than a truncated file that load_history would discard.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with utils.atomic_write(path) as f:
+        json.dump(history, f, indent=2, sort_keys=True)
+
+
+def record_run(history: dict[str, Any], docs: Iterable[_DocUsage]) -> int:
+    """Fold the output-token counts of a finished run into history, in place.
+
+    Per-endpoint and per-model figures are exponentially smoothed so recent runs dominate
+    after prompt or model changes. Returns the number of docs recorded.
+    """
+    recorded = 0
+    for doc in docs:
+        if doc.output_tokens <= 0:
+            continue
+        entry = history["models"].setdefault(
+            doc.model, {"mean_output_tokens": None, "endpoints": {}}
+        )
+        mean = entry["mean_output_tokens"]
+        entry["mean_output_tokens"] = (
+            doc.output_tokens if mean is None else mean + _SMOOTHING * (doc.output_tokens - mean)
+        )
+        previous = entry["endpoints"].get(doc.endpoint_ref)
+        entry["endpoints"][doc.endpoint_ref] = (
+            doc.output_tokens
+            if previous is None
+            else previous + _SMOOTHING * (doc.output_tokens - previous)
+        )
+        recorded += 1
+    return recorded
+
+
+def changed_endpoints(history: dict[str, Any], prompt_hashes: dict[str, str]) -> set[str]:
+    """Return the endpoint refs whose prompt hash differs from the last recorded one."""
+    previous = history.get("prompts", {})
+    return {ref for ref, digest in prompt_hashes.items() if previous.get(ref) != digest}
+
+
+def record_prompts(history: dict[str, Any], prompt_hashes: dict[str, str]) -> int:
+    """Store the prompt hashes of documented endpoints in history, in place.
+
+    Returns the number of hashes that changed.
+    """
+    previous = history.setdefault("prompts", {})
+    changed = 0
+    for ref, digest in prompt_hashes.items():
+        if previous.get(ref) != digest:
+            previous[ref] = digest
+            changed += 1
+    return changed
+
+
+def endpoint_output_tokens(
+    history: dict[str, Any], model: str, endpoint_ref: str
+) -> float | None:
+    """Return the smoothed output tokens recorded for an endpoint, or None if never seen."""
+    entry = history["models"].get(model)
+    return entry["endpoints"].get(endpoint_ref) if entry else None
+
+
+def expected_endpoint_output_tokens(
+    history: dict[str, Any], model: str, endpoint_ref: str
+) -> int:
+    """Predict output tokens for one endpoint from its own history, the model mean, or a default."""
+    known = endpoint_output_tokens(history, model, endpoint_ref)
+    if known is not None:
+        return round(known)
+    entry = history["models"].get(model)
+    if entry and entry["mean_output_tokens"] is not None:
+        return round(entry["mean_output_tokens"])
+    return DEFAULT_OUTPUT_TOKENS_PER_ENDPOINT
+
+
+def expected_output_tokens(
+    history: dict[str, Any], model: str, endpoint_refs: Iterable[str]
+) -> int:
+    """Predict total output tokens for a run: every endpoint plus the overview."""
+    return OVERVIEW_OUTPUT_TOKENS + sum(
+        expected_endpoint_output_tokens(history, model, ref) for ref in endpoint_refs
+    )
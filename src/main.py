@@ -1,24 +1,56 @@
 import argparse
 import logging
 import os
+import re
 import sys
 import time
+from typing import TYPE_CHECKING
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from src import formatter, generator, parser, prompts, utils
+from src import history, parser, prompts, routing, utils
+from src.profiling import span
+from src.store import SpooledDocStore
+
+if TYPE_CHECKING:
+    from src.generator import Budget, DocCache
 
 DEFAULT_MODEL = "claude-sonnet-4-6"
 DEFAULT_OUTPUT = "output/docs.md"
 
 
+class _Aborted(SystemExit):
+    """Exit (status 0) raised when the user declines the "Proceed?" prompt."""
+
+
+def _regex(value: str) -> str:
+    """argparse type for a regular expression: reject patterns that do not compile."""
+    try:
+        re.compile(value)
+    except re.error as exc:
+        raise argparse.ArgumentTypeError(f"invalid regex {value!r}: {exc}") from exc
+    return value
+
+
+def _positive_int(value: str) -> int:
+    """argparse type for a count that must be at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}") from None
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+
 def build_parser() -> argparse.ArgumentParser:
     """Build and return the CLI argument parser."""
     p = argparse.ArgumentParser(
         prog="main.py",
         description="Generate API documentation from OpenAPI specs using AI.",
+        epilog="Run 'main.py serve --help' for the long-running HTTP service.",
     )
     p.add_argument("spec", help="Path to OpenAPI spec file (JSON or YAML)")
     p.add_argument(
@@ -57,19 +89,332 @@ def build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Parse the spec and show cost estimate without making any API calls",
     )
+    p.add_argument(
+        "--reproducible",
+        action="store_true",
+        help="Produce byte-stable output (timestamp from SOURCE_DATE_EPOCH, input hash embedded) "
+        "and skip generation when the existing output already matches the inputs",
+    )
+    p.add_argument(
+        "--spool",
+        action="store_true",
+        help="Spool generated docs to a temporary file instead of memory (for very large specs)",
+    )
+    p.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and regenerate whenever the spec file changes; only endpoints whose "
+        "prompt changed are sent to the API",
+    )
+    p.add_argument(
+        "--debounce",
+        type=float,
+        default=0.3,
+        metavar="SECONDS",
+        help="With --watch, wait until the spec has been quiet this long before regenerating "
+        "(default: 0.3)",
+    )
+    p.add_argument(
+        "--base-url",
+        metavar="URL",
+        help="Anthropic API base URL, e.g. a local fake server from `python -m src.fakeapi` "
+        "(default: ANTHROPIC_BASE_URL or the public API)",
+    )
+    p.add_argument(
+        "--concurrency",
+        type=_positive_int,
+        default=1,
+        metavar="N",
+        help="Number of endpoint calls to run at once (default: 1); above 1 a live progress "
+        "display replaces streamed output",
+    )
+    p.add_argument(
+        "--hedge",
+        action="store_true",
+        help="Duplicate a call that runs past the p95 latency observed so far in the run and "
+        "keep whichever finishes first",
+    )
+    p.add_argument(
+        "--hedge-max-extra",
+        type=float,
+        default=0.1,
+        metavar="FRACTION",
+        help="Cap on the extra cost of --hedge duplicates as a fraction of the cost of the "
+        "calls themselves (default: 0.1)",
+    )
+    p.add_argument(
+        "--priority-tag",
+        action="append",
+        metavar="TAG",
+        help="Generate endpoints with this tag first (repeatable; earlier tags go first)",
+    )
+    p.add_argument(
+        "--priority-path",
+        action="append",
+        type=_regex,
+        metavar="REGEX",
+        help="Generate endpoints whose path matches this regex first (repeatable; earlier "
+        "patterns go first)",
+    )
+    p.add_argument(
+        "--priority-changed",
+        action="store_true",
+        help="Generate endpoints whose prompt changed since the last run (per --history) first",
+    )
+    p.add_argument(
+        "--longest-first",
+        action="store_true",
+        help="Within the same priority, start the calls expected to run longest first",
+    )
+    p.add_argument(
+        "--pool-size",
+        type=int,
+        metavar="N",
+        help="HTTP connections to the API, all kept alive between calls (default: "
+        "--concurrency, doubled with --hedge)",
+    )
+    p.add_argument(
+        "--keepalive-expiry",
+        type=float,
+        metavar="SECONDS",
+        help="How long an idle connection stays open for reuse (default: 5)",
+    )
+    p.add_argument(
+        "--http2",
+        action="store_true",
+        help="Use HTTP/2 (requires the h2 package: pip install 'httpx[http2]')",
+    )
+    p.add_argument(
+        "--connect-timeout",
+        type=float,
+        metavar="SECONDS",
+        help="Timeout for opening a connection to the API (default: 5)",
+    )
+    p.add_argument(
+        "--read-timeout",
+        type=float,
+        metavar="SECONDS",
+        help="Timeout waiting for API response data (default: 600)",
+    )
+    p.add_argument(
+        "--simple-model",
+        metavar="MODEL",
+        help="Route simple endpoints (few parameters, small schemas) to this cheaper model, "
+        "e.g. claude-haiku-4-5-20251001",
+    )
+    p.add_argument(
+        "--batch-tokens",
+        type=int,
+        metavar="N",
+        help="Pack small endpoints sharing a tag or path prefix into one prompt of up to N input "
+        "tokens",
+    )
+    p.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Generate structurally identical endpoints (e.g. /v1/... and /v2/...) once and "
+        "reuse the doc for each path",
+    )
+    p.add_argument(
+        "--dedupe-prefix",
+        action="append",
+        type=_regex,
+        metavar="REGEX",
+        help="Path prefix pattern ignored by --dedupe (repeatable; default: ^/v\\d+(?=/))",
+    )
+    p.add_argument(
+        "--prompt-tokens",
+        type=int,
+        metavar="N",
+        help="Per-endpoint input-token budget; larger prompts have their schemas compressed",
+    )
+    p.add_argument(
+        "--max-cost",
+        type=float,
+        metavar="USD",
+        help="Cost limit; endpoints beyond it are left pending in the output",
+    )
+    p.add_argument(
+        "--max-tokens",
+        type=int,
+        metavar="N",
+        help="Total-token limit; endpoints beyond it are left pending in the output",
+    )
+    p.add_argument(
+        "--count-tokens",
+        action="store_true",
+        help="Calibrate the cost estimate against the API's token counter (a few extra API calls)",
+    )
+    p.add_argument(
+        "--report",
+        metavar="PATH",
+        help="Write a JSON run report with per-request latency, TTFT, retries and token usage, "
+        "plus p50/p90/p99 summaries",
+    )
+    p.add_argument(
+        "--metrics-file",
+        metavar="PATH",
+        help="Write run metrics (requests, errors, retries, tokens, cost, latency histogram) "
+        "in Prometheus text format, e.g. for node_exporter's textfile collector",
+    )
+    p.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time the parse, prompt, generate, format and history phases and print a table",
+    )
+    p.add_argument(
+        "--profile-out",
+        metavar="PATH",
+        help="Also profile the run (implies --profile): a .folded or .collapsed path gets "
+        "flamegraph-compatible collapsed stacks, any other path a cProfile pstats dump",
+    )
+    p.add_argument(
+        "--history",
+        metavar="PATH",
+        help=f"Run history used to predict output tokens (default: {history.HISTORY_FILENAME} "
+        "next to the output file)",
+    )
+    p.add_argument(
+        "--queue",
+        metavar="PATH",
+        help="SQLite work queue on shared storage for spreading a run over several processes "
+        "or hosts; use with --enqueue, --work or --finalize",
+    )
+    role = p.add_mutually_exclusive_group()
+    role.add_argument(
+        "--enqueue",
+        action="store_true",
+        help="Queue one job per endpoint (plus the overview) and exit without calling the API",
+    )
+    role.add_argument(
+        "--work",
+        action="store_true",
+        help="Claim queued jobs under a lease, generate them and store the results until the "
+        "queue is drained",
+    )
+    role.add_argument(
+        "--finalize",
+        action="store_true",
+        help="Assemble the finished jobs into the output file; unfinished endpoints are listed "
+        "as pending",
+    )
+    p.add_argument(
+        "--worker-id",
+        metavar="ID",
+        help="Name this --work process holds leases under (default: hostname:pid)",
+    )
+    p.add_argument(
+        "--lease",
+        type=float,
+        default=300.0,
+        metavar="SECONDS",
+        help="Lease length for --work; a job whose worker stops renewing it for this long is "
+        "handed to another worker (default: 300)",
+    )
     return p
 
 
+def _output_is_current(output_path: str, input_hash: str) -> bool:
+    """Return True if the file at output_path was generated from inputs with the given hash."""
+    try:
+        with open(output_path, encoding="utf-8") as f:
+            return f"Input hash: {input_hash}" in f.read()
+    except OSError:
+        return False
+
+
 def main() -> None:
     """Entry point: parse args, validate inputs, run generation, and write output."""
-    args = build_parser().parse_args()
+    if sys.argv[1:2] == ["serve"]:
+        from src import server
+
+        server.main(sys.argv[2:])
+        return
+    cli = build_parser()
+    args = cli.parse_args()
+    for flag, model in (("--model", args.model), ("--simple-model", args.simple_model)):
+        if model is not None and model not in utils.PRICING:
+            cli.error(f"{flag}: unknown model '{model}' (choose from {', '.join(utils.PRICING)})")
+    if bool(args.queue) != (args.enqueue or args.work or args.finalize):
+        cli.error("--queue must be given together with one of --enqueue, --work or --finalize")
+    if args.watch and args.queue:
+        cli.error("--watch cannot be combined with --queue")
+    if args.queue and (args.max_cost is not None or args.max_tokens is not None):
+        cli.error("--max-cost and --max-tokens are not enforced in queue mode")
+    if args.work and (args.report or args.metrics_file):
+        cli.error("--report and --metrics-file are not written in --work mode")
+    if args.watch and (args.profile or args.profile_out):
+        cli.error("--profile and --profile-out cannot be combined with --watch")
 
     logging.basicConfig(
         level=logging.DEBUG if args.verbose else logging.WARNING,
         format="%(levelname)s %(name)s: %(message)s",
     )
 
-    if not args.dry_run:
+    if args.profile or args.profile_out:
+        from src import profiling
+
+        with profiling.profile(args.profile_out):
+            _run(args)
+    elif args.watch:
+        _watch(args)
+    else:
+        _run(args)
+
+
+def _watch(args: argparse.Namespace) -> None:
+    """Run the pipeline, then rerun it each time the spec file changes until interrupted.
+
+    The API client, a doc cache and the --max-cost/--max-tokens budget stay alive between
+    runs, so a rerun only calls the API for endpoints whose prompt changed and the limits
+    cap the whole session. A failed run (e.g. a spec saved mid-edit that does not parse) is
+    reported and the watch continues; declining the first run's prompt or pressing Ctrl-C
+    during a run ends it.
+    """
+    from src import generator, watch
+
+    doc_cache = generator.DocCache()
+    budget = None
+    if args.max_cost is not None or args.max_tokens is not None:
+        budget = generator.Budget(max_cost=args.max_cost, max_tokens=args.max_tokens)
+    with watch.FileWatcher(args.spec, debounce=args.debounce) as watcher:
+        warm = False
+        while True:
+            try:
+                _run(args, doc_cache=doc_cache, warm=warm, budget=budget)
+            except _Aborted:
+                return
+            except SystemExit as exc:
+                if exc.code:
+                    print("Run failed; fix the spec and save it to retry.")
+            except KeyboardInterrupt:
+                print()
+                return
+            # Only the first run asks for confirmation and sets up the client.
+            args.yes = True
+            warm = warm or generator.client is not None
+            print(f"\nWatching {args.spec} for changes ({watcher.backend}); Ctrl-C to stop.")
+            try:
+                watcher.wait()
+            except KeyboardInterrupt:
+                print()
+                return
+            print(f"\n{args.spec} changed; regenerating.")
+
+
+def _run(
+    args: argparse.Namespace,
+    doc_cache: "DocCache | None" = None,
+    warm: bool = False,
+    budget: "Budget | None" = None,
+) -> None:
+    """Run the pipeline for parsed arguments.
+
+    With a doc_cache, endpoints (and the overview) whose prompt is cached are not sent to
+    the API. warm=True reuses the already-configured API client. A given budget is charged
+    instead of a fresh one built from --max-cost/--max-tokens.
+    """
+    if not args.dry_run and not (args.enqueue or args.finalize) and not warm:
         api_key = os.environ.get("ANTHROPIC_API_KEY")
         if not api_key:
             print(
@@ -78,9 +423,30 @@ def main() -> None:
                 file=sys.stderr,
             )
             sys.exit(1)
+        pool_size = args.pool_size or args.concurrency * (2 if args.hedge else 1)
+        if pool_size < args.concurrency:
+            print(
+                f"Warning: --pool-size {pool_size} is below --concurrency {args.concurrency}; "
+                "calls will queue for connections"
+            )
+        from src import generator
+
+        try:
+            generator.configure_client(
+                base_url=args.base_url,
+                pool_size=pool_size,
+                keepalive_expiry=args.keepalive_expiry,
+                http2=args.http2,
+                connect_timeout=args.connect_timeout,
+                read_timeout=args.read_timeout,
+            )
+        except RuntimeError as exc:
+            print(f"Error: {exc}", file=sys.stderr)
+            sys.exit(1)
 
     try:
-        spec = parser.parse_spec(args.spec)
+        with span("parse"):
+            spec = parser.parse_spec(args.spec)
     except FileNotFoundError as exc:
         print(f"Error: {exc}", file=sys.stderr)
         sys.exit(1)
@@ -90,11 +456,60 @@ def main() -> None:
 
     print(f"{spec.title} v{spec.version} — {len(spec.endpoints)} endpoints found")
 
-    estimated_input = sum(
-        utils.estimate_tokens(prompts.build_endpoint_prompt(ep)) for ep in spec.endpoints
-    ) + utils.estimate_tokens(prompts.build_overview_prompt(spec))
-    estimated_output = 800 * len(spec.endpoints) + 500
-    estimated_cost = utils.estimate_cost(estimated_input, estimated_output, args.model)
+    router = None
+    if args.simple_model:
+        router = routing.ModelRouter(args.simple_model)
+
+    canonicalizer = None
+    if args.dedupe:
+        canonicalizer = routing.EndpointCanonicalizer(args.dedupe_prefix)
+
+    estimate_tokens = utils.estimate_tokens
+    if args.count_tokens and not args.dry_run:
+        from src import generator
+
+        estimate_tokens = utils.MemoizedTokenEstimator(
+            utils.ReconciledTokenEstimator(utils.HeuristicTokenEstimator(), generator.count_tokens)
+        ).count
+
+    history_path = args.history or history.default_history_path(args.output)
+    run_history = history.load_history(history_path)
+
+    with span("prompts"):
+        endpoint_models = [
+            router.route(ep, args.model) if router is not None else args.model
+            for ep in spec.endpoints
+        ]
+        prompt_endpoints = list(spec.endpoints)
+        compressed_refs = []
+        if args.prompt_tokens is not None:
+            for i, ep in enumerate(spec.endpoints):
+                prompt_endpoints[i], steps = prompts.compress_endpoint(
+                    ep, args.prompt_tokens, endpoint_models[i]
+                )
+                if steps:
+                    compressed_refs.append(f"{ep.method.value} {ep.path} ({', '.join(steps)})")
+        endpoint_prompts = [prompts.build_endpoint_prompt(ep) for ep in prompt_endpoints]
+        prompt_hashes = {
+            f"{ep.method.value} {ep.path}": utils.content_hash(ep_model, prompt)
+            for ep, ep_model, prompt in zip(spec.endpoints, endpoint_models, endpoint_prompts)
+        }
+        overview_prompt = prompts.build_overview_prompt(spec)
+        estimated_input = estimate_tokens(overview_prompt, args.model)
+        estimated_output = history.OVERVIEW_OUTPUT_TOKENS
+        estimated_cost = utils.estimate_cost(estimated_input, estimated_output, args.model)
+        generated = range(len(spec.endpoints))
+        if canonicalizer is not None:
+            generated = canonicalizer.classes(spec.endpoints, endpoint_models)
+        for i in generated:
+            ep, prompt, ep_model = spec.endpoints[i], endpoint_prompts[i], endpoint_models[i]
+            in_tok = estimate_tokens(prompt, ep_model)
+            out_tok = history.expected_endpoint_output_tokens(
+                run_history, ep_model, f"{ep.method.value} {ep.path}"
+            )
+            estimated_input += in_tok
+            estimated_output += out_tok
+            estimated_cost += utils.estimate_cost(in_tok, out_tok, ep_model)
 
     if args.dry_run:
         print("\nEndpoints:")
@@ -106,37 +521,260 @@ def main() -> None:
             f"(~{estimated_input + estimated_output:,} tokens)"
         )
         print(f"Model: {args.model}")
+        if canonicalizer is not None:
+            print(f"Unique endpoints after deduplication: {len(generated)}/{len(spec.endpoints)}")
+        if router is not None:
+            simple = endpoint_models.count(args.simple_model)
+            print(f"Simple endpoints routed to {args.simple_model}: {simple}/{len(spec.endpoints)}")
+        if compressed_refs:
+            print(f"Prompts compressed to fit {args.prompt_tokens} tokens:")
+            for ref in compressed_refs:
+                print(f"  {ref}")
         print(f"Output: {args.output} ({args.format})")
         print("\nDry run complete. No API calls were made.")
         sys.exit(0)
 
+    input_hash = utils.content_hash(
+        args.model,
+        args.simple_model or "",
+        "dedupe:" + ",".join(args.dedupe_prefix or []) if args.dedupe else "",
+        f"batch:{args.batch_tokens}" if args.batch_tokens else "",
+        f"prompt:{args.prompt_tokens}" if args.prompt_tokens is not None else "",
+        args.format,
+        prompts.SYSTEM_PROMPT,
+        overview_prompt,
+        *endpoint_prompts,
+    )
+    if args.reproducible and _output_is_current(args.output, input_hash):
+        print(f"Output is up to date: {args.output} (input hash unchanged). Nothing to do.")
+        sys.exit(0)
+
     print(
         f"Estimated cost: ~{utils.format_cost(estimated_cost)} "
         f"(~{estimated_input + estimated_output:,} tokens)"
     )
 
-    if not args.yes:
+    if not args.yes and not args.queue:
         answer = input("Proceed? [y/N]: ").strip().lower()
         if answer != "y":
             print("Aborted.")
-            sys.exit(0)
+            raise _Aborted(0)
 
     start = time.time()
 
-    overview = generator.generate_overview(spec, model=args.model)
-    result = generator.generate_full_docs(spec, model=args.model, stream=args.stream)
+    for ref in compressed_refs:
+        print(f"Compressed prompt for {ref}")
 
-    if args.format == "html":
-        output_text = formatter.format_html(result, overview)
-    else:
-        output_text = formatter.format_markdown(result, overview)
+    # Imported here so --help and --dry-run don't pay for anthropic/httpx/markdown.
+    from src import formatter, generator
+
+    store = SpooledDocStore() if args.spool else None
+    if budget is None and (args.max_cost is not None or args.max_tokens is not None):
+        budget = generator.Budget(max_cost=args.max_cost, max_tokens=args.max_tokens)
+
+    progress_display = None
+    if args.concurrency > 1:
+        from src import progress
+
+        progress_display = progress.create_progress(len(generated))
+
+    recorder = None
+    if args.report or args.metrics_file:
+        from src import telemetry
+
+        recorder = telemetry.RunRecorder()
+
+    hedge = generator.HedgePolicy(max_extra=args.hedge_max_extra) if args.hedge else None
+
+    scheduler = None
+    if args.priority_tag or args.priority_path or args.priority_changed or args.longest_first:
+        changed = None
+        if args.priority_changed:
+            changed = history.changed_endpoints(run_history, prompt_hashes)
+            print(f"Changed since last run: {len(changed)}/{len(spec.endpoints)} endpoint(s)")
+        scheduler = routing.PriorityScheduler(
+            tags=args.priority_tag,
+            paths=args.priority_path,
+            changed=changed,
+            longest_first=args.longest_first,
+        )
 
-    output_dir = os.path.dirname(args.output)
-    if output_dir:
-        os.makedirs(output_dir, exist_ok=True)
+    queue = None
+    if args.queue:
+        from src import workqueue
 
-    with open(args.output, "w", encoding="utf-8") as f:
-        f.write(output_text)
+        if args.batch_tokens or args.dedupe or hedge is not None:
+            print("Warning: --batch-tokens, --dedupe and --hedge do not apply in queue mode")
+        queue = workqueue.WorkQueue(args.queue)
+
+    if args.enqueue:
+        output_caps = generator.OutputCapPredictor(run_history)
+        caps = [
+            output_caps.predict(ep, ep_model)
+            for ep, ep_model in zip(spec.endpoints, endpoint_models)
+        ]
+        order = None
+        if scheduler is not None:
+            sizes = [
+                output_caps.expected(ep, ep_model)
+                for ep, ep_model in zip(spec.endpoints, endpoint_models)
+            ]
+            units = scheduler.order([[i] for i in range(len(caps))], spec.endpoints, sizes)
+            order = [unit[0] for unit in units]
+        jobs = workqueue.build_jobs(
+            spec, endpoint_models, endpoint_prompts, caps, overview_prompt, args.model, order
+        )
+        meta = {
+            "title": spec.title,
+            "version": spec.version,
+            "model": args.model,
+            "input_hash": input_hash,
+        }
+        try:
+            added = queue.enqueue(jobs, meta)
+        except ValueError as exc:
+            print(f"Error: {exc}", file=sys.stderr)
+            sys.exit(1)
+        if added:
+            print(f"Queued {added} job(s) in {args.queue}")
+        else:
+            print(f"{args.queue} already holds this run; nothing queued")
+        sys.exit(0)
+
+    if args.work:
+        worker_id = args.worker_id or workqueue.default_worker_id()
+        print(f"Worker {worker_id} claiming jobs from {args.queue}")
+
+        def report(job: workqueue.Job, stored: bool) -> None:
+            note = "" if stored else " (lease lost; result discarded)"
+            print(f"  Done: {job.endpoint_ref}{note}")
+
+        try:
+            done = workqueue.work(
+                queue,
+                worker_id,
+                lease_seconds=args.lease,
+                stream=False,
+                concurrency=args.concurrency,
+                on_done=report,
+            )
+        except RuntimeError as exc:
+            print(f"Error: {exc}", file=sys.stderr)
+            sys.exit(1)
+        counts = queue.counts()
+        print(
+            f"\nWorker finished {done} job(s) in {time.time() - start:.1f}s. Queue: "
+            f"{counts['done']} done, {counts['failed']} failed"
+        )
+        sys.exit(0)
+
+    if args.finalize:
+        queued_hash = queue.meta().get("input_hash")
+        if queued_hash is not None and queued_hash != input_hash:
+            print(
+                f"Error: {args.queue} holds a run for different inputs; finalize with the "
+                "spec and options it was enqueued with",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+
+    with span("generate"):
+        if queue is not None:
+            try:
+                result, overview = workqueue.assemble(queue)
+            except ValueError as exc:
+                print(f"Error: {exc}", file=sys.stderr)
+                sys.exit(1)
+            overview_complete = overview != workqueue.MISSING_OVERVIEW
+            if store is not None:
+                for doc in result.docs:
+                    store.append(doc)
+                result.docs = []
+        else:
+            overview_complete = True
+            try:
+                overview = generator.generate_overview(
+                    spec, model=args.model, budget=budget, recorder=recorder, doc_cache=doc_cache
+                )
+            except generator.BudgetExceeded:
+                overview = "_Overview not generated: the budget was exhausted._"
+                overview_complete = False
+            result = generator.generate_full_docs(
+                spec,
+                model=args.model,
+                stream=args.stream,
+                store=store,
+                budget=budget,
+                router=router,
+                batch_tokens=args.batch_tokens,
+                canonicalizer=canonicalizer,
+                max_prompt_tokens=args.prompt_tokens,
+                output_caps=generator.OutputCapPredictor(run_history),
+                concurrency=args.concurrency,
+                progress=progress_display,
+                recorder=recorder,
+                hedge=hedge,
+                scheduler=scheduler,
+                doc_cache=doc_cache,
+                prompt_endpoints=prompt_endpoints,
+            )
+    documented_count = len(store) if store is not None else len(result.docs)
+    complete = not result.pending and documented_count == len(spec.endpoints)
+    if args.reproducible and overview_complete and complete:
+        # Only a complete output may claim the inputs' hash; otherwise the next run would
+        # treat it as up to date and never fill in the pending or skipped endpoints.
+        result.input_hash = input_hash
+
+    with span("format"):
+        output_text = None
+        if args.format == "html":
+            output_text = formatter.format_html(
+                result, overview, reproducible=args.reproducible, docs=store
+            )
+        elif store is None:
+            output_text = formatter.format_markdown(
+                result, overview, reproducible=args.reproducible
+            )
+
+        output_dir = os.path.dirname(args.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        with utils.atomic_write(args.output) as f:
+            if output_text is None:
+                formatter.write_markdown(
+                    result, overview, f, reproducible=args.reproducible, docs=store
+                )
+            else:
+                f.write(output_text)
+    with span("history"):
+        docs = store.records if store is not None else result.docs
+        documented = {doc.endpoint_ref for doc in docs}
+        updated = history.record_run(run_history, docs) + history.record_prompts(
+            run_history, {ref: h for ref, h in prompt_hashes.items() if ref in documented}
+        )
+        if updated:
+            try:
+                history.save_history(history_path, run_history)
+            except OSError as exc:
+                logging.getLogger(__name__).warning("Could not save run history: %s", exc)
+    if store is not None:
+        store.close()
+    if args.report:
+        try:
+            telemetry.write_report(args.report, recorder.report())
+        except OSError as exc:
+            logging.getLogger(__name__).warning("Could not write run report: %s", exc)
+    if args.metrics_file:
+        from src import metrics
+
+        labels = {"spec": os.path.basename(args.spec)}
+        try:
+            metrics.write_metrics(
+                args.metrics_file, metrics.render_metrics(recorder, result, labels)
+            )
+        except OSError as exc:
+            logging.getLogger(__name__).warning("Could not write metrics file: %s", exc)
 
     elapsed = time.time() - start
     cost_str = utils.format_cost(result.total_cost_usd)
@@ -144,6 +782,17 @@ def main() -> None:
         f"\nDone! Output written to: {args.output}\n"
         f"  Tokens: {result.total_tokens:,}  |  Cost: {cost_str}  |  Time: {elapsed:.1f}s"
     )
+    if result.pending:
+        print(f"  Budget reached: {len(result.pending)} endpoint(s) pending")
+    if result.compressed:
+        print(f"  Compressed prompts: {len(result.compressed)} endpoint(s)")
+    if hedge is not None and hedge.hedges:
+        print(
+            f"  Hedged calls: {hedge.hedges} ({hedge.wins} finished first), "
+            f"extra cost ~{utils.format_cost(hedge.extra_cost)}"
+        )
+    if args.report:
+        print(f"  Run report: {args.report}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+import os
+import time
+from collections import Counter, defaultdict
+
+from src.models import GenerationResult
+from src.utils import atomic_write
+from src.telemetry import RunRecorder
+
+LATENCY_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Family:
+    """One metric family: its HELP/TYPE header and samples."""
+
+    def __init__(self, name: str, kind: str, help_text: str) -> None:
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.samples: list[tuple[str, dict[str, str], float]] = []
+
+    def add(self, value: float, labels: dict[str, str], suffix: str = "") -> None:
+        self.samples.append((self.name + suffix, labels, value))
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples:
+            lines.append(f"{name}{_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+def render_metrics(
+    recorder: RunRecorder,
+    result: GenerationResult | None,
+    labels: dict[str, str] | None = None,
+    now: float | None = None,
+) -> str:
+    """Render a run's metrics in the Prometheus format of node_exporter's textfile collector.
+
+    Request counts, errors by exception class, retries, latency histograms and cache tokens
+    come from the recorder's requests; token and cost totals come from the result's per-model
+    usage. Every sample carries ``labels`` (e.g. the spec name) so many runs can share one
+    textfile directory.
+    """
+    base = dict(labels or {})
+    now = time.time() if now is None else now
+    requests = list(recorder.requests)
+
+    families = {
+        "requests": _Family("docgen_requests_total", "counter", "Generation requests by outcome."),
+        "errors": _Family(
+            "docgen_request_errors_total", "counter", "Failed generation requests by error class."
+        ),
+        "retries": _Family("docgen_retries_total", "counter", "API call retries."),
+        "tokens": _Family("docgen_tokens_total", "counter", "Tokens used, by kind."),
+        "cost": _Family("docgen_cost_usd_total", "counter", "Estimated cost in USD."),
+        "latency": _Family(
+            "docgen_request_duration_seconds", "histogram", "Generation request latency."
+        ),
+        "pending": _Family(
+            "docgen_pending_endpoints", "gauge", "Endpoints left pending by the budget."
+        ),
+        "duration": _Family("docgen_run_duration_seconds", "gauge", "Wall time of the last run."),
+        "last_run": _Family(
+            "docgen_last_run_timestamp_seconds", "gauge", "Unix time the last run finished."
+        ),
+    }
+
+    outcomes = Counter((s.model, s.status) for s in requests)
+    for (model, status), count in sorted(outcomes.items()):
+        families["requests"].add(count, {**base, "model": model, "status": status})
+    errors = Counter((s.model, s.error) for s in requests if s.error)
+    for (model, error), count in sorted(errors.items()):
+        families["errors"].add(count, {**base, "model": model, "error": error})
+
+    retries: Counter[str] = Counter()
+    cache: defaultdict[str, Counter[str]] = defaultdict(Counter)
+    latencies: defaultdict[str, list[float]] = defaultdict(list)
+    for s in requests:
+        retries[s.model] += s.retries
+        cache[s.model]["cache_read"] += s.cache_read_tokens
+        cache[s.model]["cache_creation"] += s.cache_creation_tokens
+        latencies[s.model].append(s.latency_seconds)
+    for model in sorted(retries):
+        families["retries"].add(retries[model], {**base, "model": model})
+
+    usage = result.model_usage if result is not None else {}
+    for model in sorted(set(usage) | set(cache)):
+        kinds = {
+            "input": usage[model].input_tokens if model in usage else 0,
+            "output": usage[model].output_tokens if model in usage else 0,
+            **cache[model],
+        }
+        for kind, count in kinds.items():
+            families["tokens"].add(count, {**base, "model": model, "kind": kind})
+    for model in sorted(usage):
+        families["cost"].add(usage[model].cost_usd, {**base, "model": model})
+
+    for model in sorted(latencies):
+        values = latencies[model]
+        model_labels = {**base, "model": model}
+        for bound in (*LATENCY_BUCKETS, float("inf")):
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            count = sum(value <= bound for value in values)
+            families["latency"].add(count, {**model_labels, "le": le}, "_bucket")
+        families["latency"].add(sum(values), model_labels, "_sum")
+        families["latency"].add(len(values), model_labels, "_count")
+
+    families["pending"].add(len(result.pending) if result is not None else 0, base)
+    families["duration"].add(time.monotonic() - recorder.started, base)
+    families["last_run"].add(now, base)
+
+    lines = [line for family in families.values() if family.samples for line in family.render()]
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path: str, text: str) -> None:
+    """Atomically replace the textfile at path, so a collector never reads a partial file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with atomic_write(path) as f:
+        f.write(text)
@@ -60,6 +60,14 @@ class GeneratedDoc(BaseModel):
     markdown: str
     tokens_used: int
     model: str
+    output_tokens: int = 0
+
+
+class ModelUsage(BaseModel):
+    docs: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
 
 
 class GenerationResult(BaseModel):
@@ -69,3 +77,26 @@ class GenerationResult(BaseModel):
     total_tokens: int
     total_cost_usd: float
     model: str
+    input_hash: Optional[str] = None
+    pending: list[str] = Field(default_factory=list)
+    model_usage: dict[str, ModelUsage] = Field(default_factory=dict)
+    compressed: list[str] = Field(default_factory=list)
+
+
+class DocEvent(BaseModel):
+    index: int
+    endpoint_ref: str
+    doc: Optional[GeneratedDoc] = None
+    pending: bool = False
+    compressed: bool = False
+    completed: int
+    total: int
+    model_usage: dict[str, ModelUsage] = Field(default_factory=dict)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(u.input_tokens + u.output_tokens for u in self.model_usage.values())
+
+    @property
+    def total_cost_usd(self) -> float:
+        return sum(u.cost_usd for u in self.model_usage.values())
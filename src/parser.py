@@ -6,6 +6,7 @@ from typing import Any, cast
 import yaml
 
 from src.models import APIEndpoint, APISpec, HTTPMethod, Parameter, RequestBody, ResponseInfo
+from src.profiling import span
 
 logger = logging.getLogger(__name__)
 
@@ -195,8 +196,30 @@ def _merge_parameters(path_params: list[dict[str, Any]], op_params: list[dict[st
 
 def parse_spec(file_path: str) -> APISpec:
     """Load, resolve, and parse an OpenAPI spec file into an APISpec model."""
-    raw = _load_file(file_path)
-    resolved = _resolve_refs(raw)
+    with span("parse.load"):
+        raw = _load_file(file_path)
+    return _build_spec(raw)
+
+
+def parse_spec_text(text: str) -> APISpec:
+    """Parse an OpenAPI spec given as JSON or YAML text into an APISpec model."""
+    with span("parse.load"):
+        try:
+            if text.lstrip().startswith("{"):
+                raw = json.loads(text)
+            else:
+                raw = yaml.safe_load(text)
+        except (json.JSONDecodeError, yaml.YAMLError) as exc:
+            raise ValueError(f"Failed to parse spec: {exc}") from exc
+    if not isinstance(raw, dict):
+        raise ValueError("Failed to parse spec: expected a JSON or YAML object")
+    return _build_spec(raw)
+
+
+def _build_spec(raw: dict[str, Any]) -> APISpec:
+    """Resolve $refs in a loaded spec dict and build the APISpec model."""
+    with span("parse.resolve_refs"):
+        resolved = _resolve_refs(raw)
     info: dict[str, Any] = resolved.get("info") or {}
     title = info.get("title")
     version = info.get("version")
@@ -208,11 +231,12 @@ def parse_spec(file_path: str) -> APISpec:
         version = "Unknown"
     servers: list[dict[str, Any]] = resolved.get("servers") or []
     base_url = servers[0].get("url") if servers else None
-    endpoints = _extract_endpoints(resolved)
-    return APISpec(
-        title=title,
-        version=version,
-        description=info.get("description"),
-        base_url=base_url,
-        endpoints=endpoints,
-    )
+    with span("parse.models"):
+        endpoints = _extract_endpoints(resolved)
+        return APISpec(
+            title=title,
+            version=version,
+            description=info.get("description"),
+            base_url=base_url,
+            endpoints=endpoints,
+        )
@@ -0,0 +1,158 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TextIO
+
+COLLAPSED_SUFFIXES = (".folded", ".collapsed")
+
+_active: "PhaseTimer | None" = None
+
+
+@dataclass(slots=True)
+class _Phase:
+    wall: float = 0.0
+    cpu: float = 0.0
+    calls: int = 0
+
+
+class PhaseTimer:
+    """Accumulate wall and CPU time per named phase.
+
+    Phase names are dotted to show nesting (``parse.resolve_refs`` runs inside ``parse``);
+    repeated spans with the same name add up. CPU time is process-wide, so it includes
+    worker threads.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.phases: dict[str, _Phase] = {}
+
+    def begin(self, name: str) -> None:
+        """Register a phase when its first span starts, so the table lists parents first."""
+        with self._lock:
+            self.phases.setdefault(name, _Phase())
+
+    def add(self, name: str, wall: float, cpu: float) -> None:
+        """Add one span's timings to a phase."""
+        with self._lock:
+            phase = self.phases.setdefault(name, _Phase())
+            phase.wall += wall
+            phase.cpu += cpu
+            phase.calls += 1
+
+    def format_table(self, total_wall: float) -> str:
+        """Return the phase breakdown as an aligned text table."""
+        width = max([len("Phase"), *(len(n) + 2 * n.count(".") for n in self.phases)])
+        lines = [f"{'Phase':<{width}}  {'Wall (s)':>9}  {'CPU (s)':>9}  {'Share':>6}  Calls"]
+        for name, phase in self.phases.items():
+            label = "  " * name.count(".") + name
+            share = phase.wall / total_wall if total_wall > 0 else 0.0
+            lines.append(
+                f"{label:<{width}}  {phase.wall:>9.3f}  {phase.cpu:>9.3f}  {share:>6.1%}  "
+                f"{phase.calls}"
+            )
+        lines.append(f"{'total':<{width}}  {total_wall:>9.3f}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the enclosed block as phase name while profiling is on; otherwise do nothing."""
+    timer = _active
+    if timer is None:
+        yield
+        return
+    timer.begin(name)
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+
+class StackSampler:
+    """Sample every thread's Python stack at a fixed interval into collapsed-stack counts.
+
+    Unlike cProfile, which only sees the thread that enabled it, this also covers the
+    generator's worker threads. The output is the ``frame;frame;frame count`` format read
+    by flamegraph.pl, speedscope and similar tools.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    filename = os.path.basename(code.co_filename)
+                    frames.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                frames.append(names.get(ident, "thread"))
+                self.stacks[";".join(reversed(frames))] += 1
+
+    def write_collapsed(self, path: str) -> None:
+        """Write the sampled stacks, most frequent first."""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile(output: str | None = None, out: TextIO | None = None) -> Iterator[PhaseTimer]:
+    """Turn on phase spans for the enclosed block and print the phase table when it ends.
+
+    With output, the block is also profiled: a path ending in .folded or .collapsed gets
+    collapsed stacks from a StackSampler, any other path gets a cProfile pstats dump. The
+    table and files are produced even if the block exits early via sys.exit.
+    """
+    global _active
+    timer = PhaseTimer()
+    sampler = None
+    profiler = None
+    if output and output.endswith(COLLAPSED_SUFFIXES):
+        sampler = StackSampler()
+        sampler.start()
+    elif output:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    _active = timer
+    started = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        total = time.perf_counter() - started
+        _active = None
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(output)
+        if sampler is not None:
+            sampler.stop()
+            sampler.write_collapsed(output)
+        out = out or sys.stdout
+        out.write("\nProfile:\n" + timer.format_table(total) + "\n")
+        if output:
+            out.write(f"Profile data written to: {output}\n")
@@ -0,0 +1,193 @@
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TextIO
+
+_CHARS_PER_TOKEN = 4
+_MAX_STREAM_LINES = 8
+_LABEL_WIDTH = 40
+
+
+@dataclass(slots=True)
+class _Stream:
+    label: str
+    started: float
+    chars: int = 0
+
+    @property
+    def tokens(self) -> float:
+        return self.chars / _CHARS_PER_TOKEN
+
+
+def _format_duration(seconds: float) -> str:
+    """Format seconds as e.g. '45s' or '3m05s'."""
+    seconds = round(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+class ProgressDisplay(ABC):
+    """Thread-safe progress for many endpoint generations in flight at once.
+
+    Workers report start/update/finish/fail events; each event only updates counters under
+    a lock, and the display is redrawn at most once per ``interval`` seconds, so a fast
+    stream costs a few additions per chunk rather than a terminal write. Streamed token
+    counts are approximated from characters until the call reports its real usage.
+    Subclasses decide how a render looks.
+    """
+
+    def __init__(
+        self,
+        total: int,
+        out: TextIO | None = None,
+        interval: float = 0.1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.total = total
+        self.out = out or sys.stderr
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._streams: dict[str, _Stream] = {}
+        self._started = clock()
+        self._last_render = self._started
+        self.completed = 0
+        self.errors = 0
+        self.output_tokens = 0
+
+    def start(self, label: str) -> None:
+        """Record that a call for label has started."""
+        with self._lock:
+            self._streams[label] = _Stream(label, self._clock())
+            self._tick()
+
+    def update(self, label: str, text: str) -> None:
+        """Record a streamed text chunk for label."""
+        with self._lock:
+            stream = self._streams.get(label)
+            if stream is not None:
+                stream.chars += len(text)
+            self._tick()
+
+    def finish(self, label: str, output_tokens: int, count: int = 1) -> None:
+        """Record that label finished, covering count endpoints."""
+        with self._lock:
+            self._streams.pop(label, None)
+            self.completed += count
+            self.output_tokens += output_tokens
+            self._tick()
+
+    def fail(self, label: str, count: int = 1) -> None:
+        """Record that label failed, covering count endpoints."""
+        with self._lock:
+            self._streams.pop(label, None)
+            self.completed += count
+            self.errors += 1
+            self._tick()
+
+    def skip(self, count: int = 1) -> None:
+        """Record endpoints that will not be generated (e.g. left pending by the budget)."""
+        with self._lock:
+            self.completed += count
+            self._tick()
+
+    def log(self, message: str) -> None:
+        """Write a message without corrupting the display."""
+        with self._lock:
+            self._write_message(message)
+
+    def close(self) -> None:
+        """Render the final state."""
+        with self._lock:
+            self._render(self._clock(), final=True)
+
+    def summary(self, now: float | None = None) -> str:
+        """Return a one-line summary: done, active, errors, throughput and ETA."""
+        now = self._clock() if now is None else now
+        elapsed = max(now - self._started, 1e-9)
+        tokens = self.output_tokens + sum(s.tokens for s in self._streams.values())
+        line = (
+            f"{self.completed}/{self.total} done · {len(self._streams)} active · "
+            f"{self.errors} error(s) · {tokens / elapsed:,.0f} tok/s"
+        )
+        if 0 < self.completed < self.total:
+            eta = (self.total - self.completed) * elapsed / self.completed
+            line += f" · ETA {_format_duration(eta)}"
+        return line
+
+    def _tick(self) -> None:
+        now = self._clock()
+        if now - self._last_render >= self.interval:
+            self._last_render = now
+            self._render(now)
+
+    @abstractmethod
+    def _render(self, now: float, final: bool = False) -> None:
+        """Draw the current state; final=True for the last render at close()."""
+
+    def _write_message(self, message: str) -> None:
+        self.out.write(message + "\n")
+        self.out.flush()
+
+
+class LiveProgress(ProgressDisplay):
+    """Redraw a summary line plus one status line per in-flight stream (for terminals)."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._drawn = 0
+
+    def _lines(self, now: float) -> list[str]:
+        lines = [self.summary(now)]
+        streams = list(self._streams.values())
+        for stream in streams[:_MAX_STREAM_LINES]:
+            elapsed = max(now - stream.started, 1e-9)
+            lines.append(
+                f"  {stream.label[:_LABEL_WIDTH]:<{_LABEL_WIDTH}} {stream.tokens:>7,.0f} tok "
+                f"{stream.tokens / elapsed:>7,.1f} tok/s {elapsed:>6.1f}s"
+            )
+        if len(streams) > _MAX_STREAM_LINES:
+            lines.append(f"  … {len(streams) - _MAX_STREAM_LINES} more")
+        return lines
+
+    def _clear(self) -> None:
+        if self._drawn:
+            self.out.write(f"\x1b[{self._drawn}F\x1b[J")
+            self._drawn = 0
+
+    def _render(self, now: float, final: bool = False) -> None:
+        self._clear()
+        lines = [self.summary(now)] if final else self._lines(now)
+        self.out.write("\n".join(lines) + "\n")
+        self.out.flush()
+        self._drawn = 0 if final else len(lines)
+
+    def _write_message(self, message: str) -> None:
+        # Redraw straight away: nothing redraws on a timer, and the next progress update
+        # may be a long call away. Only redraws triggered by updates are throttled.
+        self._clear()
+        self.out.write(message + "\n")
+        self._render(self._clock())
+
+
+class LogProgress(ProgressDisplay):
+    """Print a one-line summary every ``interval`` seconds (for CI logs and other non-TTYs)."""
+
+    def __init__(self, *args, interval: float = 10.0, **kwargs) -> None:
+        super().__init__(*args, interval=interval, **kwargs)
+
+    def _render(self, now: float, final: bool = False) -> None:
+        self.out.write(self.summary(now) + "\n")
+        self.out.flush()
+
+
+def create_progress(total: int, out: TextIO | None = None) -> ProgressDisplay:
+    """Return a live display when out is a terminal and periodic summaries otherwise."""
+    out = out or sys.stderr
+    if out.isatty():
+        return LiveProgress(total, out)
+    return LogProgress(total, out)
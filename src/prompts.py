@@ -1,3 +1,6 @@
+import re
+
+from src import utils
 from src.models import APIEndpoint, APISpec
 
 SYSTEM_PROMPT = """You are a senior technical writer specializing in API documentation.
@@ -15,11 +18,20 @@ Guidelines:
 """
 
 
-def build_endpoint_prompt(endpoint: APIEndpoint) -> str:
-    """Build the user-turn prompt asking the LLM to document a single API endpoint."""
+_ENDPOINT_INSTRUCTIONS = (
+    "complete documentation for this endpoint including: a description of its purpose "
+    "and use cases, a realistic request example with domain-appropriate sample values, a "
+    "realistic response example, common error codes and how to handle them, and any practical "
+    "tips for developers."
+)
+
+BATCH_SECTION_RE = re.compile(r"^=== DOC (\d+) ===[ \t]*$", re.MULTILINE)
+
+
+def _describe_endpoint(endpoint: APIEndpoint) -> list[str]:
+    """Return the prompt lines describing an endpoint's method, path, parameters and schemas."""
     lines: list[str] = []
 
-    lines.append(f"Document the following API endpoint:\n")
     lines.append(f"**Method:** {endpoint.method.value}")
     lines.append(f"**Path:** {endpoint.path}")
 
@@ -63,11 +75,133 @@ def build_endpoint_prompt(endpoint: APIEndpoint) -> str:
             schema = f" — {response.schema_summary}" if response.schema_summary else ""
             lines.append(f"- `{response.status_code}`: {response.description}{schema}")
 
+    return lines
+
+
+def build_endpoint_prompt(endpoint: APIEndpoint) -> str:
+    """Build the user-turn prompt asking the LLM to document a single API endpoint."""
+    lines: list[str] = []
+
+    lines.append(f"Document the following API endpoint:\n")
+    lines.extend(_describe_endpoint(endpoint))
+    lines.append(f"\nWrite {_ENDPOINT_INSTRUCTIONS}")
+
+    return "\n".join(lines)
+
+
+_ENUM_KEEP = 5
+
+
+def _collapse_schema(summary: str, max_depth: int) -> str:
+    """Replace every object nested deeper than max_depth in a schema summary with ``{…}``."""
+    out: list[str] = []
+    depth = 0
+    for ch in summary:
+        if ch == "{":
+            depth += 1
+            if depth == max_depth + 1:
+                out.append("{…}")
+            elif depth <= max_depth:
+                out.append(ch)
+        elif ch == "}":
+            if depth <= max_depth:
+                out.append(ch)
+            depth -= 1
+        elif depth <= max_depth:
+            out.append(ch)
+    return "".join(out)
+
+
+def _schema_depth(summary: str) -> int:
+    """Return the maximum brace nesting depth of a schema summary."""
+    depth = deepest = 0
+    for ch in summary:
+        if ch == "{":
+            depth += 1
+            deepest = max(deepest, depth)
+        elif ch == "}":
+            depth -= 1
+    return deepest
+
+
+def compress_endpoint(
+    endpoint: APIEndpoint, max_tokens: int, model: str = "claude"
+) -> tuple[APIEndpoint, list[str]]:
+    """Shrink an endpoint until its prompt fits max_tokens, returning it and the steps applied.
+
+    Steps are applied in order until the prompt fits: long enum lists are cut to their first
+    few values, descriptions of optional parameters are dropped, then nested objects in
+    request/response schema summaries are collapsed one level at a time. The endpoint is
+    returned unchanged with no steps if it already fits; if nothing makes it fit, the most
+    compressed form is returned.
+    """
+    def fits(candidate: APIEndpoint) -> bool:
+        return utils.estimate_tokens(build_endpoint_prompt(candidate), model) <= max_tokens
+
+    if fits(endpoint):
+        return endpoint, []
+    compressed = endpoint.model_copy(deep=True)
+    steps: list[str] = []
+
+    long_enums = [p for p in compressed.parameters if p.enum and len(p.enum) > _ENUM_KEEP]
+    for param in long_enums:
+        hidden = len(param.enum) - _ENUM_KEEP
+        param.enum = param.enum[:_ENUM_KEEP] + [f"… (+{hidden} more)"]
+    if long_enums:
+        steps.append("enum lists elided")
+        if fits(compressed):
+            return compressed, steps
+
+    optional = [p for p in compressed.parameters if not p.required and p.description]
+    for param in optional:
+        param.description = None
+    if optional:
+        steps.append("optional parameter descriptions dropped")
+        if fits(compressed):
+            return compressed, steps
+
+    summaries = [r for r in compressed.responses if r.schema_summary]
+    deepest = max(
+        [_schema_depth(r.schema_summary) for r in summaries]
+        + (
+            [_schema_depth(compressed.request_body.schema_summary)]
+            if compressed.request_body
+            else [0]
+        )
+    )
+    for depth in range(deepest - 1, -1, -1):
+        if compressed.request_body:
+            compressed.request_body.schema_summary = _collapse_schema(
+                compressed.request_body.schema_summary, depth
+            )
+        for response in summaries:
+            response.schema_summary = _collapse_schema(response.schema_summary, depth)
+        if fits(compressed):
+            steps.append(f"schemas collapsed to depth {depth}")
+            return compressed, steps
+    if deepest:
+        steps.append("schemas collapsed to depth 0")
+    return compressed, steps
+
+
+def build_batch_prompt(endpoints: list[APIEndpoint]) -> str:
+    """Build a user-turn prompt asking the LLM to document several endpoints in one response.
+
+    The response is expected to contain one section per endpoint, each introduced by a
+    ``=== DOC n ===`` line (matched by BATCH_SECTION_RE) in endpoint order.
+    """
+    lines: list[str] = []
+
+    lines.append(f"Document each of the following {len(endpoints)} API endpoints.")
+    for n, endpoint in enumerate(endpoints, 1):
+        lines.append(f"\n--- Endpoint {n} ---")
+        lines.extend(_describe_endpoint(endpoint))
+
     lines.append(
-        "\nWrite complete documentation for this endpoint including: a description of its purpose "
-        "and use cases, a realistic request example with domain-appropriate sample values, a "
-        "realistic response example, common error codes and how to handle them, and any practical "
-        "tips for developers."
+        f"\nFor each endpoint, write {_ENDPOINT_INSTRUCTIONS}"
+        "\n\nStart each endpoint's documentation with a line containing exactly `=== DOC n ===`, "
+        "where n is the endpoint number above, in the same order. Write nothing before the first "
+        "marker and do not repeat the markers anywhere else."
     )
 
     return "\n".join(lines)
@@ -0,0 +1,149 @@
+"""Endpoint routing, deduplication and scheduling decisions that need no API access.
+
+Kept apart from src.generator so --dry-run can route and deduplicate endpoints without
+importing the Anthropic SDK.
+"""
+import re
+
+from src import prompts, utils
+from src.models import APIEndpoint
+
+
+class ModelRouter:
+    """Route simple endpoints to a cheaper model and everything else to the run's default.
+
+    An endpoint's complexity score is one point per parameter and per response, two for a
+    request body, plus one per 80 characters of request/response schema summary. Endpoints
+    scoring at or below ``max_simple_score`` go to ``simple_model``; a GET with a single
+    path parameter and one small 200 response scores 2.
+    """
+
+    def __init__(self, simple_model: str, max_simple_score: int = 3) -> None:
+        self.simple_model = simple_model
+        self.max_simple_score = max_simple_score
+
+    @staticmethod
+    def score(endpoint: APIEndpoint) -> int:
+        """Return the complexity score for an endpoint."""
+        score = len(endpoint.parameters) + len(endpoint.responses)
+        if endpoint.request_body:
+            score += 2 + len(endpoint.request_body.schema_summary) // 80
+        for response in endpoint.responses:
+            score += len(response.schema_summary or "") // 80
+        return score
+
+    def route(self, endpoint: APIEndpoint, default_model: str) -> str:
+        """Return the model to use for an endpoint."""
+        if self.score(endpoint) <= self.max_simple_score:
+            return self.simple_model
+        return default_model
+
+
+_VERSION_PREFIX_PATTERN = r"^/v\d+(?=/)"
+_VERSION_NAME_RE = re.compile(r"_?[Vv]\d+(?=[A-Z_]|$)")
+
+
+class EndpointCanonicalizer:
+    """Find endpoints that differ only by a path prefix so each class is generated once.
+
+    Each prefix pattern is a regex matched at the start of the path (default: a ``/v1``
+    style version segment); the first match is stripped from the endpoint's canonical form.
+    With normalize_names, version markers such as ``V2`` are also dropped from operation
+    IDs. Endpoints that share a model and an identical canonical prompt form one class.
+    """
+
+    def __init__(
+        self, prefix_patterns: list[str] | None = None, normalize_names: bool = True
+    ) -> None:
+        self._prefix_res = [re.compile(p) for p in prefix_patterns or [_VERSION_PREFIX_PATTERN]]
+        self.normalize_names = normalize_names
+
+    def split_prefix(self, path: str) -> tuple[str, str]:
+        """Return (prefix, remainder) for a path; the prefix is empty if no pattern matches."""
+        for pattern in self._prefix_res:
+            match = pattern.match(path)
+            if match:
+                return match.group(0), path[match.end():]
+        return "", path
+
+    def canonical(self, endpoint: APIEndpoint) -> APIEndpoint:
+        """Return a copy of the endpoint with its prefix and (optionally) name versions removed."""
+        _, path = self.split_prefix(endpoint.path)
+        operation_id = endpoint.operation_id
+        if operation_id and self.normalize_names:
+            operation_id = _VERSION_NAME_RE.sub("", operation_id)
+        return endpoint.model_copy(update={"path": path, "operation_id": operation_id})
+
+    def classes(self, endpoints: list[APIEndpoint], models: list[str]) -> dict[int, list[int]]:
+        """Map the index of each class's first endpoint to the indices of its duplicates."""
+        first_by_key: dict[str, int] = {}
+        classes: dict[int, list[int]] = {}
+        for i, (endpoint, model) in enumerate(zip(endpoints, models)):
+            key = utils.content_hash(model, prompts.build_endpoint_prompt(self.canonical(endpoint)))
+            if key in first_by_key:
+                classes[first_by_key[key]].append(i)
+            else:
+                first_by_key[key] = i
+                classes[i] = []
+        return classes
+
+    def retarget(self, markdown: str, source: APIEndpoint, target: APIEndpoint) -> str:
+        """Rewrite a doc generated for source so its paths and operation ID name target."""
+        source_prefix, rest = self.split_prefix(source.path)
+        target_prefix, _ = self.split_prefix(target.path)
+        if source_prefix != target_prefix:
+            lead = "/" + rest.strip("/").split("/", 1)[0]
+            pattern = re.escape(source_prefix) + "(?=" + re.escape(lead) + ")"
+            markdown = re.sub(pattern, lambda _: target_prefix, markdown)
+        if source.operation_id and target.operation_id:
+            # Whole identifiers only: getUser must not rewrite getUsers or getUserById.
+            pattern = r"(?<!\w)" + re.escape(source.operation_id) + r"(?!\w)"
+            markdown = re.sub(pattern, lambda _: target.operation_id, markdown)
+        return markdown
+
+
+class PriorityScheduler:
+    """Order generation so the most important docs are produced first.
+
+    Endpoints are ranked by, in turn: the first of their tags found in ``tags`` (earlier
+    tags first), the first regex in ``paths`` their path matches (earlier first), whether
+    their ref is in ``changed`` (e.g. prompts changed since the last run), and, with
+    longest_first, their expected size (largest first, which shortens the makespan of a
+    concurrent run). Ties keep spec order. A batch takes the rank of its best endpoint.
+    """
+
+    def __init__(
+        self,
+        tags: list[str] | None = None,
+        paths: list[str] | None = None,
+        changed: set[str] | None = None,
+        longest_first: bool = False,
+    ) -> None:
+        self.tags = list(tags or [])
+        self._path_res = [re.compile(p) for p in paths or []]
+        self.changed = changed
+        self.longest_first = longest_first
+
+    def rank(self, endpoint: APIEndpoint) -> tuple[int, int, int]:
+        """Return an endpoint's (tag, path, changed) rank; lower ranks are generated first."""
+        tag_rank = min(
+            (self.tags.index(tag) for tag in endpoint.tags if tag in self.tags),
+            default=len(self.tags),
+        )
+        path_rank = next(
+            (n for n, pattern in enumerate(self._path_res) if pattern.search(endpoint.path)),
+            len(self._path_res),
+        )
+        ref = f"{endpoint.method.value} {endpoint.path}"
+        changed_rank = 0 if self.changed is None or ref in self.changed else 1
+        return tag_rank, path_rank, changed_rank
+
+    def order(
+        self, units: list[list[int]], endpoints: list[APIEndpoint], sizes: list[float]
+    ) -> list[list[int]]:
+        """Return units sorted by rank; sizes are the expected output tokens per endpoint."""
+        def unit_key(unit: list[int]) -> tuple[tuple[int, int, int], float, int]:
+            size = sum(sizes[i] for i in unit) if self.longest_first else 0
+            return min(self.rank(endpoints[i]) for i in unit), -size, unit[0]
+
+        return sorted(units, key=unit_key)
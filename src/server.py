@@ -0,0 +1,438 @@
+"""Long-running HTTP service that generates docs for posted specs.
+
+Start it with ``python -m src.main serve``. Every job shares one pool of API-call threads
+(so the service as a whole never has more than ``concurrency`` calls in flight, whatever
+the number of jobs), one API client with warm connections, one doc cache (an endpoint
+whose prompt was already generated for any job is reused) and one parsed-spec cache.
+A call backing off after a 429 keeps its pool slot while it waits, so when the API pushes
+back the whole service slows down with it. Finished jobs are kept for the most recent
+``job_retention`` jobs and then dropped. Routes:
+
+- ``POST /jobs?model=...&format=markdown|html``: body is a JSON or YAML OpenAPI spec;
+  returns 202 with the job, including its ``id``
+- ``GET /jobs`` and ``GET /jobs/{id}``: status, progress, tokens and cost so far
+- ``GET /jobs/{id}/docs?since=N``: docs finished so far (in spec order), from the N-th
+  (400 unless N is a non-negative integer)
+- ``GET /jobs/{id}/events``: newline-delimited JSON, one line per doc as it finishes and a
+  final line with the job status
+- ``GET /jobs/{id}/output``: the formatted Markdown or HTML once the job is done (409 before)
+- ``GET /stats``: jobs by status, cache sizes and hit counts
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from src import formatter, generator, parser, utils
+from src.models import APISpec, GeneratedDoc, GenerationResult
+from src.progress import ProgressDisplay
+from src.telemetry import RunRecorder
+
+logger = logging.getLogger(__name__)
+
+_JOB_PATH_RE = re.compile(r"^/jobs/([\w-]+)(?:/(docs|events|output))?$")
+_FORMATS = {"markdown": "text/markdown; charset=utf-8", "html": "text/html; charset=utf-8"}
+
+
+class _JobProgress(ProgressDisplay):
+    """Progress counters for one job; messages go to the service log instead of a terminal."""
+
+    def __init__(self, job_id: str, total: int) -> None:
+        super().__init__(total)
+        self.job_id = job_id
+
+    def _render(self, now: float, final: bool = False) -> None:
+        pass
+
+    def _write_message(self, message: str) -> None:
+        logger.info("[%s] %s", self.job_id, message)
+
+
+class Job:
+    """One posted spec: its options, docs released so far and, once done, the output.
+
+    A Job is also the store generate_full_docs appends finished docs to, so docs become
+    visible to pollers and event streams as soon as they are released in spec order.
+    """
+
+    def __init__(self, spec: APISpec, model: str, output_format: str) -> None:
+        self.id = uuid.uuid4().hex[:12]
+        self.spec = spec
+        self.model = model
+        self.format = output_format
+        self.status = "queued"
+        self.created = time.time()
+        self.started: float | None = None
+        self.finished: float | None = None
+        self.error: str | None = None
+        self.docs: list[GeneratedDoc] = []
+        self.result: GenerationResult | None = None
+        self.output: str | None = None
+        self.recorder = RunRecorder()
+        self.progress = _JobProgress(self.id, len(spec.endpoints))
+        self._changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def append(self, doc: GeneratedDoc) -> None:
+        with self._changed:
+            self.docs.append(doc)
+            self._changed.notify_all()
+
+    def __iter__(self) -> Iterator[GeneratedDoc]:
+        return iter(list(self.docs))
+
+    def set_status(self, status: str, error: str | None = None) -> None:
+        with self._changed:
+            self.status = status
+            self.error = error
+            if status == "running":
+                self.started = time.time()
+            elif self.done:
+                self.finished = time.time()
+            self._changed.notify_all()
+
+    def wait(self, seen: int, timeout: float) -> None:
+        """Block until more than seen docs exist, the job finishes, or timeout passes."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.docs) > seen or self.done, timeout)
+
+    def cost_usd(self) -> float:
+        """Cost of every call made for this job so far, including discarded responses."""
+        return sum(
+            utils.estimate_cost(s.input_tokens, s.output_tokens, s.model)
+            for s in list(self.recorder.requests)
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        requests = list(self.recorder.requests)
+        end = self.finished or time.time()
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "title": self.spec.title,
+            "version": self.spec.version,
+            "model": self.model,
+            "format": self.format,
+            "endpoints": len(self.spec.endpoints),
+            "docs_done": len(self.docs),
+            "progress": self.progress.summary(),
+            "requests": len(requests),
+            "retries": sum(s.retries for s in requests),
+            "input_tokens": sum(s.input_tokens for s in requests),
+            "output_tokens": sum(s.output_tokens for s in requests),
+            "cost_usd": round(self.cost_usd(), 6),
+            "pending": self.result.pending if self.result is not None else [],
+            "created": self.created,
+            "elapsed_seconds": round(end - (self.started or end), 3),
+        }
+
+
+def _doc_event(index: int, doc: GeneratedDoc) -> dict[str, Any]:
+    return {"index": index, **doc.model_dump()}
+
+
+class DocService:
+    """Jobs, the shared API-call pool and the caches behind the HTTP API."""
+
+    def __init__(
+        self,
+        model: str,
+        concurrency: int = 8,
+        max_jobs: int = 4,
+        spec_cache_size: int = 64,
+        doc_cache_size: int = 10_000,
+        job_retention: int = 256,
+    ) -> None:
+        self.model = model
+        self.doc_cache = generator.DocCache(doc_cache_size)
+        self.calls = ThreadPoolExecutor(concurrency, thread_name_prefix="docgen-call")
+        self._runner = ThreadPoolExecutor(max_jobs, thread_name_prefix="docgen-job")
+        self.spec_cache_size = spec_cache_size
+        self.spec_hits = 0
+        self._specs: OrderedDict[str, APISpec] = OrderedDict()
+        self.jobs: dict[str, Job] = {}
+        self.job_retention = job_retention
+        self._finished: deque[str] = deque()
+        self._evicted_cost = 0.0
+        self._lock = threading.Lock()
+
+    def parse(self, text: str) -> APISpec:
+        """Parse spec text, reusing the result for text seen before. Raises ValueError."""
+        key = utils.content_hash(text)
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is not None:
+                self._specs.move_to_end(key)
+                self.spec_hits += 1
+                return spec
+        spec = parser.parse_spec_text(text)
+        with self._lock:
+            self._specs[key] = spec
+            while len(self._specs) > self.spec_cache_size:
+                self._specs.popitem(last=False)
+        return spec
+
+    def submit(self, text: str, model: str | None = None, output_format: str = "markdown") -> Job:
+        """Parse a spec and queue a job for it; ValueError for a bad spec, format or model."""
+        if output_format not in _FORMATS:
+            raise ValueError(f"Unknown format '{output_format}'; use markdown or html")
+        model = model or self.model
+        if model not in utils.PRICING:
+            raise ValueError(f"Unknown model '{model}'; use one of {', '.join(utils.PRICING)}")
+        job = Job(self.parse(text), model, output_format)
+        with self._lock:
+            self.jobs[job.id] = job
+        self._runner.submit(self._run, job)
+        return job
+
+    def _run(self, job: Job) -> None:
+        job.set_status("running")
+        try:
+            overview = self.calls.submit(
+                generator.generate_overview,
+                job.spec,
+                job.model,
+                recorder=job.recorder,
+                doc_cache=self.doc_cache,
+            ).result()
+            result = generator.generate_full_docs(
+                job.spec,
+                model=job.model,
+                stream=False,
+                store=job,
+                progress=job.progress,
+                recorder=job.recorder,
+                doc_cache=self.doc_cache,
+                executor=self.calls,
+            )
+            if job.format == "html":
+                job.output = formatter.format_html(result, overview, docs=job)
+            else:
+                job.output = formatter.format_markdown(result, overview, docs=job)
+            job.result = result
+        except Exception as e:
+            logger.exception("Job %s failed", job.id)
+            status, error = "failed", f"{type(e).__name__}: {e}"
+        else:
+            status, error = "done", None
+        # Retire before publishing the status, so clients that saw it finish see the eviction.
+        self._retire(job)
+        job.set_status(status, error)
+
+    def _retire(self, job: Job) -> None:
+        """Record a finished job, dropping the oldest finished ones beyond job_retention."""
+        with self._lock:
+            self._finished.append(job.id)
+            while len(self._finished) > self.job_retention:
+                old = self.jobs.pop(self._finished.popleft())
+                self._evicted_cost += old.cost_usd()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            jobs = list(self.jobs.values())
+            specs = len(self._specs)
+            evicted_cost = self._evicted_cost
+        return {
+            "jobs": dict(Counter(job.status for job in jobs)),
+            "cost_usd": round(evicted_cost + sum(job.cost_usd() for job in jobs), 6),
+            "spec_cache": {"size": specs, "hits": self.spec_hits},
+            "doc_cache": {"size": len(self.doc_cache), "hits": self.doc_cache.hits},
+        }
+
+    def close(self) -> None:
+        self._runner.shutdown(wait=False, cancel_futures=True)
+        self.calls.shutdown(wait=False, cancel_futures=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "DocServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status: int, body: Any) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, message: str) -> None:
+        self._send_json(status, {"error": message})
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        if url.path != "/jobs":
+            self._error(404, f"No route for POST {url.path}")
+            return
+        query = parse_qs(url.query)
+        length = int(self.headers.get("Content-Length") or 0)
+        text = self.rfile.read(length).decode("utf-8", errors="replace")
+        try:
+            job = self.server.service.submit(
+                text,
+                model=query.get("model", [None])[0],
+                output_format=query.get("format", ["markdown"])[0],
+            )
+        except ValueError as exc:
+            self._error(400, str(exc))
+            return
+        self._send_json(202, job.to_dict())
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        service = self.server.service
+        if url.path == "/stats":
+            self._send_json(200, service.stats())
+            return
+        if url.path == "/jobs":
+            self._send_json(200, [job.to_dict() for job in list(service.jobs.values())])
+            return
+        match = _JOB_PATH_RE.match(url.path)
+        job = service.jobs.get(match.group(1)) if match else None
+        if job is None:
+            self._error(404, f"No such job or route: {url.path}")
+            return
+        view = match.group(2)
+        if view is None:
+            self._send_json(200, job.to_dict())
+        elif view == "docs":
+            value = parse_qs(url.query).get("since", ["0"])[0]
+            try:
+                since = int(value)
+            except ValueError:
+                since = -1
+            if since < 0:
+                self._error(400, f"since must be a non-negative integer, not {value!r}")
+                return
+            docs = job.docs[since:]
+            self._send_json(
+                200, [_doc_event(since + n, doc) for n, doc in enumerate(docs)]
+            )
+        elif view == "events":
+            self._stream_events(job)
+        elif not job.done or job.output is None:
+            self._error(409, f"Job {job.id} is {job.status}; no output")
+        else:
+            data = job.output.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", _FORMATS[job.format])
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    def _stream_events(self, job: Job) -> None:
+        """Write one JSON line per doc as the job releases it, then the final status."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.close_connection = True
+        seen = 0
+        while True:
+            done = job.done
+            docs = job.docs[seen:]
+            for doc in docs:
+                self.wfile.write(json.dumps(_doc_event(seen, doc)).encode("utf-8") + b"\n")
+                seen += 1
+            self.wfile.flush()
+            if done:
+                break
+            job.wait(seen, timeout=15)
+        self.wfile.write(json.dumps({"job": job.to_dict()}).encode("utf-8") + b"\n")
+
+
+class DocServer(ThreadingHTTPServer):
+    """HTTP front end for a DocService."""
+
+    daemon_threads = True
+
+    def __init__(self, service: DocService, host: str = "127.0.0.1", port: int = 8080) -> None:
+        super().__init__((host, port), _Handler)
+        self.service = service
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "DocServer":
+        """Serve on a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        self.service.close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "DocServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+
+def main(argv: list[str] | None = None) -> None:
+    p = argparse.ArgumentParser(
+        prog="main.py serve",
+        description="Serve doc generation over HTTP with a shared call pool and caches.",
+    )
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("-m", "--model", default="claude-sonnet-4-6", help="Default model for jobs")
+    p.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="API calls in flight at once across all jobs (default: 8)",
+    )
+    p.add_argument(
+        "--max-jobs", type=int, default=4, help="Jobs generated at once; others queue (default: 4)"
+    )
+    p.add_argument("--base-url", help="Anthropic API base URL, e.g. a local src.fakeapi server")
+    p.add_argument("--verbose", action="store_true", help="Log every job's progress messages")
+    args = p.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    if not os.environ.get("ANTHROPIC_API_KEY"):
+        print(
+            "Error: ANTHROPIC_API_KEY is not set. "
+            "Add it to your .env file or export it as an environment variable.",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    generator.configure_client(base_url=args.base_url, pool_size=args.concurrency)
+    service = DocService(args.model, concurrency=args.concurrency, max_jobs=args.max_jobs)
+    server = DocServer(service, args.host, args.port)
+    print(f"Serving on {server.base_url} (concurrency {args.concurrency}); Ctrl-C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        server.server_close()
+        service.close()
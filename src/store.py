@@ -0,0 +1,81 @@
+import tempfile
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from src.models import GeneratedDoc
+
+
+@dataclass(slots=True, frozen=True)
+class DocRecord:
+    """Compact in-memory metadata for a doc whose Markdown body lives in the spool file."""
+
+    endpoint_ref: str
+    offset: int
+    length: int
+    tokens_used: int
+    model: str
+    output_tokens: int = 0
+
+
+class SpooledDocStore:
+    """Append-only store that spools GeneratedDoc bodies to a temporary file.
+
+    Only a slotted DocRecord per doc stays in memory, so very large runs hold a few hundred
+    bytes per endpoint instead of the full Markdown. Iterating yields GeneratedDoc objects
+    one at a time, reading each body back from disk by offset, and can be repeated.
+    """
+
+    def __init__(self) -> None:
+        self._file = tempfile.TemporaryFile()
+        self._records: list[DocRecord] = []
+        self._end = 0
+
+    def append(self, doc: GeneratedDoc) -> None:
+        """Write a doc's Markdown to the spool file and keep only its metadata in memory."""
+        body = doc.markdown.encode("utf-8")
+        self._file.seek(self._end)
+        self._file.write(body)
+        self._records.append(
+            DocRecord(
+                endpoint_ref=doc.endpoint_ref,
+                offset=self._end,
+                length=len(body),
+                tokens_used=doc.tokens_used,
+                model=doc.model,
+                output_tokens=doc.output_tokens,
+            )
+        )
+        self._end += len(body)
+
+    def read(self, record: DocRecord) -> str:
+        """Return the Markdown body for a record."""
+        self._file.seek(record.offset)
+        return self._file.read(record.length).decode("utf-8")
+
+    @property
+    def records(self) -> list[DocRecord]:
+        """Metadata for every stored doc, in insertion order."""
+        return self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[GeneratedDoc]:
+        for record in self._records:
+            yield GeneratedDoc(
+                endpoint_ref=record.endpoint_ref,
+                markdown=self.read(record),
+                tokens_used=record.tokens_used,
+                model=record.model,
+                output_tokens=record.output_tokens,
+            )
+
+    def close(self) -> None:
+        """Delete the spool file."""
+        self._file.close()
+
+    def __enter__(self) -> "SpooledDocStore":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,136 @@
+import json
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass, field, fields
+from typing import Any
+
+
+@dataclass(slots=True)
+class RequestStats:
+    """Timings and usage for one generation request (an endpoint or a batch).
+
+    Latency covers the whole request, including retries, backoff waits and continuations;
+    ttft_seconds is the time to the first streamed token and stays None without streaming.
+    """
+
+    label: str
+    model: str
+    endpoints: int = 1
+    status: str = "ok"
+    error: str | None = None
+    ttft_seconds: float | None = None
+    latency_seconds: float = 0.0
+    retries: int = 0
+    wait_seconds: float = 0.0
+    hedges: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_creation_tokens: int = 0
+    started: float = field(default_factory=time.monotonic, repr=False)
+
+    def mark_first_token(self) -> None:
+        """Record time-to-first-token, if not already recorded."""
+        if self.ttft_seconds is None:
+            self.ttft_seconds = time.monotonic() - self.started
+
+    def add_cache_usage(self, usage: Any) -> None:
+        """Add the prompt-cache token counts reported in an API usage block."""
+        for name, attr in (
+            ("cache_read_tokens", "cache_read_input_tokens"),
+            ("cache_creation_tokens", "cache_creation_input_tokens"),
+        ):
+            value = getattr(usage, attr, None)
+            if isinstance(value, int):
+                setattr(self, name, getattr(self, name) + value)
+
+    def stop(self, status: str = "ok", error: BaseException | None = None) -> None:
+        """Record the request's outcome and latency."""
+        self.status = status
+        if error is not None:
+            self.error = type(error).__name__
+        self.latency_seconds = time.monotonic() - self.started
+
+    def to_dict(self) -> dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name != "started"}
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Return the q-th percentile (0-100) of values by linear interpolation, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _distribution(values: list[float]) -> dict[str, float | None]:
+    return {f"p{q}": percentile(values, q) for q in (50, 90, 99)}
+
+
+def _summarize(stats: list[RequestStats], wall_seconds: float) -> dict[str, Any]:
+    output_tokens = sum(s.output_tokens for s in stats)
+    return {
+        "requests": len(stats),
+        "errors": sum(s.status == "error" for s in stats),
+        "retries": sum(s.retries for s in stats),
+        "hedges": sum(s.hedges for s in stats),
+        "wait_seconds": sum(s.wait_seconds for s in stats),
+        "latency_seconds": _distribution([s.latency_seconds for s in stats]),
+        "ttft_seconds": _distribution(
+            [s.ttft_seconds for s in stats if s.ttft_seconds is not None]
+        ),
+        "request_output_tokens_per_second": _distribution(
+            [s.output_tokens / s.latency_seconds for s in stats if s.latency_seconds > 0]
+        ),
+        "output_tokens_per_second": output_tokens / wall_seconds if wall_seconds > 0 else None,
+        "tokens": {
+            "input": sum(s.input_tokens for s in stats),
+            "output": output_tokens,
+            "cache_read": sum(s.cache_read_tokens for s in stats),
+            "cache_creation": sum(s.cache_creation_tokens for s in stats),
+        },
+    }
+
+
+class RunRecorder:
+    """Thread-safe collector of RequestStats that builds the JSON run report."""
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self.requests: list[RequestStats] = []
+
+    def record(self, stats: RequestStats) -> None:
+        """Add a finished request."""
+        with self._lock:
+            self.requests.append(stats)
+
+    def report(self, wall_seconds: float | None = None) -> dict[str, Any]:
+        """Return the run report: overall and per-model percentiles, then every request."""
+        if wall_seconds is None:
+            wall_seconds = time.monotonic() - self.started
+        with self._lock:
+            requests = list(self.requests)
+        models = sorted({s.model for s in requests})
+        return {
+            "wall_seconds": wall_seconds,
+            **_summarize(requests, wall_seconds),
+            "models": {
+                model: _summarize([s for s in requests if s.model == model], wall_seconds)
+                for model in models
+            },
+            "requests_detail": [s.to_dict() for s in requests],
+        }
+
+
+def write_report(path: str, report: dict[str, Any]) -> None:
+    """Write a run report as JSON, creating its directory if needed."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
@@ -1,4 +1,15 @@
+import hashlib
+import logging
+import math
+import os
 import re
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import IO, Protocol
+
+logger = logging.getLogger(__name__)
 
 PRICING = {
     "claude-sonnet-4-6": {"input": 3.00, "output": 15.00},
@@ -6,6 +17,20 @@ PRICING = {
 }
 # costs per 1,000,000 tokens
 
+_ANCHOR_STRIP_RE = re.compile(r"[^a-z0-9-]")
+_SLUG_STRIP_RE = re.compile(r"[^\w\- ]")
+_ATX_HEADING_RE = re.compile(r"^ {0,3}#{1,6}[ \t]+(.*?)(?:[ \t]+#+)?[ \t]*$")
+_FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_TOKEN_PIECE_RE = re.compile(r"[^\W\d_]+|\d+|\s+|.", re.DOTALL)
+
+# Per-family coefficients for HeuristicTokenEstimator: characters per token for letter and
+# digit runs, tokens per punctuation/symbol character, and tokens per line break. They are
+# hand-set rules of thumb, not fitted to data; --count-tokens corrects them per run.
+TOKEN_MODELS = {
+    "claude": {"letters": 5.0, "digits": 3.0, "symbol": 0.85, "newline": 1.0},
+}
+_DEFAULT_TOKEN_FAMILY = "claude"
+
 
 def estimate_cost(input_tokens: int, output_tokens: int, model: str) -> float:
     """Calculate the estimated USD cost for a given token usage and model."""
@@ -24,8 +49,48 @@ def sanitize_anchor(text: str) -> str:
     """Convert a string into a URL-safe lowercase anchor slug."""
     text = text.lower()
     text = text.replace(" ", "-")
-    text = re.sub(r"[^a-z0-9-]", "", text)
-    return text
+    return _ANCHOR_STRIP_RE.sub("", text)
+
+
+class AnchorAllocator:
+    """Assign unique heading anchors using the same scheme as GitHub-flavoured Markdown.
+
+    A heading's slug is its lowercased text with punctuation removed and spaces turned into
+    hyphens. The first heading with a given slug keeps it; later ones get ``-1``, ``-2``, ...
+    Allocation must follow document order so the suffixes match what the renderer assigns.
+    """
+
+    def __init__(self) -> None:
+        self._used: set[str] = set()
+        self._counts: dict[str, int] = {}
+
+    def allocate(self, text: str) -> str:
+        """Return a unique anchor for a heading with the given text and mark it as used."""
+        base = _SLUG_STRIP_RE.sub("", text.lower()).replace(" ", "-")
+        anchor = base
+        while anchor in self._used:
+            count = self._counts.get(base, 0) + 1
+            self._counts[base] = count
+            anchor = f"{base}-{count}"
+        self._used.add(anchor)
+        return anchor
+
+    def reserve_headings(self, markdown_text: str) -> None:
+        """Allocate anchors for every ATX heading in a Markdown body, skipping fenced code."""
+        fence: str | None = None
+        for line in markdown_text.splitlines():
+            fence_match = _FENCE_RE.match(line)
+            if fence_match:
+                marker = fence_match.group(1)
+                if fence is None:
+                    fence = marker
+                elif marker[0] == fence[0] and len(marker) >= len(fence) and line.strip() == marker:
+                    fence = None
+                continue
+            if fence is None:
+                heading = _ATX_HEADING_RE.match(line)
+                if heading:
+                    self.allocate(heading.group(1))
 
 
 def create_progress_bar(current: int, total: int) -> str:
@@ -33,6 +98,133 @@ def create_progress_bar(current: int, total: int) -> str:
     return f"[{current}/{total}] Generating..."
 
 
-def estimate_tokens(text: str) -> int:
-    """Rough token estimate based on character count (~4 chars per token)."""
-    return max(1, len(text) // 4)
+class TokenEstimator(Protocol):
+    def count(self, text: str, model: str) -> int: ...
+
+
+def _token_family(model: str) -> str:
+    """Return the TOKEN_MODELS family for a model id, e.g. 'claude' for 'claude-sonnet-4-6'."""
+    family = model.split("-", 1)[0]
+    return family if family in TOKEN_MODELS else _DEFAULT_TOKEN_FAMILY
+
+
+class HeuristicTokenEstimator:
+    """Offline estimate from per-family rates for letter, digit, symbol and newline runs.
+
+    Unlike a flat chars/4 ratio this charges punctuation-heavy text (schemas, code, Markdown
+    markup) per symbol, which is where most of the tokens in our prompts go.
+    """
+
+    def count(self, text: str, model: str) -> int:
+        rates = TOKEN_MODELS[_token_family(model)]
+        tokens = 0.0
+        for piece in _TOKEN_PIECE_RE.findall(text):
+            first = piece[0]
+            if first.isalpha():
+                tokens += math.ceil(len(piece) / rates["letters"])
+            elif first.isdigit():
+                tokens += math.ceil(len(piece) / rates["digits"])
+            elif first.isspace():
+                tokens += piece.count("\n") * rates["newline"]
+            else:
+                tokens += rates["symbol"]
+        return max(1, round(tokens))
+
+
+class ReconciledTokenEstimator:
+    """Scale an offline estimate by its observed error against an exact counter.
+
+    The first ``sample_size`` distinct texts are sent to ``counter`` (e.g. the count_tokens
+    endpoint); the mean ratio of exact to estimated counts then corrects every later estimate
+    without further calls. Counter failures fall back to the uncorrected estimate.
+    """
+
+    def __init__(
+        self,
+        base: TokenEstimator,
+        counter: Callable[[str, str], int],
+        sample_size: int = 5,
+    ) -> None:
+        self._base = base
+        self._counter = counter
+        self._sample_size = sample_size
+        self._ratios: list[float] = []
+
+    def count(self, text: str, model: str) -> int:
+        estimate = self._base.count(text, model)
+        if len(self._ratios) < self._sample_size:
+            try:
+                exact = self._counter(text, model)
+            except Exception as exc:
+                logger.warning("Token counting failed, using offline estimate: %s", exc)
+                self._sample_size = len(self._ratios)
+            else:
+                self._ratios.append(exact / estimate)
+                return exact
+        if not self._ratios:
+            return estimate
+        return max(1, round(estimate * sum(self._ratios) / len(self._ratios)))
+
+
+class MemoizedTokenEstimator:
+    """Cache another estimator's counts by prompt hash so repeated prompts are counted once.
+
+    At most max_entries counts are kept, least recently used first out, so long-lived
+    processes (serve, --watch) don't grow the cache with every prompt they have seen.
+    """
+
+    def __init__(self, inner: TokenEstimator, max_entries: int = 4096) -> None:
+        self._inner = inner
+        self._max_entries = max_entries
+        self._cache: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, text: str, model: str) -> int:
+        key = content_hash(model, text)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        tokens = self._inner.count(text, model)
+        with self._lock:
+            self._cache[key] = tokens
+            while len(self._cache) > self._max_entries:
+                self._cache.popitem(last=False)
+        return tokens
+
+
+_default_estimator = MemoizedTokenEstimator(HeuristicTokenEstimator())
+
+
+def estimate_tokens(text: str, model: str = _DEFAULT_TOKEN_FAMILY) -> int:
+    """Estimate the token count of text with the shared memoized offline estimator."""
+    return _default_estimator.count(text, model)
+
+
+def content_hash(*parts: str) -> str:
+    """Return a stable sha256 digest over the given strings, prefixed with the algorithm name."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return f"sha256:{digest.hexdigest()}"
+
+
+@contextmanager
+def atomic_write(path: str, encoding: str = "utf-8") -> Iterator[IO[str]]:
+    """Open a temporary file next to path for writing and move it over path on success.
+
+    Readers (a browser or docs server watching the output) see either the old file or the
+    complete new one, never a partial write. On error the temporary file is removed.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding=encoding) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,130 @@
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import os
+import select
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) flags and event masks.
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+
+
+def _inotify_fd(directory: str) -> int | None:
+    """Return a non-blocking inotify descriptor watching directory, or None if unavailable."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), _WATCH_MASK) < 0:
+        logger.debug("inotify_add_watch failed: %s", os.strerror(ctypes.get_errno()))
+        os.close(fd)
+        return None
+    return fd
+
+
+def _digest(path: str) -> str | None:
+    """Return a hash of the file's content, or None if it cannot be read right now."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _signature(path: str) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class FileWatcher:
+    """Block until a file's content changes, using inotify on Linux and polling elsewhere.
+
+    The file's directory is watched rather than the file, so editors that save by writing a
+    new file and renaming it over the old one are seen. A burst of events is debounced:
+    wait() returns once no further change has been seen for debounce seconds, and only if
+    the content differs from what it was at the previous return (saving an unchanged file
+    is ignored).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        debounce: float = 0.3,
+        poll_interval: float = 0.5,
+        use_inotify: bool = True,
+    ) -> None:
+        self.path = path
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._digest = _digest(path)
+        self._fd = _inotify_fd(os.path.dirname(os.path.abspath(path))) if use_inotify else None
+        self.backend = "inotify" if self._fd is not None else "polling"
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "FileWatcher":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _drain(self) -> None:
+        try:
+            while os.read(self._fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _wait_event(self, timeout: float | None) -> bool:
+        """Wait up to timeout for directory events (inotify) or a stat change (polling)."""
+        if self._fd is not None:
+            ready, _, _ = select.select([self._fd], [], [], timeout)
+            if ready:
+                self._drain()
+            return bool(ready)
+        before = _signature(self.path)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            delay = self.poll_interval if remaining is None else min(self.poll_interval, remaining)
+            time.sleep(delay)
+            if _signature(self.path) != before:
+                return True
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Return True once the file's content has changed; False if timeout passes first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not self._wait_event(remaining):
+                return False
+            while self._wait_event(self.debounce):
+                pass
+            digest = _digest(self.path)
+            if digest is not None and digest != self._digest:
+                self._digest = digest
+                return True
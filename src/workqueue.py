@@ -0,0 +1,406 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from src import calls, generator, utils
+from src.models import APISpec, GeneratedDoc, GenerationResult, ModelUsage
+
+OVERVIEW_REF = "overview"
+DEFAULT_LEASE_SECONDS = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+# Overview text assemble() uses while the overview job is unfinished.
+MISSING_OVERVIEW = "_Overview not generated._"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    endpoint_ref TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    max_tokens INTEGER NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    markdown TEXT,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority, position);
+"""
+
+
+@dataclass(slots=True, frozen=True)
+class Job:
+    """One queued API call: an endpoint's prompt (position >= 0) or the overview (position -1)."""
+
+    position: int
+    endpoint_ref: str
+    model: str
+    prompt: str
+    max_tokens: int
+    priority: int = 0
+    id: int = 0
+    attempts: int = 0
+
+
+class WorkQueue:
+    """Durable job queue in a SQLite file that several processes or hosts can share.
+
+    A job is claimed under a lease (owner and expiry time) that the worker renews while the
+    call runs; a job whose lease runs out, because its worker died or hung, is handed to the
+    next worker that claims. Results are only accepted from the worker holding the lease, so
+    a job finishes exactly once. Claims run in an immediate transaction, which SQLite
+    serializes across processes; put the file on storage with working file locks.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0) -> None:
+        self.path = path
+        self._timeout = timeout
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self._timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a block in a write transaction, committing on success."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self) -> None:
+        """Close this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def meta(self) -> dict[str, str]:
+        """Return the run metadata stored by enqueue (title, version, model, input_hash)."""
+        rows = self._connection().execute("SELECT key, value FROM meta").fetchall()
+        return {row["key"]: row["value"] for row in rows}
+
+    def enqueue(self, jobs: list[Job], meta: dict[str, str]) -> int:
+        """Add jobs for a run and return how many were added.
+
+        Enqueueing the same run again (same meta["input_hash"]) adds nothing, so a
+        coordinator can be re-run safely. Raises ValueError if the queue holds a different run.
+        """
+        with self._transaction() as conn:
+            existing = conn.execute(
+                "SELECT value FROM meta WHERE key = 'input_hash'"
+            ).fetchone()
+            if existing is not None:
+                if existing["value"] == meta.get("input_hash"):
+                    return 0
+                raise ValueError(
+                    f"Queue {self.path} already holds a run for different inputs; "
+                    "use a new queue file"
+                )
+            conn.executemany(
+                "INSERT INTO meta (key, value) VALUES (?, ?)", sorted(meta.items())
+            )
+            conn.executemany(
+                "INSERT INTO jobs (position, endpoint_ref, model, prompt, max_tokens, priority) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (j.position, j.endpoint_ref, j.model, j.prompt, j.max_tokens, j.priority)
+                    for j in jobs
+                ],
+            )
+        return len(jobs)
+
+    def claim(
+        self,
+        worker: str,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        now: float | None = None,
+    ) -> Job | None:
+        """Lease the next queued or lease-expired job to worker, or return None if none is free.
+
+        An expired job that has already been attempted max_attempts times is marked failed
+        instead of being handed out again.
+        """
+        now = time.time() if now is None else now
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired', lease_owner = NULL "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, max_attempts),
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' "
+                "OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY priority, position LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (worker, now + lease_seconds, row["id"]),
+            )
+        return _job(row, attempts=row["attempts"] + 1)
+
+    def renew(self, job: Job, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Extend worker's lease on job; return False if the lease has been lost."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (time.time() + lease_seconds, job.id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def complete(
+        self, job: Job, worker: str, markdown: str, input_tokens: int, output_tokens: int
+    ) -> bool:
+        """Store job's result if worker still holds its lease; return whether it was stored."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', markdown = ?, input_tokens = ?, "
+                "output_tokens = ?, lease_owner = NULL, lease_expires = NULL, error = NULL "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (markdown, input_tokens, output_tokens, job.id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def fail(
+        self, job: Job, worker: str, error: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    ) -> bool:
+        """Release job after an error: requeue it, or mark it failed after max_attempts."""
+        status = "failed" if job.attempts >= max_attempts else "queued"
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, lease_expires = NULL "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (status, error, job.id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def counts(self) -> dict[str, int]:
+        """Return the number of jobs per status (queued, leased, done, failed)."""
+        rows = self._connection().execute(
+            "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+        ).fetchall()
+        counts = dict.fromkeys(("queued", "leased", "done", "failed"), 0)
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def results(self) -> list[sqlite3.Row]:
+        """Return every job row in spec order, the overview first."""
+        return self._connection().execute("SELECT * FROM jobs ORDER BY position").fetchall()
+
+
+def _job(row: sqlite3.Row, attempts: int) -> Job:
+    return Job(
+        position=row["position"],
+        endpoint_ref=row["endpoint_ref"],
+        model=row["model"],
+        prompt=row["prompt"],
+        max_tokens=row["max_tokens"],
+        priority=row["priority"],
+        id=row["id"],
+        attempts=attempts,
+    )
+
+
+def build_jobs(
+    spec: APISpec,
+    models: list[str],
+    endpoint_prompts: list[str],
+    caps: list[int],
+    overview_prompt: str,
+    model: str,
+    order: list[int] | None = None,
+) -> list[Job]:
+    """Return the overview job and one job per endpoint, ranked by order (endpoint indices)."""
+    priority = {i: rank for rank, i in enumerate(order or range(len(spec.endpoints)))}
+    jobs = [Job(-1, OVERVIEW_REF, model, overview_prompt, calls.MAX_TOKENS, priority=-1)]
+    for i, ep in enumerate(spec.endpoints):
+        jobs.append(
+            Job(
+                position=i,
+                endpoint_ref=f"{ep.method.value} {ep.path}",
+                model=models[i],
+                prompt=endpoint_prompts[i],
+                max_tokens=caps[i],
+                priority=priority[i],
+            )
+        )
+    return jobs
+
+
+def default_worker_id() -> str:
+    """Return hostname:pid, unique across the processes sharing a queue."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class _Heartbeat:
+    """Renew a job's lease in the background every third of the lease while a call runs."""
+
+    def __init__(self, queue: WorkQueue, job: Job, worker: str, lease_seconds: float) -> None:
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(queue, job, worker, lease_seconds), daemon=True
+        )
+
+    def _run(self, queue: WorkQueue, job: Job, worker: str, lease_seconds: float) -> None:
+        try:
+            while not self._stop.wait(lease_seconds / 3):
+                if not queue.renew(job, worker, lease_seconds):
+                    return
+        finally:
+            queue.close()
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def work(
+    queue: WorkQueue,
+    worker: str,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    stream: bool = False,
+    concurrency: int = 1,
+    poll_seconds: float = 1.0,
+    on_done: Callable[[Job, bool], None] | None = None,
+) -> int:
+    """Claim and run jobs until the queue has nothing queued or leased; return the count done.
+
+    Runs concurrency claim loops, each making one call at a time with the lease renewed in
+    the background. While other workers hold the remaining leases, the loops poll every
+    poll_seconds so they can take over a job whose worker dies. on_done(job, stored) is
+    called after each finished call. An authentication error stops the worker; any other
+    error releases the job for a retry.
+    """
+    done = 0
+    lock = threading.Lock()
+
+    def loop(slot: int) -> None:
+        nonlocal done
+        name = f"{worker}/{slot}" if concurrency > 1 else worker
+        try:
+            while True:
+                job = queue.claim(name, lease_seconds, max_attempts)
+                if job is None:
+                    counts = queue.counts()
+                    if not counts["queued"] and not counts["leased"]:
+                        return
+                    time.sleep(poll_seconds)
+                    continue
+                messages = [{"role": "user", "content": job.prompt}]
+                try:
+                    with _Heartbeat(queue, job, name, lease_seconds):
+                        text, in_tok, out_tok, _ = generator._complete(
+                            messages, job.model, stream, job.max_tokens
+                        )
+                except RuntimeError as e:
+                    queue.fail(job, name, str(e), max_attempts)
+                    raise
+                except Exception as e:
+                    queue.fail(job, name, f"{type(e).__name__}: {e}", max_attempts)
+                    continue
+                stored = queue.complete(job, name, text, in_tok, out_tok)
+                if stored:
+                    with lock:
+                        done += 1
+                if on_done is not None:
+                    on_done(job, stored)
+        finally:
+            queue.close()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(loop, slot) for slot in range(concurrency)]
+    for future in futures:
+        future.result()
+    return done
+
+
+def assemble(queue: WorkQueue) -> tuple[GenerationResult, str]:
+    """Build a GenerationResult and the overview from the finished jobs, in spec order.
+
+    Endpoints whose jobs failed are listed in the result's pending refs, as with a
+    budget-limited run, so the formatter marks them in the output. Raises ValueError if
+    nothing was enqueued or jobs are still queued or leased.
+    """
+    meta = queue.meta()
+    if "input_hash" not in meta:
+        raise ValueError(f"Queue {queue.path} holds no run; enqueue one first")
+    counts = queue.counts()
+    unfinished = counts["queued"] + counts["leased"]
+    if unfinished:
+        raise ValueError(
+            f"Queue {queue.path} still has {unfinished} unfinished job(s); "
+            "wait for the workers to drain it"
+        )
+    overview = MISSING_OVERVIEW
+    docs: list[GeneratedDoc] = []
+    pending: list[str] = []
+    usage: dict[str, ModelUsage] = {}
+    for row in queue.results():
+        if row["status"] != "done":
+            if row["position"] >= 0:
+                pending.append(row["endpoint_ref"])
+            continue
+        entry = usage.setdefault(row["model"], ModelUsage())
+        entry.input_tokens += row["input_tokens"]
+        entry.output_tokens += row["output_tokens"]
+        entry.cost_usd += utils.estimate_cost(
+            row["input_tokens"], row["output_tokens"], row["model"]
+        )
+        if row["position"] < 0:
+            overview = row["markdown"]
+            continue
+        entry.docs += 1
+        docs.append(
+            GeneratedDoc(
+                endpoint_ref=row["endpoint_ref"],
+                markdown=row["markdown"],
+                tokens_used=row["input_tokens"] + row["output_tokens"],
+                model=row["model"],
+                output_tokens=row["output_tokens"],
+            )
+        )
+    result = GenerationResult(
+        api_title=meta.get("title", ""),
+        api_version=meta.get("version", ""),
+        docs=docs,
+        total_tokens=sum(u.input_tokens + u.output_tokens for u in usage.values()),
+        total_cost_usd=sum(u.cost_usd for u in usage.values()),
+        model=meta.get("model", ""),
+        pending=pending,
+        model_usage=usage,
+    )
+    return result, overview
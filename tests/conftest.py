@@ -1,5 +1,5 @@
 import os
 
-# Must be set before src.generator is imported, as the module initializes
-# the Anthropic client at module level and requires this env var.
+# The Anthropic client is created lazily on first use and reads this env var;
+# set a dummy value so nothing in the suite reaches for a real key.
 os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
@@ -0,0 +1,258 @@
+import asyncio
+import contextlib
+import time
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import anthropic
+import httpx
+import pytest
+
+import src.agenerator as agenerator_module
+from src.fakeapi import FakeAPIConfig, FakeAPIServer, Latency
+from src.generator import DocCache
+from src.parser import parse_spec
+from src.telemetry import RunRecorder
+
+MODEL = "claude-sonnet-4-6"
+SPEC_PATH = str(Path(__file__).parent / "fixtures" / "rewards-api-spec.json")
+
+
+def _make_httpx_response(status_code: int) -> httpx.Response:
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    return httpx.Response(status_code, request=request)
+
+
+@pytest.fixture
+def spec():
+    return parse_spec(SPEC_PATH)
+
+
+@pytest.fixture
+def fake_api():
+    """Start a fake API server; run(coro_fn) runs coro_fn() in a loop with a client for it."""
+    previous = agenerator_module.client
+    servers = []
+
+    def start(**config):
+        server = FakeAPIServer(FakeAPIConfig(output_tokens=40, **config)).start()
+        servers.append(server)
+
+        def run(coro_fn):
+            async def main():
+                agenerator_module.configure_client(base_url=server.base_url)
+                return await coro_fn()
+
+            return asyncio.run(main())
+
+        return server, run
+
+    yield start
+    for server in servers:
+        server.stop()
+    agenerator_module.client = previous
+
+
+# ---------------------------------------------------------------------------
+# Full docs
+# ---------------------------------------------------------------------------
+
+class TestAgenerateFullDocs:
+    def test_docs_in_spec_order_with_totals(self, fake_api, spec):
+        server, run = fake_api()
+        seen = []
+
+        async def on_doc(index, doc):
+            seen.append(index)
+
+        result = run(lambda: agenerator_module.agenerate_full_docs(spec, MODEL, on_doc=on_doc))
+
+        assert [d.endpoint_ref for d in result.docs] == [
+            f"{ep.method.value} {ep.path}" for ep in spec.endpoints
+        ]
+        assert sorted(seen) == list(range(len(spec.endpoints)))
+        assert result.total_tokens == sum(d.tokens_used for d in result.docs)
+        assert result.model_usage[MODEL].docs == len(spec.endpoints)
+        assert result.total_cost_usd > 0
+        assert server.stats["status_200"] == len(spec.endpoints)
+
+    def test_streamed_text_reaches_on_text(self, fake_api, spec):
+        _, run = fake_api()
+        chunks = {}
+
+        result = run(lambda: agenerator_module.agenerate_full_docs(
+            spec, MODEL, stream=True,
+            on_text=lambda ref, text: chunks.setdefault(ref, []).append(text),
+        ))
+
+        for doc in result.docs:
+            assert "".join(chunks[doc.endpoint_ref]) == doc.markdown
+
+    def test_doc_cache_skips_calls(self, fake_api, spec):
+        server, run = fake_api()
+        cache = DocCache()
+
+        run(lambda: agenerator_module.agenerate_full_docs(spec, MODEL, doc_cache=cache))
+        again = run(lambda: agenerator_module.agenerate_full_docs(spec, MODEL, doc_cache=cache))
+
+        assert server.stats["status_200"] == len(spec.endpoints)
+        assert len(again.docs) == len(spec.endpoints)
+        assert again.total_tokens == 0 and again.total_cost_usd == 0
+
+    def test_failed_endpoints_are_left_out(self, fake_api, spec):
+        _, run = fake_api(error_rates={400: 1.0})
+        recorder = RunRecorder()
+
+        result = run(lambda: agenerator_module.agenerate_full_docs(spec, MODEL, recorder=recorder))
+
+        assert result.docs == []
+        assert {s.status for s in recorder.requests} == {"error"}
+
+    def test_cancel_stops_calls_in_flight(self, fake_api, spec):
+        _, run = fake_api(latency=Latency("fixed", 5.0))
+        recorder = RunRecorder()
+
+        async def cancel_soon():
+            task = asyncio.create_task(
+                agenerator_module.agenerate_full_docs(spec, MODEL, recorder=recorder)
+            )
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+            return task
+
+        started = time.monotonic()
+        task = run(cancel_soon)
+
+        assert task.cancelled()
+        assert time.monotonic() - started < 3
+        assert len(recorder.requests) == 4
+        assert {s.status for s in recorder.requests} == {"cancelled"}
+
+
+# ---------------------------------------------------------------------------
+# Iteration
+# ---------------------------------------------------------------------------
+
+class TestAiterEndpointDocs:
+    def test_yields_each_endpoint_once(self, fake_api, spec):
+        _, run = fake_api(latency=Latency("uniform", 0.0, 0.05))
+
+        async def collect():
+            return [e async for e in agenerator_module.aiter_endpoint_docs(spec, MODEL)]
+
+        events = run(collect)
+        assert sorted(e.index for e in events) == list(range(len(spec.endpoints)))
+        assert [e.completed for e in events] == list(range(1, len(spec.endpoints) + 1))
+        assert events[-1].total_tokens == sum(e.doc.tokens_used for e in events)
+
+    def test_usage_counts_every_call(self, spec):
+        one = spec.model_copy(update={"endpoints": spec.endpoints[:1]})
+        bad_request = anthropic.BadRequestError(
+            message="Bad request", response=_make_httpx_response(400), body=None,
+        )
+        api = AsyncMock(side_effect=[("part", 10, 5, "max_tokens"), bad_request])
+
+        async def collect():
+            return [e async for e in agenerator_module.aiter_endpoint_docs(one, MODEL)]
+
+        with patch("src.agenerator._call_api", api):
+            events = asyncio.run(collect())
+
+        assert events[-1].doc is None
+        assert events[-1].total_tokens == 15
+        assert events[-1].model_usage[MODEL].docs == 0
+
+    def test_concurrency_below_one_is_rejected(self, spec):
+        async def collect():
+            events = agenerator_module.aiter_endpoint_docs(spec, MODEL, concurrency=0)
+            return [e async for e in events]
+
+        with pytest.raises(ValueError, match="concurrency"):
+            asyncio.run(asyncio.wait_for(collect(), timeout=5))
+
+    def test_closing_early_cancels_the_rest(self, fake_api, spec):
+        server, run = fake_api(latency=Latency("fixed", 0.3))
+
+        async def first():
+            async with contextlib.aclosing(
+                agenerator_module.aiter_endpoint_docs(spec, MODEL, concurrency=1)
+            ) as docs:
+                async for event in docs:
+                    return event
+
+        started = time.monotonic()
+        event = run(first)
+
+        assert event.index == 0 and event.doc.markdown
+        assert time.monotonic() - started < 1.5
+        assert server.stats["status_200"] == 1
+
+
+# ---------------------------------------------------------------------------
+# Single calls and retries
+# ---------------------------------------------------------------------------
+
+class TestSingleCalls:
+    def test_endpoint_doc(self, fake_api, spec):
+        _, run = fake_api()
+
+        doc = run(lambda: agenerator_module.agenerate_endpoint_doc(spec.endpoints[0], MODEL))
+
+        assert doc.endpoint_ref == "GET /api/v1/members/{memberId}"
+        assert doc.output_tokens == 40
+
+    def test_overview_uses_cache(self, fake_api, spec):
+        server, run = fake_api()
+        cache = DocCache()
+
+        first = run(lambda: agenerator_module.agenerate_overview(spec, MODEL, doc_cache=cache))
+        second = run(lambda: agenerator_module.agenerate_overview(spec, MODEL, doc_cache=cache))
+
+        assert first == second
+        assert server.stats["status_200"] == 1
+
+    def test_cancelled_overview_is_recorded_as_cancelled(self, fake_api, spec):
+        _, run = fake_api(latency=Latency("fixed", 5.0))
+        recorder = RunRecorder()
+
+        async def cancel_soon():
+            task = asyncio.create_task(
+                agenerator_module.agenerate_overview(spec, MODEL, recorder=recorder)
+            )
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+        run(cancel_soon)
+
+        assert [s.status for s in recorder.requests] == ["cancelled"]
+
+    def test_rate_limit_backs_off_with_asyncio_sleep(self, spec):
+        rate_limit_err = anthropic.RateLimitError(
+            message="Rate limit exceeded", response=_make_httpx_response(429), body=None,
+        )
+        sleep = AsyncMock()
+
+        with patch(
+            "src.agenerator._call_api",
+            AsyncMock(side_effect=[rate_limit_err, ("docs", 1, 2, "end_turn")]),
+        ):
+            with patch("src.agenerator.asyncio.sleep", sleep):
+                doc = asyncio.run(
+                    agenerator_module.agenerate_endpoint_doc(spec.endpoints[0], MODEL)
+                )
+
+        assert doc.markdown == "docs"
+        sleep.assert_awaited_once_with(2)
+
+    def test_auth_error_raises_runtime_error(self, spec):
+        auth_err = anthropic.AuthenticationError(
+            message="Invalid API key", response=_make_httpx_response(401), body=None,
+        )
+
+        with patch("src.agenerator._call_api", AsyncMock(side_effect=auth_err)):
+            with pytest.raises(RuntimeError, match="ANTHROPIC_API_KEY"):
+                asyncio.run(agenerator_module.agenerate_full_docs(spec, MODEL))
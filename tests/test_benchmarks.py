@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from benchmarks import run
+from benchmarks.synthetic import generate_spec, write_spec
+from src.parser import parse_spec
+
+
+# ---------------------------------------------------------------------------
+# Synthetic specs
+# ---------------------------------------------------------------------------
+
+class TestSyntheticSpec:
+    def test_same_seed_same_spec(self):
+        assert generate_spec(endpoints=20, seed=7) == generate_spec(endpoints=20, seed=7)
+
+    def test_different_seed_different_spec(self):
+        assert generate_spec(endpoints=20, seed=1) != generate_spec(endpoints=20, seed=2)
+
+    @pytest.mark.parametrize("suffix", [".yaml", ".json"])
+    def test_parses_to_requested_endpoint_count(self, tmp_path, suffix):
+        path = str(tmp_path / f"spec{suffix}")
+        write_spec(generate_spec(endpoints=37, schema_depth=2, ref_fanout=2), path)
+        spec = parse_spec(path)
+        assert len(spec.endpoints) == 37
+        assert spec.title == "Synthetic API"
+
+    def test_refs_are_resolved(self, tmp_path):
+        path = str(tmp_path / "spec.json")
+        write_spec(generate_spec(endpoints=3, ref_fanout=4), path)
+        spec = parse_spec(path)
+        schema = spec.endpoints[0].responses[0].schema_summary
+        assert "$ref" not in schema
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+class TestRunner:
+    def test_measure_reports_rounds(self):
+        calls = []
+        stats = run.measure(lambda: calls.append(1), rounds=3)
+        assert len(calls) == 4  # one warm-up
+        assert stats["rounds"] == 3
+        assert stats["min"] <= stats["median"]
+
+    def test_compare_flags_only_cases_over_threshold(self):
+        baseline = {"results": {"a": {"median": 1.0}, "b": {"median": 1.0}}}
+        results = {"a": {"median": 1.3}, "b": {"median": 1.2}, "new": {"median": 9.0}}
+        assert run.compare(results, baseline, threshold=0.25) == ["a"]
+
+    def test_save_then_compare(self, tmp_path, capsys):
+        baseline = str(tmp_path / "baseline.json")
+        argv = ["--endpoints", "3", "--rounds", "1", "--only", "prompt", "--baseline", baseline]
+        assert run.main([*argv, "--save"]) == 0
+        saved = json.loads(open(baseline).read())
+        assert list(saved["results"]) == ["build_endpoint_prompt"]
+        assert saved["params"]["endpoints"] == 3
+        assert run.main([*argv, "--threshold", "1000"]) == 0
+        assert "build_endpoint_prompt" in capsys.readouterr().out
+
+    def test_regression_exits_nonzero(self, tmp_path):
+        baseline = tmp_path / "baseline.json"
+        params = {"endpoints": 3, "schema_depth": 3, "ref_fanout": 3, "seed": 0}
+        baseline.write_text(json.dumps(
+            {"params": params, "results": {"build_endpoint_prompt": {"median": 1e-9}}}
+        ))
+        argv = [
+            "--endpoints", "3", "--rounds", "1", "--only", "prompt", "--baseline", str(baseline),
+        ]
+        assert run.main(argv) == 1
+
+    def test_mismatched_baseline_params_skip_comparison(self, tmp_path, capsys):
+        baseline = tmp_path / "baseline.json"
+        baseline.write_text(json.dumps(
+            {"params": {"endpoints": 999}, "results": {"build_endpoint_prompt": {"median": 1e-9}}}
+        ))
+        argv = [
+            "--endpoints", "3", "--rounds", "1", "--only", "prompt", "--baseline", str(baseline),
+        ]
+        assert run.main(argv) == 0
+        assert "not comparing" in capsys.readouterr().out
+
+    def test_pipeline_case_restores_client(self, tmp_path):
+        from src import generator
+
+        sentinel = object()
+        generator.client = sentinel
+        try:
+            cases = run.build_cases(
+                {"endpoints": 2, "schema_depth": 1, "ref_fanout": 1, "seed": 0}, str(tmp_path)
+            )
+            cases["pipeline[fake client]"]()
+            assert generator.client is sentinel
+        finally:
+            generator.client = None
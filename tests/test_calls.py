@@ -0,0 +1,68 @@
+import anthropic
+import httpx
+import pytest
+
+from src import calls
+from src.telemetry import RequestStats
+
+
+def _error(cls, status_code):
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    return cls(message="error", response=httpx.Response(status_code, request=request), body=None)
+
+
+# ---------------------------------------------------------------------------
+# RetryState
+# ---------------------------------------------------------------------------
+
+class TestRetryState:
+    def test_rate_limits_back_off_then_give_up(self):
+        retry = calls.RetryState()
+        stats = RequestStats("GET /a", "claude-sonnet-4-6")
+        error = _error(anthropic.RateLimitError, 429)
+
+        delays = [retry.next_delay(error, stats)[0] for _ in calls.RETRY_DELAYS]
+        with pytest.raises(anthropic.RateLimitError):
+            retry.next_delay(error, stats)
+
+        assert delays == calls.RETRY_DELAYS
+        assert stats.retries == 3 and stats.wait_seconds == sum(calls.RETRY_DELAYS)
+
+    def test_server_error_is_retried_once(self):
+        retry = calls.RetryState()
+        error = _error(anthropic.InternalServerError, 500)
+
+        assert retry.next_delay(error) == (1, "Server error (500), retrying once...")
+        with pytest.raises(anthropic.InternalServerError):
+            retry.next_delay(error)
+
+    def test_auth_error_becomes_runtime_error(self):
+        with pytest.raises(RuntimeError, match="ANTHROPIC_API_KEY"):
+            calls.RetryState().next_delay(_error(anthropic.AuthenticationError, 401))
+
+
+# ---------------------------------------------------------------------------
+# Continuation
+# ---------------------------------------------------------------------------
+
+class TestContinuation:
+    def test_continues_until_complete_and_totals_tokens(self):
+        messages = [{"role": "user", "content": "prompt"}]
+        response = calls.Continuation(messages, ("part one ", 10, 5, "max_tokens"))
+
+        assert response.pending
+        assert response.followup()[-1] == {"role": "assistant", "content": "part one"}
+        response.add((" part two", 20, 4, "end_turn"))
+
+        assert not response.pending
+        assert response.result() == ("part one part two", 30, 9, True)
+        assert response.last_input == 20
+
+    def test_stops_after_max_continuations(self):
+        response = calls.Continuation([], ("x", 1, 1, "max_tokens"))
+        for _ in range(calls.MAX_CONTINUATIONS):
+            response.followup()
+            response.add(("x", 1, 1, "max_tokens"))
+
+        assert not response.pending
+        assert response.result()[3] is False
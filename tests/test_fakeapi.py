@@ -0,0 +1,225 @@
+import json
+import random
+import urllib.request
+from unittest.mock import patch
+
+import anthropic
+import pytest
+
+import src.generator as generator_module
+from src import prompts
+from src.fakeapi import FakeAPIConfig, FakeAPIServer, Latency
+from src.models import APIEndpoint, APISpec, HTTPMethod
+
+MODEL = "claude-sonnet-4-6"
+
+
+@pytest.fixture
+def serve():
+    """Start a FakeAPIServer with the given config and point the generator's client at it."""
+    servers = []
+    previous = generator_module.client
+
+    def start(**config):
+        server = FakeAPIServer(FakeAPIConfig(**config)).start()
+        servers.append(server)
+        generator_module.configure_client(base_url=server.base_url)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+    generator_module.client = previous
+
+
+def _raw_client(server):
+    return anthropic.Anthropic(base_url=server.base_url, api_key="test", max_retries=0)
+
+
+def _user(text="Document GET /items"):
+    return [{"role": "user", "content": text}]
+
+
+# ---------------------------------------------------------------------------
+# Latency
+# ---------------------------------------------------------------------------
+
+class TestLatency:
+    def test_parse_plain_seconds(self):
+        assert Latency.parse("0.25") == Latency("fixed", 0.25)
+
+    def test_parse_kind_and_parameters(self):
+        assert Latency.parse("lognormal:0.4:0.5") == Latency("lognormal", 0.4, 0.5)
+
+    def test_parse_rejects_unknown_kind(self):
+        with pytest.raises(ValueError):
+            Latency.parse("gamma:1:2")
+
+    def test_uniform_sample_in_range(self):
+        rng = random.Random(0)
+        samples = [Latency("uniform", 0.1, 0.2).sample(rng) for _ in range(50)]
+        assert all(0.1 <= s <= 0.2 for s in samples)
+
+
+# ---------------------------------------------------------------------------
+# Messages
+# ---------------------------------------------------------------------------
+
+class TestMessages:
+    def test_create_returns_text_and_usage(self, serve):
+        server = serve(output_tokens=40)
+        response = _raw_client(server).messages.create(
+            model=MODEL, max_tokens=100, messages=_user()
+        )
+
+        assert response.stop_reason == "end_turn"
+        assert response.usage.output_tokens == 40
+        assert response.usage.input_tokens > 0
+        assert response.content[0].text.startswith("## Overview")
+        assert server.stats["requests"] == 1
+        assert server.stats["output_tokens"] == 40
+
+    def test_max_tokens_truncates(self, serve):
+        server = serve(output_tokens=40)
+        response = _raw_client(server).messages.create(model=MODEL, max_tokens=10, messages=_user())
+
+        assert response.stop_reason == "max_tokens"
+        assert response.usage.output_tokens == 10
+
+    def test_stream_delivers_same_text(self, serve):
+        serve(output_tokens=40)
+        full = generator_module._call_api(_user(), MODEL, stream=False)[0]
+        chunks = []
+        text, _, out, stop = generator_module._call_api(
+            _user(), MODEL, stream=True, on_text=chunks.append
+        )
+
+        assert text == full == "".join(chunks)
+        assert (out, stop) == (40, "end_turn")
+        assert len(chunks) > 1
+
+    @pytest.mark.parametrize("stream", [False, True])
+    def test_continuation_completes_truncated_response(self, serve, stream):
+        serve(output_tokens=60)
+        full = generator_module._call_api(_user(), MODEL, stream=False)[0]
+        text, _, out, complete = generator_module._complete(
+            _user(), MODEL, stream, max_tokens=25, on_text=lambda t: None
+        )
+
+        assert complete is True
+        assert text == full
+        assert out == 60
+
+    def test_batch_prompt_gets_one_section_per_endpoint(self, serve):
+        serve(output_tokens=90)
+        endpoints = [
+            APIEndpoint(path=f"/items/{n}", method=HTTPMethod.GET) for n in range(3)
+        ]
+        text = generator_module._call_api(
+            _user(prompts.build_batch_prompt(endpoints)), MODEL, stream=False
+        )[0]
+
+        assert len(generator_module._split_batch_response(text, 3)) == 3
+
+    def test_count_tokens(self, serve):
+        serve()
+        assert generator_module.count_tokens("hello world", MODEL) > 0
+
+    def test_unknown_route_is_404(self, serve):
+        server = serve()
+        with pytest.raises(anthropic.NotFoundError):
+            _raw_client(server).models.list()
+
+
+# ---------------------------------------------------------------------------
+# Failure injection
+# ---------------------------------------------------------------------------
+
+class TestFailureInjection:
+    def test_rate_limit_with_retry_after(self, serve):
+        server = serve(error_rates={429: 1.0}, retry_after=3)
+        with pytest.raises(anthropic.RateLimitError) as exc_info:
+            _raw_client(server).messages.create(model=MODEL, max_tokens=10, messages=_user())
+
+        assert exc_info.value.response.headers["retry-after"] == "3"
+        assert server.stats["status_429"] == 1
+
+    def test_overloaded_is_529(self, serve):
+        server = serve(error_rates={529: 1.0})
+        with pytest.raises(anthropic.APIStatusError) as exc_info:
+            _raw_client(server).messages.create(model=MODEL, max_tokens=10, messages=_user())
+        assert exc_info.value.status_code == 529
+
+    def test_decisions_are_seeded_per_request_body(self, serve):
+        outcomes = []
+        for order in (range(20), reversed(range(20))):
+            server = serve(error_rates={429: 0.5}, seed=3)
+            client = _raw_client(server)
+            failed = set()
+            for n in order:
+                try:
+                    client.messages.create(model=MODEL, max_tokens=5, messages=_user(f"prompt {n}"))
+                except anthropic.RateLimitError:
+                    failed.add(n)
+            outcomes.append(failed)
+
+        assert outcomes[0] == outcomes[1]
+        assert 0 < len(outcomes[0]) < 20
+
+    def test_generator_retries_through_injected_errors(self, serve):
+        server = serve(error_rates={429: 0.3, 500: 0.1}, retry_after=0, output_tokens=30)
+        spec = APISpec(
+            title="T", version="1", endpoints=[
+                APIEndpoint(path=f"/items/{n}", method=HTTPMethod.GET) for n in range(24)
+            ],
+        )
+        with patch.object(generator_module.time, "sleep"):
+            with patch("builtins.print"):
+                result = generator_module.generate_full_docs(
+                    spec, MODEL, stream=False, concurrency=6
+                )
+
+        assert len(result.docs) == 24
+        assert server.stats["status_200"] == 24
+        assert server.stats["status_429"] > 0
+
+
+# ---------------------------------------------------------------------------
+# Batches and stats
+# ---------------------------------------------------------------------------
+
+class TestBatches:
+    def _requests(self, count):
+        return [
+            {
+                "custom_id": f"req-{n}",
+                "params": {"model": MODEL, "max_tokens": 20, "messages": _user(f"prompt {n}")},
+            }
+            for n in range(count)
+        ]
+
+    def test_batch_round_trip(self, serve):
+        server = serve(output_tokens=10)
+        client = _raw_client(server)
+        batch = client.messages.batches.create(requests=self._requests(3))
+
+        assert client.messages.batches.retrieve(batch.id).processing_status == "ended"
+        results = list(client.messages.batches.results(batch.id))
+        assert [r.custom_id for r in results] == ["req-0", "req-1", "req-2"]
+        assert all(r.result.type == "succeeded" for r in results)
+
+    def test_batch_in_progress_until_batch_seconds(self, serve):
+        server = serve(batch_seconds=60)
+        client = _raw_client(server)
+        batch = client.messages.batches.create(requests=self._requests(2))
+
+        assert batch.processing_status == "in_progress"
+        assert batch.request_counts.processing == 2
+
+    def test_stats_endpoint(self, serve):
+        server = serve()
+        _raw_client(server).messages.create(model=MODEL, max_tokens=10, messages=_user())
+        with urllib.request.urlopen(f"{server.base_url}/_stats") as response:
+            stats = json.load(response)
+        assert stats["requests"] == 1
+        assert stats["status_200"] == 1
@@ -1,7 +1,10 @@
+import io
+
 import pytest
 
-from src.formatter import format_html, format_markdown
-from src.models import GeneratedDoc, GenerationResult
+from src.formatter import format_html, format_markdown, write_markdown
+from src.models import GeneratedDoc, GenerationResult, ModelUsage
+from src.store import SpooledDocStore
 
 
 @pytest.fixture
@@ -70,3 +73,98 @@ class TestFormatHTML:
     def test_contains_endpoint_markdown_content(self, sample_result):
         result = format_html(sample_result, "An overview.")
         assert "Returns a list of users." in result
+
+
+class TestReproducibleOutput:
+    def test_output_is_byte_stable(self, sample_result, monkeypatch):
+        monkeypatch.setenv("SOURCE_DATE_EPOCH", "1700000000")
+        first = format_markdown(sample_result, "An overview.", reproducible=True)
+        second = format_markdown(sample_result, "An overview.", reproducible=True)
+        assert first == second
+        assert "Generated at: 2023-11-14 22:13:20 UTC" in first
+
+    def test_timestamp_omitted_without_source_date_epoch(self, sample_result, monkeypatch):
+        monkeypatch.delenv("SOURCE_DATE_EPOCH", raising=False)
+        result = format_markdown(sample_result, "An overview.", reproducible=True)
+        assert "Generated at" not in result
+
+    def test_input_hash_embedded(self, sample_result):
+        sample_result.input_hash = "sha256:abc123"
+        result = format_markdown(sample_result, "An overview.", reproducible=True)
+        assert "Input hash: sha256:abc123" in result
+
+    def test_default_mode_keeps_wall_clock_timestamp(self, sample_result):
+        sample_result.input_hash = "sha256:abc123"
+        result = format_markdown(sample_result, "An overview.")
+        assert "Generated at:" in result
+        assert "Input hash" not in result
+
+
+class TestAnchors:
+    @pytest.fixture
+    def colliding_result(self):
+        docs = [
+            GeneratedDoc(endpoint_ref=ref, markdown="## Example\nBody.", tokens_used=1, model="m")
+            for ref in ("GET /users/{id}", "GET /users/id")
+        ]
+        return GenerationResult(
+            api_title="My API", api_version="1", docs=docs,
+            total_tokens=2, total_cost_usd=0.0, model="m",
+        )
+
+    def test_toc_links_are_unique(self, colliding_result):
+        result = format_markdown(colliding_result, "An overview.")
+        assert "- [GET /users/{id}](#get-usersid)" in result
+        assert "- [GET /users/id](#get-usersid-1)" in result
+
+    def test_html_headings_carry_toc_ids(self, colliding_result):
+        result = format_html(colliding_result, "An overview.")
+        assert 'href="#get-usersid"' in result
+        assert 'id="get-usersid"' in result
+        assert 'href="#get-usersid-1"' in result
+        assert 'id="get-usersid-1"' in result
+
+
+class TestSpooledDocs:
+    def test_store_produces_same_markdown(self, sample_result, monkeypatch):
+        monkeypatch.setenv("SOURCE_DATE_EPOCH", "0")
+        expected = format_markdown(sample_result, "An overview.", reproducible=True)
+        with SpooledDocStore() as store:
+            for doc in sample_result.docs:
+                store.append(doc)
+            spooled_result = sample_result.model_copy(update={"docs": []})
+            actual = format_markdown(spooled_result, "An overview.", reproducible=True, docs=store)
+        assert actual == expected
+
+    def test_write_markdown_matches_format_markdown(self, sample_result, monkeypatch):
+        monkeypatch.setenv("SOURCE_DATE_EPOCH", "0")
+        out = io.StringIO()
+        write_markdown(sample_result, "An overview.", out, reproducible=True)
+        assert out.getvalue() == format_markdown(sample_result, "An overview.", reproducible=True)
+
+
+class TestPendingEndpoints:
+    def test_pending_section_lists_refs(self, sample_result):
+        sample_result.pending = ["POST /users", "DELETE /users/{id}"]
+        result = format_markdown(sample_result, "An overview.")
+        assert "## Pending Endpoints" in result
+        assert "- POST /users" in result
+        assert "- DELETE /users/{id}" in result
+
+    def test_no_pending_section_when_complete(self, sample_result):
+        assert "Pending Endpoints" not in format_markdown(sample_result, "An overview.")
+
+
+class TestModelUsage:
+    def test_per_model_breakdown_when_routed(self, sample_result):
+        sample_result.model_usage = {
+            "claude-sonnet-4-6": ModelUsage(
+                docs=1, input_tokens=50, output_tokens=50, cost_usd=0.001
+            ),
+            "claude-haiku-4-5-20251001": ModelUsage(
+                docs=2, input_tokens=10, output_tokens=10, cost_usd=0.0001
+            ),
+        }
+        result = format_markdown(sample_result, "An overview.")
+        assert "  - claude-haiku-4-5-20251001: 2 docs, 20 tokens, $0.0001" in result
+        assert "  - claude-sonnet-4-6: 1 docs, 100 tokens, $0.0010" in result
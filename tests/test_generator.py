@@ -1,3 +1,7 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
 
 import anthropic
@@ -5,7 +9,18 @@ import httpx
 import pytest
 
 import src.generator as generator_module
-from src.models import APIEndpoint, APISpec, HTTPMethod
+from src import utils
+from src.models import (
+    APIEndpoint,
+    APISpec,
+    GeneratedDoc,
+    HTTPMethod,
+    Parameter,
+    RequestBody,
+    ResponseInfo,
+)
+from src.store import SpooledDocStore
+from src.telemetry import RunRecorder
 
 
 # ---------------------------------------------------------------------------
@@ -17,11 +32,14 @@ def _make_httpx_response(status_code: int) -> httpx.Response:
     return httpx.Response(status_code, request=request)
 
 
-def _make_api_response(text: str, input_tokens: int, output_tokens: int) -> MagicMock:
+def _make_api_response(
+    text: str, input_tokens: int, output_tokens: int, stop_reason: str = "end_turn"
+) -> MagicMock:
     response = MagicMock()
     response.content = [MagicMock(text=text)]
     response.usage.input_tokens = input_tokens
     response.usage.output_tokens = output_tokens
+    response.stop_reason = stop_reason
     return response
 
 
@@ -68,6 +86,7 @@ class TestGenerateEndpointDocNonStreaming:
 
         assert doc.markdown == "# GET /users/{id}\nSome docs."
         assert doc.tokens_used == 300
+        assert doc.output_tokens == 200
         assert doc.model == "claude-sonnet-4-6"
 
     def test_endpoint_ref_format(self, mock_client, endpoint):
@@ -102,6 +121,64 @@ class TestGenerateEndpointDocStreaming:
         assert doc.endpoint_ref == "GET /users/{id}"
 
 
+# ---------------------------------------------------------------------------
+# count_tokens
+# ---------------------------------------------------------------------------
+
+class TestCountTokens:
+    def test_returns_input_tokens_from_endpoint(self, mock_client):
+        mock_client.messages.count_tokens.return_value = MagicMock(input_tokens=321)
+
+        assert generator_module.count_tokens("prompt", "claude-sonnet-4-6") == 321
+        kwargs = mock_client.messages.count_tokens.call_args.kwargs
+        assert kwargs["model"] == "claude-sonnet-4-6"
+        assert kwargs["messages"] == [{"role": "user", "content": "prompt"}]
+
+
+# ---------------------------------------------------------------------------
+# configure_client
+# ---------------------------------------------------------------------------
+
+class TestConfigureClient:
+    @pytest.fixture(autouse=True)
+    def restore_client(self):
+        previous = generator_module.client
+        yield
+        generator_module.client = previous
+
+    def test_pool_size_sets_connection_and_keepalive_limits(self):
+        with patch("anthropic.DefaultHttpxClient", wraps=anthropic.DefaultHttpxClient) as mock_http:
+            generator_module.configure_client(pool_size=12, keepalive_expiry=30)
+
+        limits = mock_http.call_args.kwargs["limits"]
+        assert (limits.max_connections, limits.max_keepalive_connections) == (12, 12)
+        assert limits.keepalive_expiry == 30
+        assert mock_http.call_args.kwargs["http2"] is False
+
+    def test_defaults_match_sdk(self):
+        with patch("anthropic.DefaultHttpxClient", wraps=anthropic.DefaultHttpxClient) as mock_http:
+            client = generator_module.configure_client()
+
+        assert mock_http.call_args.kwargs["limits"] == anthropic.DEFAULT_CONNECTION_LIMITS
+        assert client.timeout.connect == anthropic.DEFAULT_TIMEOUT.connect
+        assert client.timeout.read == anthropic.DEFAULT_TIMEOUT.read
+        assert generator_module.client is client
+
+    def test_timeouts_and_base_url(self):
+        client = generator_module.configure_client(
+            base_url="http://127.0.0.1:8787", connect_timeout=2, read_timeout=30
+        )
+
+        assert str(client.base_url).startswith("http://127.0.0.1:8787")
+        assert (client.timeout.connect, client.timeout.read) == (2, 30)
+
+    def test_missing_http2_support_raises_runtime_error(self):
+        error = ImportError("the 'h2' package is not installed")
+        with patch("anthropic.DefaultHttpxClient", side_effect=error):
+            with pytest.raises(RuntimeError, match="h2"):
+                generator_module.configure_client(http2=True)
+
+
 # ---------------------------------------------------------------------------
 # 3.4 generate_overview
 # ---------------------------------------------------------------------------
@@ -118,6 +195,16 @@ class TestGenerateOverview:
         assert len(result) > 0
         assert "Overview" in result
 
+    def test_doc_cache_skips_repeat_call(self, mock_client, spec):
+        mock_client.messages.create.return_value = _make_api_response("## Overview", 80, 120)
+        cache = generator_module.DocCache()
+
+        first = generator_module.generate_overview(spec, "claude-sonnet-4-6", doc_cache=cache)
+        second = generator_module.generate_overview(spec, "claude-sonnet-4-6", doc_cache=cache)
+
+        assert first == second == "## Overview"
+        assert mock_client.messages.create.call_count == 1
+
 
 # ---------------------------------------------------------------------------
 # 3.5 generate_full_docs
@@ -143,6 +230,17 @@ class TestGenerateFullDocs:
         # 1M input tokens at $3.00/M = $3.00
         assert result.total_cost_usd == pytest.approx(3.00)
 
+    def test_store_receives_docs(self, mock_client, spec):
+        mock_client.messages.create.return_value = _make_api_response("endpoint docs", 100, 200)
+
+        with SpooledDocStore() as store:
+            result = generator_module.generate_full_docs(
+                spec, "claude-sonnet-4-6", stream=False, store=store
+            )
+            assert result.docs == []
+            assert [doc.markdown for doc in store] == ["endpoint docs"]
+        assert result.total_tokens == 300
+
     def test_progress_printed(self, mock_client, spec, capsys):
         mock_client.messages.create.return_value = _make_api_response("docs", 10, 20)
 
@@ -152,6 +250,705 @@ class TestGenerateFullDocs:
         assert "GET /users/{id}" in captured.out
 
 
+class TestIterEndpointDocs:
+    def test_yields_docs_as_they_finish(self, mock_client, three_endpoint_spec):
+        released = threading.Event()
+
+        def respond(**kwargs):
+            path = kwargs["messages"][0]["content"].split("**Path:** ")[1].split("\n")[0]
+            if path != "/items/2":
+                assert released.wait(timeout=5)
+            return _make_api_response(path, 10, 20)
+
+        mock_client.messages.create.side_effect = respond
+
+        events = generator_module.iter_endpoint_docs(
+            three_endpoint_spec, "claude-sonnet-4-6", stream=False, concurrency=3
+        )
+        first = next(events)
+        released.set()
+        rest = list(events)
+
+        assert (first.index, first.doc.markdown) == (2, "/items/2")
+        assert (first.completed, first.total, first.total_tokens) == (1, 3, 30)
+        assert sorted(e.index for e in rest) == [0, 1]
+        assert rest[-1].completed == 3
+        assert rest[-1].total_tokens == 90
+        assert rest[-1].model_usage["claude-sonnet-4-6"].docs == 3
+
+    def test_sequential_run_is_lazy(self, mock_client, three_endpoint_spec):
+        mock_client.messages.create.return_value = _make_api_response("docs", 10, 20)
+
+        events = generator_module.iter_endpoint_docs(
+            three_endpoint_spec, "claude-sonnet-4-6", stream=False
+        )
+        assert next(events).index == 0
+        events.close()
+
+        assert mock_client.messages.create.call_count == 1
+
+    def test_failed_and_pending_endpoints_are_yielded_without_doc(
+        self, mock_client, three_endpoint_spec
+    ):
+        mock_client.messages.create.side_effect = [
+            ValueError("boom"), _make_api_response("docs", 500, 1000),
+        ]
+        budget = generator_module.Budget(max_tokens=2000)
+
+        events = list(generator_module.iter_endpoint_docs(
+            three_endpoint_spec, "claude-sonnet-4-6", stream=False, budget=budget
+        ))
+
+        assert [(e.index, e.doc is None, e.pending) for e in events] == [
+            (0, True, False), (1, False, False), (2, True, True),
+        ]
+
+
+class TestDocCache:
+    def test_unchanged_endpoints_reuse_cached_docs(self, mock_client, three_endpoint_spec):
+        mock_client.messages.create.return_value = _make_api_response("docs", 100, 200)
+        cache = generator_module.DocCache()
+        generator_module.generate_full_docs(
+            three_endpoint_spec, "claude-sonnet-4-6", stream=False, doc_cache=cache
+        )
+        three_endpoint_spec.endpoints[1].summary = "Changed"
+        mock_client.messages.create.reset_mock()
+
+        result = generator_module.generate_full_docs(
+            three_endpoint_spec, "claude-sonnet-4-6", stream=False, doc_cache=cache
+        )
+
+        assert mock_client.messages.create.call_count == 1
+        assert [doc.endpoint_ref for doc in result.docs] == [f"GET /items/{n}" for n in range(3)]
+        assert [doc.tokens_used for doc in result.docs] == [0, 300, 0]
+        assert result.total_tokens == 300
+        assert result.model_usage["claude-sonnet-4-6"].docs == 3
+        assert cache.hits == 2
+
+    def test_evicts_least_recently_used(self):
+        cache = generator_module.DocCache(max_entries=2)
+        doc = GeneratedDoc(endpoint_ref="GET /a", markdown="a", tokens_used=1, model="m")
+        cache.put("m", "a", doc)
+        cache.put("m", "b", doc)
+        cache.get("m", "a")
+        cache.put("m", "c", doc)
+
+        assert len(cache) == 2
+        assert cache.get("m", "b") is None
+        assert cache.get("m", "a") is doc
+
+
+# ---------------------------------------------------------------------------
+# Budget enforcement
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def three_endpoint_spec():
+    return APISpec(
+        title="Test API",
+        version="1.0.0",
+        endpoints=[
+            APIEndpoint(method=HTTPMethod.GET, path=f"/items/{n}", summary="Item")
+            for n in range(3)
+        ],
+    )
+
+
+class TestBudget:
+    def test_unlimited_budget_uses_default_max_tokens(self):
+        budget = generator_module.Budget()
+        assert budget.reserve("claude-sonnet-4-6", "prompt") == 4096
+
+    def test_reserve_caps_max_tokens_to_remaining_tokens(self):
+        budget = generator_module.Budget(max_tokens=2000)
+        max_tokens = budget.reserve("claude-sonnet-4-6", "prompt")
+        assert 256 <= max_tokens < 2000
+
+    def test_reserve_caps_max_tokens_to_remaining_cost(self):
+        # $0.015 buys 1000 output tokens at $15/M, minus the prompt's input cost.
+        budget = generator_module.Budget(max_cost=0.015)
+        assert 900 < budget.reserve("claude-sonnet-4-6", "prompt") < 1000
+
+    def test_reserve_raises_when_too_little_remains(self):
+        budget = generator_module.Budget(max_tokens=100)
+        with pytest.raises(generator_module.BudgetExceeded):
+            budget.reserve("claude-sonnet-4-6", "prompt")
+        assert budget.exhausted
+
+    def test_reserve_pads_estimated_input(self):
+        padded = generator_module.Budget(max_tokens=3000)
+        exact = generator_module.Budget(max_tokens=3000, input_margin=1.0)
+        input_tokens = utils.estimate_tokens(
+            generator_module.prompts.SYSTEM_PROMPT + "prompt", "claude-sonnet-4-6"
+        )
+
+        assert exact.reserve("claude-sonnet-4-6", "prompt") == 3000 - input_tokens
+        assert padded.reserve("claude-sonnet-4-6", "prompt") < 3000 - input_tokens
+
+    def test_charge_accumulates_tokens_and_cost(self):
+        budget = generator_module.Budget(max_cost=1.0)
+        budget.charge("claude-sonnet-4-6", 1_000_000, 0)
+        assert budget.tokens == 1_000_000
+        assert budget.cost == pytest.approx(3.0)
+        assert budget.exhausted
+
+
+class TestBudgetedGeneration:
+    def test_remaining_endpoints_marked_pending(self, mock_client, three_endpoint_spec):
+        mock_client.messages.create.return_value = _make_api_response("docs", 500, 1000)
+        budget = generator_module.Budget(max_tokens=2000)
+
+        result = generator_module.generate_full_docs(
+            three_endpoint_spec, "claude-sonnet-4-6", stream=False, budget=budget
+        )
+
+        assert [doc.endpoint_ref for doc in result.docs] == ["GET /items/0"]
+        assert result.pending == ["GET /items/1", "GET /items/2"]
+        assert mock_client.messages.create.call_count == 1
+
+    def test_max_tokens_capped_by_budget(self, mock_client, three_endpoint_spec):
+        mock_client.messages.create.return_value = _make_api_response("docs", 100, 100)
+        budget = generator_module.Budget(max_tokens=1500)
+
+        generator_module.generate_full_docs(
+            three_endpoint_spec, "claude-sonnet-4-6", stream=False, budget=budget
+        )
+
+        first_call = mock_client.messages.create.call_args_list[0]
+        assert first_call.kwargs["max_tokens"] < 1500
+
+    def test_response_truncated_by_budget_is_pending(self, mock_client, three_endpoint_spec):
+        def truncated(**kwargs):
+            return _make_api_response("cut off", 200, kwargs["max_tokens"], "max_tokens")
+
+        mock_client.messages.create.side_effect = truncated
+        budget = generator_module.Budget(max_tokens=1500)
+
+        result = generator_module.generate_full_docs(
+            three_endpoint_spec, "claude-sonnet-4-6", stream=False, budget=budget
+        )
+
+        assert result.docs == []
+        assert result.pending == ["GET /items/0", "GET /items/1", "GET /items/2"]
+        assert budget.tokens <= 1500
+
+    def test_overview_raises_when_budget_exhausted(self, mock_client, spec):
+        budget = generator_module.Budget(max_tokens=10)
+        with pytest.raises(generator_module.BudgetExceeded):
+            generator_module.generate_overview(spec, "claude-sonnet-4-6", budget=budget)
+        mock_client.messages.create.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Model routing
+# ---------------------------------------------------------------------------
+
+SIMPLE_MODEL = "claude-haiku-4-5-20251001"
+
+
+@pytest.fixture
+def simple_endpoint():
+    return APIEndpoint(
+        method=HTTPMethod.GET,
+        path="/users/{id}",
+        parameters=[Parameter(name="id", location="path", required=True)],
+        responses=[
+            ResponseInfo(status_code="200", description="OK", schema_summary="{ id: string }")
+        ],
+    )
+
+
+@pytest.fixture
+def complex_endpoint():
+    fields = ", ".join(f"field{n}: string" for n in range(40))
+    return APIEndpoint(
+        method=HTTPMethod.POST,
+        path="/users",
+        parameters=[Parameter(name="X-Request-ID", location="header")],
+        request_body=RequestBody(schema_summary="{ " + fields + " }"),
+        responses=[
+            ResponseInfo(status_code="201", description="Created"),
+            ResponseInfo(status_code="400", description="Invalid"),
+        ],
+    )
+
+
+class TestModelRouter:
+    def test_trivial_get_scores_low(self, simple_endpoint):
+        assert generator_module.ModelRouter.score(simple_endpoint) == 2
+
+    def test_simple_endpoint_goes_to_simple_model(self, simple_endpoint):
+        router = generator_module.ModelRouter(SIMPLE_MODEL)
+        assert router.route(simple_endpoint, "claude-sonnet-4-6") == SIMPLE_MODEL
+
+    def test_complex_endpoint_keeps_default(self, complex_endpoint):
+        router = generator_module.ModelRouter(SIMPLE_MODEL)
+        assert router.route(complex_endpoint, "claude-sonnet-4-6") == "claude-sonnet-4-6"
+
+    def test_full_docs_reports_per_model_usage(
+        self, mock_client, simple_endpoint, complex_endpoint
+    ):
+        mock_client.messages.create.return_value = _make_api_response("docs", 1_000_000, 0)
+        spec = APISpec(title="T", version="1", endpoints=[simple_endpoint, complex_endpoint])
+
+        result = generator_module.generate_full_docs(
+            spec, "claude-sonnet-4-6", stream=False,
+            router=generator_module.ModelRouter(SIMPLE_MODEL),
+        )
+
+        models = [call.kwargs["model"] for call in mock_client.messages.create.call_args_list]
+        assert models == [SIMPLE_MODEL, "claude-sonnet-4-6"]
+        assert [doc.model for doc in result.docs] == models
+        assert result.model_usage[SIMPLE_MODEL].docs == 1
+        assert result.model_usage[SIMPLE_MODEL].cost_usd == pytest.approx(0.80)
+        assert result.model_usage["claude-sonnet-4-6"].cost_usd == pytest.approx(3.00)
+        assert result.total_cost_usd == pytest.approx(3.80)
+
+
+# ---------------------------------------------------------------------------
+# Batched prompts
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def crud_spec():
+    return APISpec(
+        title="CRUD API",
+        version="1.0.0",
+        endpoints=[
+            APIEndpoint(method=HTTPMethod.GET, path="/members", tags=["members"]),
+            APIEndpoint(method=HTTPMethod.GET, path="/rewards", tags=["rewards"]),
+            APIEndpoint(method=HTTPMethod.DELETE, path="/members/{id}", tags=["members"]),
+        ],
+    )
+
+
+class TestBatching:
+    def test_plan_groups_by_tag_in_spec_order(self, crud_spec):
+        units = generator_module._plan_units(crud_spec.endpoints, ["m"] * 3, [100] * 3, 1000)
+        assert units == [[0, 2], [1]]
+
+    def test_plan_keeps_large_endpoints_single(self, crud_spec):
+        units = generator_module._plan_units(crud_spec.endpoints, ["m"] * 3, [600, 100, 100], 1000)
+        assert units == [[0], [1], [2]]
+
+    def test_plan_respects_token_budget(self, crud_spec):
+        units = generator_module._plan_units(crud_spec.endpoints, ["m"] * 3, [400] * 3, 1000)
+        assert units == [[0, 2], [1]]
+        units = generator_module._plan_units(crud_spec.endpoints, ["m"] * 3, [450] * 3, 800)
+        assert units == [[0], [1], [2]]
+
+    def test_plan_separates_models(self, crud_spec):
+        units = generator_module._plan_units(crud_spec.endpoints, ["a", "b", "a"], [10] * 3, 1000)
+        assert units == [[0, 2], [1]]
+
+    def test_batched_response_split_into_docs(self, mock_client, crud_spec):
+        mock_client.messages.create.side_effect = [
+            _make_api_response("=== DOC 1 ===\nList docs\n=== DOC 2 ===\nDelete docs!", 300, 100),
+            _make_api_response("Rewards docs", 50, 60),
+        ]
+
+        result = generator_module.generate_full_docs(
+            crud_spec, "claude-sonnet-4-6", stream=False, batch_tokens=2000
+        )
+
+        assert mock_client.messages.create.call_count == 2
+        assert [doc.endpoint_ref for doc in result.docs] == [
+            "GET /members", "GET /rewards", "DELETE /members/{id}",
+        ]
+        members, rewards, delete = result.docs
+        assert members.markdown == "List docs"
+        assert delete.markdown == "Delete docs!"
+        assert members.tokens_used + delete.tokens_used == 400
+        assert members.output_tokens + delete.output_tokens == 100
+        assert result.total_tokens == 510
+        assert result.model_usage["claude-sonnet-4-6"].docs == 3
+
+    def test_unsplittable_response_falls_back_to_single_calls(self, mock_client, crud_spec):
+        mock_client.messages.create.side_effect = [
+            _make_api_response("no markers at all", 300, 100),
+            _make_api_response("List docs", 10, 20),
+            _make_api_response("Delete docs", 10, 20),
+            _make_api_response("Rewards docs", 10, 20),
+        ]
+
+        result = generator_module.generate_full_docs(
+            crud_spec, "claude-sonnet-4-6", stream=False, batch_tokens=2000
+        )
+
+        assert [doc.markdown for doc in result.docs] == ["List docs", "Rewards docs", "Delete docs"]
+        assert result.total_tokens == 400 + 90
+
+    def test_split_proportionally_preserves_total(self):
+        assert generator_module._split_proportionally(10, [1, 1, 1]) == [3, 3, 4]
+        assert generator_module._split_proportionally(7, [0, 0]) == [3, 4]
+
+
+# ---------------------------------------------------------------------------
+# Deduplication
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def versioned_spec():
+    def user_endpoint(version: str) -> APIEndpoint:
+        return APIEndpoint(
+            method=HTTPMethod.GET,
+            path=f"/{version}/users/{{id}}",
+            operation_id=f"getUser{version.upper()}",
+            summary="Get a user",
+            parameters=[Parameter(name="id", location="path", required=True)],
+        )
+
+    return APISpec(
+        title="Gateway",
+        version="1.0.0",
+        endpoints=[
+            user_endpoint("v1"),
+            APIEndpoint(method=HTTPMethod.GET, path="/v1/orders", summary="List orders"),
+            user_endpoint("v2"),
+        ],
+    )
+
+
+class TestDeduplication:
+    def test_classes_group_versioned_duplicates(self, versioned_spec):
+        canonicalizer = generator_module.EndpointCanonicalizer()
+        classes = canonicalizer.classes(versioned_spec.endpoints, ["m"] * 3)
+        assert classes == {0: [2], 1: []}
+
+    def test_different_models_are_not_merged(self, versioned_spec):
+        canonicalizer = generator_module.EndpointCanonicalizer()
+        classes = canonicalizer.classes(versioned_spec.endpoints, ["a", "a", "b"])
+        assert classes == {0: [], 1: [], 2: []}
+
+    def test_names_kept_when_normalization_disabled(self, versioned_spec):
+        canonicalizer = generator_module.EndpointCanonicalizer(normalize_names=False)
+        classes = canonicalizer.classes(versioned_spec.endpoints, ["m"] * 3)
+        assert classes == {0: [], 1: [], 2: []}
+
+    def test_custom_prefix_pattern(self):
+        canonicalizer = generator_module.EndpointCanonicalizer([r"^/(?:public|internal)(?=/)"])
+        assert canonicalizer.split_prefix("/internal/users") == ("/internal", "/users")
+        assert canonicalizer.split_prefix("/v1/users") == ("", "/v1/users")
+
+    def test_retarget_rewrites_paths_and_operation_id(self, versioned_spec):
+        canonicalizer = generator_module.EndpointCanonicalizer()
+        v1, _, v2 = versioned_spec.endpoints
+        markdown = "# GET /v1/users/{id}\n`getUserV1` — curl https://api.example.com/v1/users/42"
+        assert canonicalizer.retarget(markdown, v1, v2) == (
+            "# GET /v2/users/{id}\n`getUserV2` — curl https://api.example.com/v2/users/42"
+        )
+
+    def test_retarget_leaves_longer_operation_ids_alone(self):
+        canonicalizer = generator_module.EndpointCanonicalizer()
+        v1 = APIEndpoint(method=HTTPMethod.GET, path="/v1/user", operation_id="getUser")
+        v2 = APIEndpoint(method=HTTPMethod.GET, path="/v2/user", operation_id="fetchUser")
+        markdown = "`getUser`; see also getUsers and getUserById. getUser()"
+        assert canonicalizer.retarget(markdown, v1, v2) == (
+            "`fetchUser`; see also getUsers and getUserById. fetchUser()"
+        )
+
+    def test_full_docs_generates_each_class_once(self, mock_client, versioned_spec):
+        mock_client.messages.create.side_effect = [
+            _make_api_response("Fetch /v1/users/{id}", 100, 200),
+            _make_api_response("Orders", 10, 20),
+        ]
+
+        result = generator_module.generate_full_docs(
+            versioned_spec, "claude-sonnet-4-6", stream=False,
+            canonicalizer=generator_module.EndpointCanonicalizer(),
+        )
+
+        assert mock_client.messages.create.call_count == 2
+        assert [doc.endpoint_ref for doc in result.docs] == [
+            "GET /v1/users/{id}", "GET /v1/orders", "GET /v2/users/{id}",
+        ]
+        assert result.docs[2].markdown == "Fetch /v2/users/{id}"
+        assert result.docs[2].tokens_used == 0
+        assert result.total_tokens == 330
+        assert result.model_usage["claude-sonnet-4-6"].docs == 3
+
+    def test_duplicates_of_pending_endpoint_are_pending(self, mock_client, versioned_spec):
+        budget = generator_module.Budget(max_tokens=10)
+
+        result = generator_module.generate_full_docs(
+            versioned_spec, "claude-sonnet-4-6", stream=False, budget=budget,
+            canonicalizer=generator_module.EndpointCanonicalizer(),
+        )
+
+        assert result.pending == ["GET /v1/users/{id}", "GET /v1/orders", "GET /v2/users/{id}"]
+
+
+class TestPromptCompression:
+    def test_oversized_prompts_are_compressed_and_reported(
+        self, mock_client, simple_endpoint, complex_endpoint
+    ):
+        mock_client.messages.create.return_value = _make_api_response("docs", 10, 20)
+        spec = APISpec(title="T", version="1", endpoints=[simple_endpoint, complex_endpoint])
+
+        result = generator_module.generate_full_docs(
+            spec, "claude-sonnet-4-6", stream=False, max_prompt_tokens=300,
+        )
+
+        assert result.compressed == ["POST /users"]
+        prompt = mock_client.messages.create.call_args_list[1].kwargs["messages"][0]["content"]
+        assert "{…}" in prompt
+        assert "field39" not in prompt
+
+    def test_precompressed_endpoints_are_not_compressed_again(
+        self, mock_client, simple_endpoint, complex_endpoint
+    ):
+        mock_client.messages.create.return_value = _make_api_response("docs", 10, 20)
+        spec = APISpec(title="T", version="1", endpoints=[simple_endpoint, complex_endpoint])
+        compressed, _ = generator_module.prompts.compress_endpoint(
+            complex_endpoint, 300, "claude-sonnet-4-6"
+        )
+
+        with patch("src.generator.prompts.compress_endpoint") as mock_compress:
+            result = generator_module.generate_full_docs(
+                spec, "claude-sonnet-4-6", stream=False, max_prompt_tokens=300,
+                prompt_endpoints=[simple_endpoint, compressed],
+            )
+
+        mock_compress.assert_not_called()
+        assert result.compressed == ["POST /users"]
+        prompt = mock_client.messages.create.call_args_list[1].kwargs["messages"][0]["content"]
+        assert prompt == generator_module.prompts.build_endpoint_prompt(compressed)
+
+
+# ---------------------------------------------------------------------------
+# Adaptive max_tokens and continuation
+# ---------------------------------------------------------------------------
+
+class TestOutputCaps:
+    def test_cold_start_uses_generous_cap(self, simple_endpoint, complex_endpoint):
+        predictor = generator_module.OutputCapPredictor()
+        assert predictor.predict(simple_endpoint, "claude-sonnet-4-6") == 4096
+        assert predictor.predict(complex_endpoint, "claude-sonnet-4-6") == 4096
+
+    def test_expected_size_grows_with_complexity(self, simple_endpoint, complex_endpoint):
+        predictor = generator_module.OutputCapPredictor()
+        simple = predictor.expected(simple_endpoint, "claude-sonnet-4-6")
+        assert simple < predictor.expected(complex_endpoint, "claude-sonnet-4-6")
+
+    def test_history_overrides_complexity(self, simple_endpoint):
+        run_history = {"models": {"m": {"mean_output_tokens": 900, "endpoints": {
+            "GET /users/{id}": 2000,
+        }}}}
+        predictor = generator_module.OutputCapPredictor(run_history)
+        assert predictor.predict(simple_endpoint, "m") == 2500
+
+    def test_cap_clamped_to_ceiling(self, simple_endpoint):
+        run_history = {"models": {"m": {"mean_output_tokens": 1, "endpoints": {
+            "GET /users/{id}": 10_000,
+        }}}}
+        predictor = generator_module.OutputCapPredictor(run_history)
+        assert predictor.predict(simple_endpoint, "m") == 4096
+
+    def test_full_docs_request_predicted_caps(self, mock_client, three_endpoint_spec):
+        mock_client.messages.create.return_value = _make_api_response("docs", 10, 20)
+        generator_module.generate_full_docs(three_endpoint_spec, "claude-sonnet-4-6", stream=False)
+        caps = {c.kwargs["max_tokens"] for c in mock_client.messages.create.call_args_list}
+        assert caps == {generator_module.OutputCapPredictor().predict(
+            three_endpoint_spec.endpoints[0], "claude-sonnet-4-6"
+        )}
+
+    def test_truncated_response_is_continued(self, mock_client, three_endpoint_spec):
+        mock_client.messages.create.side_effect = [
+            _make_api_response("## Items\nPart one ", 100, 600, "max_tokens"),
+            _make_api_response(" and part two.", 700, 50),
+            _make_api_response("docs", 10, 20),
+            _make_api_response("docs", 10, 20),
+        ]
+
+        result = generator_module.generate_full_docs(
+            three_endpoint_spec, "claude-sonnet-4-6", stream=False
+        )
+
+        followup = mock_client.messages.create.call_args_list[1].kwargs["messages"]
+        assert followup[-1] == {"role": "assistant", "content": "## Items\nPart one"}
+        assert result.docs[0].markdown == "## Items\nPart one and part two."
+        assert result.docs[0].tokens_used == 1450
+        assert result.docs[0].output_tokens == 650
+
+    def test_continuation_limit_keeps_partial_doc(self, mock_client, spec):
+        mock_client.messages.create.return_value = _make_api_response("more", 10, 20, "max_tokens")
+
+        result = generator_module.generate_full_docs(spec, "claude-sonnet-4-6", stream=False)
+
+        assert mock_client.messages.create.call_count == 3
+        assert result.docs[0].markdown == "moremoremore"
+
+
+# ---------------------------------------------------------------------------
+# Concurrency and progress
+# ---------------------------------------------------------------------------
+
+class TestConcurrency:
+    def test_concurrent_docs_returned_in_spec_order(self, mock_client, three_endpoint_spec):
+        gate = threading.Barrier(3, timeout=5)
+
+        def respond(**kwargs):
+            gate.wait()
+            content = kwargs["messages"][0]["content"]
+            return _make_api_response(content.split("**Path:** ")[1].split("\n")[0], 10, 20)
+
+        mock_client.messages.create.side_effect = respond
+
+        result = generator_module.generate_full_docs(
+            three_endpoint_spec, "claude-sonnet-4-6", stream=False, concurrency=3
+        )
+
+        assert [doc.markdown for doc in result.docs] == ["/items/0", "/items/1", "/items/2"]
+        assert result.total_tokens == 90
+        assert result.model_usage["claude-sonnet-4-6"].docs == 3
+
+    def test_progress_receives_events_instead_of_stdout(self, mock_client, spec, capsys):
+        mock_client.messages.create.return_value = _make_api_response("docs", 10, 20)
+        progress = MagicMock()
+
+        generator_module.generate_full_docs(
+            spec, "claude-sonnet-4-6", stream=False, concurrency=2, progress=progress
+        )
+
+        progress.start.assert_called_once_with("GET /users/{id}")
+        progress.finish.assert_called_once_with("GET /users/{id}", 20)
+        progress.close.assert_called_once()
+        assert capsys.readouterr().out == ""
+
+    def test_retry_notices_go_to_progress(self, mock_client, spec, capsys):
+        rate_limit_err = anthropic.RateLimitError(
+            message="Rate limit exceeded", response=_make_httpx_response(429), body=None,
+        )
+        mock_client.messages.create.side_effect = [
+            rate_limit_err, _make_api_response("docs", 10, 20),
+        ]
+        progress = MagicMock()
+
+        with patch("src.generator.time.sleep"):
+            generator_module.generate_full_docs(
+                spec, "claude-sonnet-4-6", stream=False, concurrency=2, progress=progress
+            )
+
+        progress.log.assert_any_call("Rate limit hit, retrying in 2s...")
+        assert capsys.readouterr().out == ""
+
+    def test_shared_executor_runs_the_calls(self, mock_client, three_endpoint_spec):
+        mock_client.messages.create.return_value = _make_api_response("docs", 10, 20)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            with patch.object(pool, "submit", wraps=pool.submit) as submit:
+                result = generator_module.generate_full_docs(
+                    three_endpoint_spec, "claude-sonnet-4-6", stream=False, executor=pool
+                )
+
+        assert submit.call_count == 3
+        assert [doc.endpoint_ref for doc in result.docs] == [f"GET /items/{n}" for n in range(3)]
+
+    def test_failures_reported_to_progress(self, mock_client, spec):
+        mock_client.messages.create.side_effect = ValueError("boom")
+        progress = MagicMock()
+
+        generator_module.generate_full_docs(
+            spec, "claude-sonnet-4-6", stream=False, concurrency=2, progress=progress
+        )
+
+        progress.fail.assert_called_once_with("GET /users/{id}")
+
+    def test_concurrent_reservations_respect_budget(self):
+        budget = generator_module.Budget(max_tokens=3000)
+        reserved = []
+        # Threads stay alive until all have reserved, as pool workers do during a call.
+        in_flight = threading.Barrier(5, timeout=5)
+
+        def reserve():
+            try:
+                reserved.append(budget.reserve("claude-sonnet-4-6", "prompt", 1000))
+            except generator_module.BudgetExceeded:
+                pass
+            in_flight.wait()
+
+        threads = [threading.Thread(target=reserve) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sum(reserved) < 3000
+        assert len(reserved) < 5
+
+
+# ---------------------------------------------------------------------------
+# Request instrumentation
+# ---------------------------------------------------------------------------
+
+class TestInstrumentation:
+    def test_records_each_request(self, mock_client, three_endpoint_spec):
+        mock_client.messages.create.return_value = _make_api_response("docs", 10, 20)
+        recorder = RunRecorder()
+
+        generator_module.generate_full_docs(
+            three_endpoint_spec, "claude-sonnet-4-6", stream=False, recorder=recorder
+        )
+
+        assert [s.label for s in recorder.requests] == [
+            "GET /items/0", "GET /items/1", "GET /items/2"
+        ]
+        first = recorder.requests[0]
+        assert (first.status, first.input_tokens, first.output_tokens) == ("ok", 10, 20)
+        assert first.latency_seconds >= 0
+        assert first.ttft_seconds is None
+
+    def test_streaming_records_time_to_first_token(self, mock_client, spec):
+        stream_ctx = MagicMock()
+        stream_ctx.__enter__ = MagicMock(return_value=stream_ctx)
+        stream_ctx.__exit__ = MagicMock(return_value=False)
+        stream_ctx.text_stream = ["Hello", " world"]
+        stream_ctx.get_final_message.return_value = _make_api_response("Hello world", 5, 2)
+        mock_client.messages.stream.return_value = stream_ctx
+        recorder = RunRecorder()
+
+        generator_module.generate_full_docs(
+            spec, "claude-sonnet-4-6", stream=True, recorder=recorder
+        )
+
+        assert recorder.requests[0].ttft_seconds is not None
+
+    def test_records_retries_and_wait(self, spec):
+        rate_limit_err = anthropic.RateLimitError(
+            message="Rate limit exceeded", response=_make_httpx_response(429), body=None,
+        )
+        recorder = RunRecorder()
+
+        with patch(
+            "src.generator._call_api", side_effect=[rate_limit_err, ("docs", 1, 2, "end_turn")]
+        ):
+            with patch("src.generator.time.sleep"):
+                generator_module.generate_full_docs(
+                    spec, "claude-sonnet-4-6", stream=False, recorder=recorder
+                )
+
+        assert recorder.requests[0].retries == 1
+        assert recorder.requests[0].wait_seconds == 2
+
+    def test_failed_request_recorded_with_error_class(self, mock_client, spec):
+        mock_client.messages.create.side_effect = ValueError("boom")
+        recorder = RunRecorder()
+
+        generator_module.generate_full_docs(
+            spec, "claude-sonnet-4-6", stream=False, recorder=recorder
+        )
+
+        assert (recorder.requests[0].status, recorder.requests[0].error) == ("error", "ValueError")
+
+    def test_overview_recorded(self, mock_client, spec):
+        mock_client.messages.create.return_value = _make_api_response("Overview", 30, 40)
+        recorder = RunRecorder()
+
+        generator_module.generate_overview(spec, "claude-sonnet-4-6", recorder=recorder)
+
+        assert recorder.requests[0].label == "overview"
+        assert recorder.requests[0].output_tokens == 40
+
+
 # ---------------------------------------------------------------------------
 # 3.6 Rate limit retry
 # ---------------------------------------------------------------------------
@@ -163,7 +960,7 @@ class TestRateLimitRetry:
             response=_make_httpx_response(429),
             body=None,
         )
-        success = ("docs", 10, 20)
+        success = ("docs", 10, 20, "end_turn")
 
         with patch("src.generator._call_api", side_effect=[rate_limit_err, success]):
             with patch("src.generator.time.sleep") as mock_sleep:
@@ -189,6 +986,259 @@ class TestRateLimitRetry:
                     )
 
 
+# ---------------------------------------------------------------------------
+# Priority scheduling
+# ---------------------------------------------------------------------------
+
+def _tagged(path, *tags):
+    return APIEndpoint(method=HTTPMethod.GET, path=path, tags=list(tags))
+
+
+class TestPriorityScheduler:
+    def _order(self, scheduler, endpoints, sizes=None):
+        units = [[i] for i in range(len(endpoints))]
+        ordered = scheduler.order(units, endpoints, sizes or [0] * len(endpoints))
+        return [endpoints[unit[0]].path for unit in ordered]
+
+    def test_tags_in_given_order(self):
+        endpoints = [_tagged("/a", "misc"), _tagged("/b", "users"), _tagged("/c", "billing")]
+        scheduler = generator_module.PriorityScheduler(tags=["billing", "users"])
+        assert self._order(scheduler, endpoints) == ["/c", "/b", "/a"]
+
+    def test_path_patterns_then_spec_order(self):
+        endpoints = [_tagged("/a"), _tagged("/admin/x"), _tagged("/b"), _tagged("/admin/y")]
+        scheduler = generator_module.PriorityScheduler(paths=["^/admin"])
+        assert self._order(scheduler, endpoints) == ["/admin/x", "/admin/y", "/a", "/b"]
+
+    def test_changed_first(self):
+        endpoints = [_tagged("/a"), _tagged("/b"), _tagged("/c")]
+        scheduler = generator_module.PriorityScheduler(changed={"GET /c"})
+        assert self._order(scheduler, endpoints) == ["/c", "/a", "/b"]
+
+    def test_longest_first_within_priority(self):
+        endpoints = [_tagged("/a"), _tagged("/b", "users"), _tagged("/c"), _tagged("/d", "users")]
+        scheduler = generator_module.PriorityScheduler(tags=["users"], longest_first=True)
+        order = self._order(scheduler, endpoints, sizes=[100, 200, 900, 800])
+        assert order == ["/d", "/b", "/c", "/a"]
+
+    def test_batch_takes_best_rank_and_total_size(self):
+        endpoints = [_tagged("/a"), _tagged("/b"), _tagged("/c", "users")]
+        scheduler = generator_module.PriorityScheduler(tags=["users"])
+        units = scheduler.order([[0], [1, 2]], endpoints, [0, 0, 0])
+        assert units == [[1, 2], [0]]
+
+    def test_calls_follow_priority_but_docs_stay_in_spec_order(self):
+        endpoints = [_tagged("/a"), _tagged("/b"), _tagged("/c", "billing")]
+        spec = APISpec(title="T", version="1", endpoints=endpoints)
+        scheduler = generator_module.PriorityScheduler(tags=["billing"])
+        called = []
+
+        def fake_complete(messages, *args, **kwargs):
+            called.append(re.search(r"\*\*Path:\*\* (\S+)", messages[0]["content"]).group(1))
+            return "doc", 10, 5, True
+
+        with patch("src.generator._complete", side_effect=fake_complete):
+            result = generator_module.generate_full_docs(
+                spec, "claude-sonnet-4-6", stream=False, scheduler=scheduler
+            )
+
+        assert called == ["/c", "/a", "/b"]
+        assert [d.endpoint_ref for d in result.docs] == ["GET /a", "GET /b", "GET /c"]
+
+
+# ---------------------------------------------------------------------------
+# Hedged requests
+# ---------------------------------------------------------------------------
+
+MESSAGES = [{"role": "user", "content": "Document GET /users/{id}"}]
+
+
+class _FakeStream:
+    def __init__(self) -> None:
+        self.closed = threading.Event()
+
+    def close(self) -> None:
+        self.closed.set()
+
+
+def _racing_call():
+    """Return a fake _call_api where the first attempt stalls until closed and the hedge wins."""
+    stream = _FakeStream()
+    attempts = []
+
+    def fake_call(messages, model, stream_flag, max_tokens, on_text, stats, attempt):
+        attempts.append(attempt)
+        if len(attempts) == 1:
+            attempt.bind(stream)
+            on_text("x" * 40)
+            attempt.chars += 40
+            stream.closed.wait(5)
+            raise httpx.ReadError("stream closed")
+        on_text("hedge doc")
+        return ("hedge doc", 10, 5, "end_turn")
+
+    return fake_call, stream.closed
+
+
+def _warm_policy(**kwargs):
+    policy = generator_module.HedgePolicy(min_samples=3, **kwargs)
+    for _ in range(3):
+        policy.observe(0.01, 0.01)
+    return policy
+
+
+class TestHedgePolicy:
+    def test_no_delay_while_warming_up(self):
+        policy = generator_module.HedgePolicy(min_samples=3)
+        policy.observe(1.0, 0.1)
+        assert policy.delay() is None
+
+    def test_delay_is_observed_quantile(self):
+        policy = generator_module.HedgePolicy(quantile=95, min_samples=10)
+        for latency in range(1, 101):
+            policy.observe(float(latency), 0.0)
+        assert policy.delay() == pytest.approx(95.05)
+
+    def test_extra_cost_is_capped(self):
+        policy = generator_module.HedgePolicy(min_samples=1, max_extra=0.1)
+        for _ in range(20):
+            policy.observe(1.0, 1.0)
+
+        assert policy.try_hedge() == 1.0
+        assert policy.try_hedge() == 1.0
+        assert policy.try_hedge() is None
+        assert policy.hedges == 2
+
+    def test_settle_replaces_reservation_with_actual_cost(self):
+        policy = _warm_policy(max_extra=1.0)
+        reserved = policy.try_hedge()
+        policy.settle(reserved, 0.002, won=True)
+        assert policy.extra_cost == pytest.approx(0.002)
+        assert policy.wins == 1
+
+
+class TestHedgedCalls:
+    def test_calls_stream_and_are_observed_while_warming_up(self):
+        policy = generator_module.HedgePolicy(min_samples=3)
+        with patch("src.generator._call_api", return_value=("doc", 10, 5, "end_turn")) as mock_api:
+            result = generator_module._call_with_retry(
+                MESSAGES, "claude-sonnet-4-6", False, hedge=policy
+            )
+
+        assert result == ("doc", 10, 5, "end_turn")
+        assert mock_api.call_count == 1
+        assert mock_api.call_args.args[2] is True
+        assert len(policy.latencies) == 1
+        assert policy.hedges == 0
+
+    def test_slow_call_is_hedged_and_loser_cancelled(self):
+        policy = _warm_policy(max_extra=1.0)
+        fake_call, loser_closed = _racing_call()
+
+        stats = generator_module.RequestStats("GET /users/{id}", "claude-sonnet-4-6")
+        with patch("src.generator._call_api", side_effect=fake_call):
+            text, in_tok, out_tok, _ = generator_module._call_with_retry(
+                MESSAGES, "claude-sonnet-4-6", False, stats=stats, hedge=policy
+            )
+
+        assert text == "hedge doc"
+        assert (in_tok, out_tok) == (20, 15)  # the loser's input and ~40 chars of output
+        assert loser_closed.wait(1)
+        assert stats.hedges == 1
+        assert policy.wins == 1
+        assert policy.extra_cost == pytest.approx(
+            utils.estimate_cost(10, 10, "claude-sonnet-4-6")
+        )
+
+    def test_only_the_winners_text_is_streamed(self):
+        policy = _warm_policy(max_extra=1.0)
+        fake_call, _ = _racing_call()
+        chunks = []
+
+        with patch("src.generator._call_api", side_effect=fake_call):
+            generator_module._call_with_retry(
+                MESSAGES, "claude-sonnet-4-6", True, on_text=chunks.append, hedge=policy
+            )
+
+        assert chunks == ["hedge doc"]
+
+    def test_hedge_is_held_against_budget_and_loser_charged(self):
+        policy = _warm_policy(max_extra=1.0)
+        budget = generator_module.Budget(max_tokens=100_000)
+        fake_call, _ = _racing_call()
+        holds = []
+
+        def tracking_call(*args, **kwargs):
+            holds.append(len(budget._holds))
+            return fake_call(*args, **kwargs)
+
+        with patch("src.generator._call_api", side_effect=tracking_call):
+            generator_module._complete(
+                MESSAGES, "claude-sonnet-4-6", False, max_tokens=1000, budget=budget, hedge=policy
+            )
+
+        assert holds[-1] == 1  # the hedge started with its worst case held
+        assert budget.tokens == 35  # winner 10 + 5, loser 10 + ~10
+        assert budget._holds == {}
+
+    def test_no_hedge_past_budget(self):
+        policy = _warm_policy(max_extra=1.0)
+        budget = generator_module.Budget(max_tokens=1500)
+        budget.reserve_tokens("claude-sonnet-4-6", 10, ceiling=1000)
+
+        def slow_call(*args, **kwargs):
+            time.sleep(0.05)
+            return ("doc", 10, 5, "end_turn")
+
+        with patch("src.generator._call_api", side_effect=slow_call) as mock_api:
+            generator_module._call_with_retry(
+                MESSAGES, "claude-sonnet-4-6", False, max_tokens=1000, hedge=policy, budget=budget
+            )
+
+        assert mock_api.call_count == 1
+        assert policy.hedges == 0
+        assert list(budget._holds) == [threading.get_ident()]
+
+    def test_no_hedge_past_cost_cap(self):
+        policy = _warm_policy(max_extra=0.0)
+
+        def slow_call(*args, **kwargs):
+            time.sleep(0.05)
+            return ("doc", 10, 5, "end_turn")
+
+        with patch("src.generator._call_api", side_effect=slow_call) as mock_api:
+            result = generator_module._call_with_retry(
+                MESSAGES, "claude-sonnet-4-6", False, hedge=policy
+            )
+
+        assert result[0] == "doc"
+        assert mock_api.call_count == 1
+        assert policy.hedges == 0
+
+    def test_primary_error_is_retried(self):
+        policy = _warm_policy(max_extra=0.0)
+        server_err = anthropic.InternalServerError(
+            message="Internal server error", response=_make_httpx_response(500), body=None,
+        )
+        with patch("src.generator._call_api", side_effect=[server_err, ("doc", 1, 1, "end_turn")]):
+            with patch("src.generator.time.sleep"):
+                result = generator_module._call_with_retry(
+                    MESSAGES, "claude-sonnet-4-6", False, hedge=policy
+                )
+        assert result[0] == "doc"
+
+    def test_full_docs_passes_policy_to_calls(self, spec):
+        policy = generator_module.HedgePolicy()
+        with patch(
+            "src.generator._call_with_retry", return_value=("doc", 10, 5, "end_turn")
+        ) as mock_call:
+            generator_module.generate_full_docs(
+                spec, "claude-sonnet-4-6", stream=False, hedge=policy
+            )
+
+        assert mock_call.call_args.kwargs["hedge"] is policy
+
+
 # ---------------------------------------------------------------------------
 # 3.7 Server error skip
 # ---------------------------------------------------------------------------
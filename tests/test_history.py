@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from src.history import (
+    DEFAULT_OUTPUT_TOKENS_PER_ENDPOINT,
+    OVERVIEW_OUTPUT_TOKENS,
+    changed_endpoints,
+    default_history_path,
+    expected_endpoint_output_tokens,
+    expected_output_tokens,
+    load_history,
+    record_prompts,
+    record_run,
+    save_history,
+)
+from src.models import GeneratedDoc
+
+MODEL = "claude-sonnet-4-6"
+
+
+def _doc(ref: str, output_tokens: int, model: str = MODEL) -> GeneratedDoc:
+    return GeneratedDoc(
+        endpoint_ref=ref, markdown="", tokens_used=output_tokens, model=model,
+        output_tokens=output_tokens,
+    )
+
+
+class TestLoadSave:
+    def test_missing_file_is_empty_history(self, tmp_path):
+        assert load_history(str(tmp_path / "nope.json")) == {"models": {}}
+
+    def test_corrupt_file_is_empty_history(self, tmp_path):
+        path = tmp_path / "history.json"
+        path.write_text("{not json", encoding="utf-8")
+        assert load_history(str(path)) == {"models": {}}
+
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / "sub" / "history.json")
+        history = {"models": {}}
+        record_run(history, [_doc("GET /a", 300)])
+        save_history(path, history)
+        assert load_history(path) == json.loads(json.dumps(history))
+
+    def test_failed_save_keeps_the_old_history(self, tmp_path):
+        path = str(tmp_path / "history.json")
+        save_history(path, {"models": {}})
+
+        with pytest.raises(TypeError):
+            save_history(path, {"models": {}, "bad": object()})
+
+        assert load_history(path) == {"models": {}}
+        assert [p.name for p in tmp_path.iterdir()] == ["history.json"]
+
+    def test_default_path_next_to_output(self):
+        assert default_history_path("output/docs.md") == "output/.docgen-history.json"
+
+
+class TestRecordRun:
+    def test_skips_docs_without_output_tokens(self):
+        history = {"models": {}}
+        assert record_run(history, [_doc("GET /a", 0)]) == 0
+        assert history == {"models": {}}
+
+    def test_smooths_repeated_observations(self):
+        history = {"models": {}}
+        record_run(history, [_doc("GET /a", 1000)])
+        record_run(history, [_doc("GET /a", 2000)])
+        assert expected_endpoint_output_tokens(history, MODEL, "GET /a") == 1300
+
+
+class TestPromptHashes:
+    def test_everything_changed_without_history(self):
+        assert changed_endpoints({"models": {}}, {"GET /a": "h1", "GET /b": "h2"}) == {
+            "GET /a", "GET /b",
+        }
+
+    def test_only_new_or_different_hashes_changed(self):
+        history = {"models": {}}
+        assert record_prompts(history, {"GET /a": "h1", "GET /b": "h2"}) == 2
+        assert record_prompts(history, {"GET /a": "h1"}) == 0
+        assert changed_endpoints(history, {"GET /a": "h1", "GET /b": "h3", "GET /c": "h4"}) == {
+            "GET /b", "GET /c",
+        }
+
+    def test_malformed_prompts_dropped_on_load(self, tmp_path):
+        path = tmp_path / "history.json"
+        path.write_text(json.dumps({"models": {}, "prompts": []}), encoding="utf-8")
+        assert load_history(str(path)) == {"models": {}}
+
+
+class TestExpectedOutputTokens:
+    def test_defaults_without_history(self):
+        history = {"models": {}}
+        total = expected_output_tokens(history, MODEL, ["GET /a", "GET /b"])
+        assert total == 2 * DEFAULT_OUTPUT_TOKENS_PER_ENDPOINT + OVERVIEW_OUTPUT_TOKENS
+
+    def test_uses_endpoint_then_model_mean(self):
+        history = {"models": {}}
+        record_run(history, [_doc("GET /a", 400)])
+        assert expected_endpoint_output_tokens(history, MODEL, "GET /a") == 400
+        assert expected_endpoint_output_tokens(history, MODEL, "GET /new") == 400
+
+    def test_history_is_per_model(self):
+        history = {"models": {}}
+        record_run(history, [_doc("GET /a", 400, model="claude-haiku-4-5-20251001")])
+        assert expected_endpoint_output_tokens(history, MODEL, "GET /a") == pytest.approx(
+            DEFAULT_OUTPUT_TOKENS_PER_ENDPOINT
+        )
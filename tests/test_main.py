@@ -1,10 +1,12 @@
+import subprocess
 import sys
-from unittest.mock import MagicMock, call, mock_open, patch
+from pathlib import Path
+from unittest.mock import ANY, MagicMock, call, mock_open, patch
 
 import pytest
 
 from src.main import build_parser, main
-from src.models import APIEndpoint, APISpec, GeneratedDoc, GenerationResult, HTTPMethod
+from src.models import APIEndpoint, APISpec, GeneratedDoc, GenerationResult, HTTPMethod, Parameter
 
 
 # ---------------------------------------------------------------------------
@@ -84,6 +86,19 @@ class TestBuildParser:
             parser.parse_args(["specs/sample.json", "-f", "pdf"])
         assert exc_info.value.code == 2
 
+    @pytest.mark.parametrize("flag", ["--priority-path", "--dedupe-prefix"])
+    def test_invalid_regex_is_a_usage_error(self, flag, capsys):
+        with pytest.raises(SystemExit) as exc_info:
+            build_parser().parse_args(["specs/sample.json", flag, "(unclosed"])
+        assert exc_info.value.code == 2
+        assert "invalid regex" in capsys.readouterr().err
+
+    def test_serve_subcommand_dispatches_to_server(self):
+        with patch.object(sys, "argv", ["main", "serve", "--port", "9000"]):
+            with patch("src.server.main") as mock_serve:
+                main()
+        mock_serve.assert_called_once_with(["--port", "9000"])
+
 
 # ---------------------------------------------------------------------------
 # main() error path tests
@@ -100,6 +115,47 @@ class TestMainErrors:
         captured = capsys.readouterr()
         assert "ANTHROPIC_API_KEY" in captured.err
 
+    def test_queue_without_role_is_a_usage_error(self, capsys):
+        with patch.object(sys, "argv", ["main", "specs/sample.json", "--queue", "q.db"]):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+        assert exc_info.value.code == 2
+        assert "--enqueue" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("flag", [["--report", "r.json"], ["--metrics-file", "m.prom"]])
+    def test_run_reports_with_work_are_a_usage_error(self, capsys, flag):
+        argv = ["main", "specs/sample.json", "--queue", "q.db", "--work", *flag]
+        with patch.object(sys, "argv", argv):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+        assert exc_info.value.code == 2
+        assert "--work" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("value", ["0", "-2"])
+    def test_concurrency_below_one_is_a_usage_error(self, capsys, value):
+        with patch.object(sys, "argv", ["main", "specs/sample.json", "--concurrency", value]):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+        assert exc_info.value.code == 2
+        assert "--concurrency" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("flag", ["--model", "--simple-model"])
+    def test_unknown_model_is_a_usage_error(self, capsys, flag):
+        with patch.object(sys, "argv", ["main", "specs/sample.json", flag, "claude-nope"]):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+        assert exc_info.value.code == 2
+        assert f"{flag}: unknown model 'claude-nope'" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("flag", [["--max-cost", "1"], ["--max-tokens", "1000"]])
+    def test_budget_in_queue_mode_is_a_usage_error(self, capsys, flag):
+        argv = ["main", "specs/sample.json", "--queue", "q.db", "--work", *flag]
+        with patch.object(sys, "argv", argv):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+        assert exc_info.value.code == 2
+        assert "queue mode" in capsys.readouterr().err
+
     def test_missing_spec_file_exits_nonzero(self, capsys):
         with patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-test"}, clear=False):
             with patch("src.main.load_dotenv"):
@@ -138,7 +194,7 @@ class TestMainSuccess:
                                 with patch("src.formatter.format_markdown", return_value="md output") as mock_md:
                                     with patch("src.formatter.format_html", return_value="html output") as mock_html:
                                         with patch("os.makedirs") as mock_makedirs:
-                                            with patch("builtins.open", mock_open()) as mock_file:
+                                            with patch("builtins.open", mock_open()) as mock_file, patch("os.replace"):
                                                 with patch("builtins.input", return_value="y"):
                                                     main()
                                                     return (
@@ -152,9 +208,29 @@ class TestMainSuccess:
         mock_parse, mock_overview, mock_full, mock_md, mock_html, _, _ = mocks
 
         mock_parse.assert_called_once_with("specs/sample.json")
-        mock_overview.assert_called_once_with(minimal_spec, model="claude-sonnet-4-6")
-        mock_full.assert_called_once_with(minimal_spec, model="claude-sonnet-4-6", stream=False)
-        mock_md.assert_called_once_with(minimal_result, SAMPLE_OVERVIEW)
+        mock_overview.assert_called_once_with(
+            minimal_spec, model="claude-sonnet-4-6", budget=None, recorder=None, doc_cache=None
+        )
+        mock_full.assert_called_once_with(
+            minimal_spec,
+            model="claude-sonnet-4-6",
+            stream=False,
+            store=None,
+            budget=None,
+            router=None,
+            batch_tokens=None,
+            canonicalizer=None,
+            max_prompt_tokens=None,
+            output_caps=ANY,
+            concurrency=1,
+            progress=None,
+            recorder=None,
+            hedge=None,
+            scheduler=None,
+            doc_cache=None,
+            prompt_endpoints=minimal_spec.endpoints,
+        )
+        mock_md.assert_called_once_with(minimal_result, SAMPLE_OVERVIEW, reproducible=False)
         mock_html.assert_not_called()
 
     def test_html_pipeline(self, minimal_spec, minimal_result):
@@ -162,7 +238,9 @@ class TestMainSuccess:
         mocks = self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW, fmt="html")
         mock_parse, mock_overview, mock_full, mock_md, mock_html, _, _ = mocks
 
-        mock_html.assert_called_once_with(minimal_result, SAMPLE_OVERVIEW)
+        mock_html.assert_called_once_with(
+            minimal_result, SAMPLE_OVERVIEW, reproducible=False, docs=None
+        )
         mock_md.assert_not_called()
 
     def test_output_directory_created(self, minimal_spec, minimal_result):
@@ -170,11 +248,472 @@ class TestMainSuccess:
         mocks = self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
         _, _, _, _, _, mock_makedirs, _ = mocks
 
-        mock_makedirs.assert_called_once_with("output/subdir", exist_ok=True)
+        mock_makedirs.assert_any_call("output/subdir", exist_ok=True)
 
     def test_stream_flag_passed_to_generator(self, minimal_spec, minimal_result):
         argv = ["main", "specs/sample.json", "--stream"]
         mocks = self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
         _, _, mock_full, _, _, _, _ = mocks
 
-        mock_full.assert_called_once_with(minimal_spec, model="claude-sonnet-4-6", stream=True)
+        mock_full.assert_called_once_with(
+            minimal_spec,
+            model="claude-sonnet-4-6",
+            stream=True,
+            store=None,
+            budget=None,
+            router=None,
+            batch_tokens=None,
+            canonicalizer=None,
+            max_prompt_tokens=None,
+            output_caps=ANY,
+            concurrency=1,
+            progress=None,
+            recorder=None,
+            hedge=None,
+            scheduler=None,
+            doc_cache=None,
+            prompt_endpoints=minimal_spec.endpoints,
+        )
+
+    def test_budget_flags_passed_to_generator(self, minimal_spec, minimal_result):
+        argv = ["main", "specs/sample.json", "--max-cost", "0.5", "--max-tokens", "10000"]
+        mocks = self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+        _, mock_overview, mock_full, _, _, _, _ = mocks
+
+        budget = mock_full.call_args.kwargs["budget"]
+        assert budget.max_cost == 0.5
+        assert budget.max_tokens == 10000
+        assert mock_overview.call_args.kwargs["budget"] is budget
+
+    def test_prompt_tokens_passed_and_reported_in_dry_run(self, minimal_spec, minimal_result, capsys):
+        mocks = self._run_main(
+            ["main", "specs/sample.json", "--prompt-tokens", "1"], minimal_spec, minimal_result,
+            SAMPLE_OVERVIEW,
+        )
+        assert mocks[2].call_args.kwargs["max_prompt_tokens"] == 1
+        assert mocks[2].call_args.kwargs["prompt_endpoints"] == minimal_spec.endpoints
+
+        minimal_spec.endpoints[0].parameters = [
+            Parameter(name="limit", location="query", description="Page size")
+        ]
+        with patch.object(sys, "argv", ["main", "specs/sample.json", "--dry-run", "--prompt-tokens", "1"]):
+            with patch("src.main.load_dotenv"):
+                with patch("src.parser.parse_spec", return_value=minimal_spec):
+                    with pytest.raises(SystemExit):
+                        main()
+        assert "Prompts compressed to fit 1 tokens:" in capsys.readouterr().out
+
+    def test_base_url_configures_client(self, minimal_spec, minimal_result):
+        argv = ["main", "specs/sample.json", "--base-url", "http://127.0.0.1:8787"]
+        with patch("src.generator.configure_client") as mock_configure:
+            self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+
+        assert mock_configure.call_args.kwargs["base_url"] == "http://127.0.0.1:8787"
+
+    def test_pool_size_defaults_to_concurrency(self, minimal_spec, minimal_result):
+        argv = ["main", "specs/sample.json", "--concurrency", "8", "--read-timeout", "30"]
+        with patch("src.generator.configure_client") as mock_configure:
+            self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+
+        mock_configure.assert_called_once_with(
+            base_url=None, pool_size=8, keepalive_expiry=None, http2=False,
+            connect_timeout=None, read_timeout=30.0,
+        )
+
+    def test_hedge_builds_policy_and_doubles_pool(self, minimal_spec, minimal_result):
+        argv = ["main", "specs/sample.json", "--concurrency", "4", "--hedge",
+                "--hedge-max-extra", "0.05"]
+        with patch("src.generator.configure_client") as mock_configure:
+            mocks = self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+
+        assert mock_configure.call_args.kwargs["pool_size"] == 8
+        assert mocks[2].call_args.kwargs["hedge"].max_extra == 0.05
+
+    def test_priority_flags_build_scheduler(self, minimal_spec, minimal_result):
+        argv = ["main", "specs/sample.json", "--priority-tag", "billing", "--priority-tag", "users",
+                "--priority-path", "^/admin", "--longest-first"]
+        mocks = self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+
+        scheduler = mocks[2].call_args.kwargs["scheduler"]
+        assert scheduler.tags == ["billing", "users"]
+        assert scheduler.longest_first is True
+        assert scheduler.changed is None
+
+    def test_priority_changed_uses_history(self, minimal_spec, minimal_result, capsys):
+        argv = ["main", "specs/sample.json", "--priority-changed"]
+        mocks = self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+
+        assert mocks[2].call_args.kwargs["scheduler"].changed == {"GET /api/v1/items"}
+        assert "Changed since last run: 1/1 endpoint(s)" in capsys.readouterr().out
+
+    def test_pool_size_below_concurrency_warns(self, minimal_spec, minimal_result, capsys):
+        argv = ["main", "specs/sample.json", "--concurrency", "8", "--pool-size", "2"]
+        with patch("src.generator.configure_client") as mock_configure:
+            self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+
+        assert mock_configure.call_args.kwargs["pool_size"] == 2
+        assert "calls will queue for connections" in capsys.readouterr().out
+
+    def test_http2_without_h2_exits(self, minimal_spec, minimal_result, capsys):
+        argv = ["main", "specs/sample.json", "--http2"]
+        error = RuntimeError("HTTP/2 needs the h2 package")
+        with patch("src.generator.configure_client", side_effect=error):
+            with pytest.raises(SystemExit):
+                self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+
+        assert "h2 package" in capsys.readouterr().err
+
+    def test_concurrency_uses_progress_display(self, minimal_spec, minimal_result):
+        argv = ["main", "specs/sample.json", "--concurrency", "4"]
+        mocks = self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+        kwargs = mocks[2].call_args.kwargs
+
+        assert kwargs["concurrency"] == 4
+        assert kwargs["progress"].total == 1
+
+    def test_report_flag_writes_run_report(self, minimal_spec, minimal_result):
+        argv = ["main", "specs/sample.json", "--report", "out/run.json"]
+        with patch("src.telemetry.write_report") as mock_write:
+            mocks = self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+
+        recorder = mocks[2].call_args.kwargs["recorder"]
+        assert mocks[1].call_args.kwargs["recorder"] is recorder
+        mock_write.assert_called_once_with("out/run.json", ANY)
+
+    def test_metrics_file_written_with_spec_label(self, minimal_spec, minimal_result):
+        argv = ["main", "specs/sample.json", "--metrics-file", "textfile/docgen.prom"]
+        with patch("src.metrics.write_metrics") as mock_write:
+            mocks = self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+
+        assert mocks[2].call_args.kwargs["recorder"] is not None
+        path, text = mock_write.call_args.args
+        assert path == "textfile/docgen.prom"
+        assert 'docgen_pending_endpoints{spec="sample.json"} 0' in text
+
+    def test_profile_flag_prints_phase_table(self, minimal_spec, minimal_result, capsys):
+        argv = ["main", "specs/sample.json", "--profile"]
+        self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+
+        out = capsys.readouterr().out
+        assert "Profile:" in out
+        for phase in ("prompts", "generate", "format", "history"):
+            assert f"\n{phase} " in out
+
+    def test_simple_model_builds_router(self, minimal_spec, minimal_result):
+        argv = ["main", "specs/sample.json", "--simple-model", "claude-haiku-4-5-20251001"]
+        mocks = self._run_main(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+        _, _, mock_full, _, _, _, _ = mocks
+
+        router = mock_full.call_args.kwargs["router"]
+        assert router.simple_model == "claude-haiku-4-5-20251001"
+
+
+# ---------------------------------------------------------------------------
+# --reproducible
+# ---------------------------------------------------------------------------
+
+class TestReproducible:
+    def _run(self, argv, spec, result, overview):
+        with patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-test", "SOURCE_DATE_EPOCH": "0"}):
+            with patch("src.main.load_dotenv"):
+                with patch.object(sys, "argv", argv):
+                    with patch("src.parser.parse_spec", return_value=spec):
+                        with patch("src.generator.generate_overview", return_value=overview) as mock_overview:
+                            with patch("src.generator.generate_full_docs", return_value=result) as mock_full:
+                                try:
+                                    main()
+                                except SystemExit as exc:
+                                    assert exc.code == 0
+                                return mock_overview, mock_full
+
+    def test_regeneration_skipped_when_inputs_unchanged(self, tmp_path, minimal_spec, minimal_result, capsys):
+        out = tmp_path / "docs.md"
+        argv = ["main", "specs/sample.json", "-y", "--reproducible", "-o", str(out)]
+
+        _, first_full = self._run(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+        first_output = out.read_text(encoding="utf-8")
+        _, second_full = self._run(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+
+        first_full.assert_called_once()
+        second_full.assert_not_called()
+        assert "Input hash: sha256:" in first_output
+        assert out.read_text(encoding="utf-8") == first_output
+        assert "up to date" in capsys.readouterr().out
+
+    def test_model_change_invalidates_output(self, tmp_path, minimal_spec, minimal_result):
+        out = tmp_path / "docs.md"
+        argv = ["main", "specs/sample.json", "-y", "--reproducible", "-o", str(out)]
+        self._run(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+
+        _, mock_full = self._run(
+            argv + ["-m", "claude-haiku-4-5-20251001"], minimal_spec, minimal_result, SAMPLE_OVERVIEW
+        )
+
+        mock_full.assert_called_once()
+
+    def test_batch_tokens_change_invalidates_output(self, tmp_path, minimal_spec, minimal_result):
+        out = tmp_path / "docs.md"
+        argv = ["main", "specs/sample.json", "-y", "--reproducible", "-o", str(out)]
+        self._run(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+
+        _, mock_full = self._run(
+            argv + ["--batch-tokens", "2000"], minimal_spec, minimal_result, SAMPLE_OVERVIEW
+        )
+
+        mock_full.assert_called_once()
+
+    def test_partial_output_is_regenerated(self, tmp_path, minimal_spec, minimal_result):
+        out = tmp_path / "docs.md"
+        argv = ["main", "specs/sample.json", "-y", "--reproducible", "-o", str(out)]
+        partial = minimal_result.model_copy(
+            update={"docs": [], "pending": ["GET /api/v1/items"]}
+        )
+
+        self._run(argv, minimal_spec, partial, SAMPLE_OVERVIEW)
+        assert "Input hash:" not in out.read_text(encoding="utf-8")
+        _, mock_full = self._run(argv, minimal_spec, minimal_result, SAMPLE_OVERVIEW)
+
+        mock_full.assert_called_once()
+        assert "Input hash: sha256:" in out.read_text(encoding="utf-8")
+
+
+# ---------------------------------------------------------------------------
+# --spool
+# ---------------------------------------------------------------------------
+
+class TestSpool:
+    def test_spooled_run_writes_docs_from_store(self, tmp_path, minimal_spec):
+        out = tmp_path / "docs.md"
+        argv = ["main", "specs/sample.json", "-y", "--spool", "-o", str(out)]
+
+        def fake_full_docs(spec, model, stream, store, **kwargs):
+            store.append(GeneratedDoc(
+                endpoint_ref="GET /api/v1/items", markdown="Spooled body.",
+                tokens_used=10, model=model,
+            ))
+            return GenerationResult(
+                api_title=spec.title, api_version=spec.version, docs=[],
+                total_tokens=10, total_cost_usd=0.0, model=model,
+            )
+
+        with patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-test"}):
+            with patch("src.main.load_dotenv"):
+                with patch.object(sys, "argv", argv):
+                    with patch("src.parser.parse_spec", return_value=minimal_spec):
+                        with patch("src.generator.generate_overview", return_value=SAMPLE_OVERVIEW):
+                            with patch("src.generator.generate_full_docs", side_effect=fake_full_docs):
+                                main()
+
+        text = out.read_text(encoding="utf-8")
+        assert "### GET /api/v1/items" in text
+        assert "Spooled body." in text
+
+
+# ---------------------------------------------------------------------------
+# Output-token history
+# ---------------------------------------------------------------------------
+
+class TestHistory:
+    def _run(self, argv, spec, result):
+        with patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-test"}):
+            with patch("src.main.load_dotenv"):
+                with patch.object(sys, "argv", argv):
+                    with patch("src.parser.parse_spec", return_value=spec):
+                        with patch("src.generator.generate_overview", return_value=SAMPLE_OVERVIEW):
+                            with patch("src.generator.generate_full_docs", return_value=result):
+                                try:
+                                    main()
+                                except SystemExit:
+                                    pass
+
+    def test_run_records_history_and_dry_run_uses_it(self, tmp_path, minimal_spec, minimal_result, capsys):
+        out = tmp_path / "docs.md"
+        minimal_result.docs[0].output_tokens = 2000
+        self._run(["main", "specs/sample.json", "-y", "-o", str(out)], minimal_spec, minimal_result)
+
+        assert (tmp_path / ".docgen-history.json").exists()
+        capsys.readouterr()
+
+        self._run(["main", "specs/sample.json", "--dry-run", "-o", str(out)], minimal_spec, minimal_result)
+        learned = capsys.readouterr().out
+        self._run(
+            ["main", "specs/sample.json", "--dry-run", "-o", str(tmp_path / "fresh" / "docs.md")],
+            minimal_spec, minimal_result,
+        )
+        default = capsys.readouterr().out
+        assert learned != default
+
+    def test_prompt_hashes_recorded_for_priority_changed(self, tmp_path, minimal_spec, minimal_result, capsys):
+        out = str(tmp_path / "docs.md")
+        self._run(["main", "specs/sample.json", "-y", "-o", out], minimal_spec, minimal_result)
+        capsys.readouterr()
+
+        self._run(
+            ["main", "specs/sample.json", "-y", "-o", out, "--priority-changed"],
+            minimal_spec, minimal_result,
+        )
+        assert "Changed since last run: 0/1 endpoint(s)" in capsys.readouterr().out
+
+        minimal_spec.endpoints[0].summary = "List all items"
+        self._run(
+            ["main", "specs/sample.json", "-y", "-o", out, "--priority-changed"],
+            minimal_spec, minimal_result,
+        )
+        assert "Changed since last run: 1/1 endpoint(s)" in capsys.readouterr().out
+
+    def test_count_tokens_flag_uses_api_counter(self, tmp_path, minimal_spec, minimal_result):
+        argv = ["main", "specs/sample.json", "-y", "--count-tokens", "-o", str(tmp_path / "d.md")]
+        with patch("src.generator.count_tokens", return_value=100) as mock_count:
+            self._run(argv, minimal_spec, minimal_result)
+        assert mock_count.call_count == 2
+
+
+# ---------------------------------------------------------------------------
+# --watch
+# ---------------------------------------------------------------------------
+
+class TestWatch:
+    def test_reruns_on_change_with_warm_client_and_cache(self, tmp_path, minimal_spec, minimal_result, capsys):
+        watcher = MagicMock(backend="polling")
+        watcher.__enter__.return_value = watcher
+        watcher.wait.side_effect = [True, KeyboardInterrupt]
+        argv = ["main", "specs/sample.json", "--watch", "-o", str(tmp_path / "docs.md")]
+        with patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-test"}):
+            with patch("src.main.load_dotenv"), patch.object(sys, "argv", argv):
+                with patch("src.parser.parse_spec", return_value=minimal_spec) as mock_parse:
+                    with patch("src.watch.FileWatcher", return_value=watcher):
+                        with patch("src.generator.client", MagicMock()):
+                            with patch("src.generator.configure_client") as mock_configure:
+                                with patch("src.generator.generate_overview", return_value=SAMPLE_OVERVIEW) as mock_overview:
+                                    with patch("src.generator.generate_full_docs", return_value=minimal_result) as mock_full:
+                                        with patch("builtins.input", return_value="y") as mock_input:
+                                            main()
+
+        assert mock_parse.call_count == 2
+        assert mock_full.call_count == 2
+        first, second = (c.kwargs["doc_cache"] for c in mock_full.call_args_list)
+        assert first is second is not None
+        assert [c.kwargs["doc_cache"] for c in mock_overview.call_args_list] == [first, first]
+        mock_configure.assert_called_once()
+        mock_input.assert_called_once()
+        assert "changed; regenerating" in capsys.readouterr().out
+
+    def test_failed_run_keeps_watching(self, tmp_path, minimal_spec, minimal_result, capsys):
+        watcher = MagicMock(backend="inotify")
+        watcher.__enter__.return_value = watcher
+        watcher.wait.side_effect = [True, KeyboardInterrupt]
+        argv = ["main", "specs/sample.json", "--watch", "-y", "-o", str(tmp_path / "docs.md")]
+        with patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-test"}):
+            with patch("src.main.load_dotenv"), patch.object(sys, "argv", argv):
+                with patch("src.parser.parse_spec", side_effect=[ValueError("bad yaml"), minimal_spec]):
+                    with patch("src.watch.FileWatcher", return_value=watcher):
+                        with patch("src.generator.configure_client"):
+                            with patch("src.generator.generate_overview", return_value=SAMPLE_OVERVIEW):
+                                with patch("src.generator.generate_full_docs", return_value=minimal_result) as mock_full:
+                                    main()
+
+        mock_full.assert_called_once()
+        assert "Run failed" in capsys.readouterr().out
+
+    def test_declined_prompt_ends_the_watch(self, tmp_path, minimal_spec):
+        watcher = MagicMock(backend="polling")
+        watcher.__enter__.return_value = watcher
+        argv = ["main", "specs/sample.json", "--watch", "-o", str(tmp_path / "docs.md")]
+        with patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-test"}):
+            with patch("src.main.load_dotenv"), patch.object(sys, "argv", argv):
+                with patch("src.parser.parse_spec", return_value=minimal_spec):
+                    with patch("src.watch.FileWatcher", return_value=watcher):
+                        with patch("src.generator.configure_client"):
+                            with patch("builtins.input", return_value="n"):
+                                main()
+
+        watcher.wait.assert_not_called()
+
+    def test_interrupt_during_a_run_ends_the_watch(self, tmp_path, minimal_spec):
+        watcher = MagicMock(backend="polling")
+        watcher.__enter__.return_value = watcher
+        argv = ["main", "specs/sample.json", "--watch", "-y", "-o", str(tmp_path / "docs.md")]
+        with patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-test"}):
+            with patch("src.main.load_dotenv"), patch.object(sys, "argv", argv):
+                with patch("src.parser.parse_spec", return_value=minimal_spec):
+                    with patch("src.watch.FileWatcher", return_value=watcher):
+                        with patch("src.generator.configure_client"):
+                            with patch("src.generator.generate_overview", side_effect=KeyboardInterrupt):
+                                main()
+
+        watcher.wait.assert_not_called()
+
+    def test_budget_spans_the_session(self, tmp_path, minimal_spec, minimal_result):
+        watcher = MagicMock(backend="polling")
+        watcher.__enter__.return_value = watcher
+        watcher.wait.side_effect = [True, KeyboardInterrupt]
+        argv = [
+            "main", "specs/sample.json", "--watch", "-y", "--max-cost", "5",
+            "-o", str(tmp_path / "docs.md"),
+        ]
+        with patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-test"}):
+            with patch("src.main.load_dotenv"), patch.object(sys, "argv", argv):
+                with patch("src.parser.parse_spec", return_value=minimal_spec):
+                    with patch("src.watch.FileWatcher", return_value=watcher):
+                        with patch("src.generator.configure_client"):
+                            with patch("src.generator.generate_overview", return_value=SAMPLE_OVERVIEW):
+                                with patch("src.generator.generate_full_docs", return_value=minimal_result) as mock_full:
+                                    main()
+
+        first, second = (c.kwargs["budget"] for c in mock_full.call_args_list)
+        assert first is second is not None
+
+    def test_profile_is_a_usage_error(self, capsys):
+        with patch.object(sys, "argv", ["main", "specs/sample.json", "--watch", "--profile"]):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+        assert exc_info.value.code == 2
+        assert "--watch" in capsys.readouterr().err
+
+
+# ---------------------------------------------------------------------------
+# Startup cost of the dry-run path
+# ---------------------------------------------------------------------------
+
+REPO_ROOT = Path(__file__).parent.parent
+HEAVY_MODULES = {"anthropic", "httpx", "markdown"}
+DRY_RUN_IMPORT_BUDGET_US = 1_500_000
+
+
+def _import_times(argv: list[str]) -> tuple[dict[str, int], int]:
+    """Run the CLI under -X importtime.
+
+    Returns cumulative microseconds per imported module and the total across top-level imports.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "src.main", *argv],
+        cwd=REPO_ROOT, capture_output=True, text=True, timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr
+    times = {}
+    total = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return times, total
+
+
+class TestStartup:
+    @pytest.mark.parametrize(
+        "flags", [[], ["--simple-model", "claude-haiku-4-5-20251001", "--dedupe"]]
+    )
+    def test_dry_run_skips_heavy_imports(self, flags):
+        times, _ = _import_times(["tests/fixtures/minimal-spec.json", "--dry-run", *flags])
+        assert HEAVY_MODULES.isdisjoint(times)
+
+    def test_help_skips_heavy_imports(self):
+        times, _ = _import_times(["--help"])
+        assert HEAVY_MODULES.isdisjoint(times)
+
+    def test_dry_run_import_time_within_budget(self):
+        _, total = _import_times(["tests/fixtures/minimal-spec.json", "--dry-run"])
+        assert total < DRY_RUN_IMPORT_BUDGET_US
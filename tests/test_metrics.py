@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from src.metrics import render_metrics, write_metrics
+from src.models import GenerationResult, ModelUsage
+from src.telemetry import RequestStats, RunRecorder
+
+MODEL = "claude-sonnet-4-6"
+
+
+def _recorder() -> RunRecorder:
+    recorder = RunRecorder()
+    for label, latency, status, error in [
+        ("GET /a", 0.4, "ok", None),
+        ("GET /b", 3.0, "ok", None),
+        ("GET /c", 7.0, "error", ValueError("boom")),
+    ]:
+        stats = RequestStats(label, MODEL, retries=1 if label == "GET /b" else 0)
+        stats.stop(status, error)
+        stats.latency_seconds = latency
+        recorder.record(stats)
+    return recorder
+
+
+def _result() -> GenerationResult:
+    return GenerationResult(
+        api_title="T", api_version="1", docs=[], total_tokens=300, total_cost_usd=0.01,
+        model=MODEL, pending=["GET /d"],
+        model_usage={MODEL: ModelUsage(docs=2, input_tokens=100, output_tokens=200, cost_usd=0.01)},
+    )
+
+
+def _samples(text: str) -> dict[str, float]:
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines()
+        if line and not line.startswith("#")
+    }
+
+
+# ---------------------------------------------------------------------------
+# render_metrics
+# ---------------------------------------------------------------------------
+
+class TestRenderMetrics:
+    def test_counters(self):
+        samples = _samples(render_metrics(_recorder(), _result(), {"spec": "petstore.yaml"}))
+        labels = f'spec="petstore.yaml",model="{MODEL}"'
+
+        assert samples[f'docgen_requests_total{{{labels},status="ok"}}'] == 2
+        assert samples[f'docgen_requests_total{{{labels},status="error"}}'] == 1
+        assert samples[f'docgen_request_errors_total{{{labels},error="ValueError"}}'] == 1
+        assert samples[f"docgen_retries_total{{{labels}}}"] == 1
+        assert samples[f'docgen_tokens_total{{{labels},kind="output"}}'] == 200
+        assert samples[f"docgen_cost_usd_total{{{labels}}}"] == pytest.approx(0.01)
+        assert samples['docgen_pending_endpoints{spec="petstore.yaml"}'] == 1
+
+    def test_latency_histogram_is_cumulative(self):
+        samples = _samples(render_metrics(_recorder(), _result()))
+        bucket = f'docgen_request_duration_seconds_bucket{{model="{MODEL}",le="%s"}}'
+
+        assert samples[bucket % "0.5"] == 1
+        assert samples[bucket % "5.0"] == 2
+        assert samples[bucket % "+Inf"] == 3
+        assert samples[f'docgen_request_duration_seconds_count{{model="{MODEL}"}}'] == 3
+        duration_sum = samples[f'docgen_request_duration_seconds_sum{{model="{MODEL}"}}']
+        assert duration_sum == pytest.approx(10.4)
+
+    def test_every_family_has_help_and_type(self):
+        text = render_metrics(_recorder(), _result(), now=1_700_000_000)
+        assert "# TYPE docgen_request_duration_seconds histogram" in text
+        assert "# TYPE docgen_requests_total counter" in text
+        assert "docgen_last_run_timestamp_seconds 1700000000" in text
+
+    def test_label_values_are_escaped(self):
+        text = render_metrics(RunRecorder(), None, {"spec": 'we"ird\\name'})
+        assert 'spec="we\\"ird\\\\name"' in text
+
+
+# ---------------------------------------------------------------------------
+# write_metrics
+# ---------------------------------------------------------------------------
+
+class TestWriteMetrics:
+    def test_replaces_file_without_leaving_temp_files(self, tmp_path):
+        path = tmp_path / "textfile" / "docgen.prom"
+        write_metrics(str(path), "old 1\n")
+        write_metrics(str(path), "new 1\n")
+
+        assert path.read_text() == "new 1\n"
+        assert os.listdir(path.parent) == ["docgen.prom"]
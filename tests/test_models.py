@@ -218,7 +218,9 @@ class TestGeneratedDoc:
             model="claude-sonnet-4-20250514",
         )
         d = doc.model_dump()
-        assert set(d.keys()) == {"endpoint_ref", "markdown", "tokens_used", "model"}
+        assert set(d.keys()) == {
+            "endpoint_ref", "markdown", "tokens_used", "model", "output_tokens"
+        }
 
 
 # ---------------------------------------------------------------------------
@@ -2,6 +2,7 @@ import json
 from pathlib import Path
 
 import pytest
+import yaml
 
 from src.models import APISpec, HTTPMethod
 from src.parser import (
@@ -9,6 +10,7 @@ from src.parser import (
     _resolve_refs,
     _summarize_schema,
     parse_spec,
+    parse_spec_text,
 )
 
 FIXTURES = Path(__file__).parent / "fixtures"
@@ -119,6 +121,20 @@ class TestParseSpecErrors:
         assert spec.endpoints == []
 
 
+class TestParseSpecText:
+    def test_json_and_yaml_text_match_file(self):
+        text = (FIXTURES / "rewards-api-spec.json").read_text()
+        from_file = parse_spec(str(FIXTURES / "rewards-api-spec.json"))
+
+        assert parse_spec_text(text) == from_file
+        assert parse_spec_text(yaml.safe_dump(json.loads(text), sort_keys=False)) == from_file
+
+    @pytest.mark.parametrize("text", ["{ not valid json }", "- just\n- a list\n"])
+    def test_invalid_text_raises(self, text):
+        with pytest.raises(ValueError):
+            parse_spec_text(text)
+
+
 # ---------------------------------------------------------------------------
 # _resolve_refs
 # ---------------------------------------------------------------------------
@@ -0,0 +1,85 @@
+import io
+import pstats
+import time
+
+import pytest
+
+from src import profiling
+from src.profiling import PhaseTimer, StackSampler, profile, span
+
+
+# ---------------------------------------------------------------------------
+# Spans and the phase table
+# ---------------------------------------------------------------------------
+
+class TestSpans:
+    def test_span_is_a_no_op_without_profile(self):
+        with span("parse"):
+            pass
+        assert profiling._active is None
+
+    def test_spans_accumulate_by_name(self):
+        with profile(out=io.StringIO()) as timer:
+            for _ in range(3):
+                with span("prompts"):
+                    pass
+        assert timer.phases["prompts"].calls == 3
+
+    def test_table_lists_parents_before_children(self):
+        with profile(out=io.StringIO()) as timer:
+            with span("parse"):
+                with span("parse.load"):
+                    pass
+        table = timer.format_table(1.0).splitlines()
+        assert table[1].startswith("parse ")
+        assert table[2].startswith("  parse.load")
+        assert table[-1].startswith("total")
+
+    def test_share_is_relative_to_total(self):
+        timer = PhaseTimer()
+        timer.add("generate", 0.5, 0.1)
+        assert "50.0%" in timer.format_table(1.0)
+
+
+# ---------------------------------------------------------------------------
+# profile()
+# ---------------------------------------------------------------------------
+
+class TestProfile:
+    def test_prints_table_even_on_sys_exit(self):
+        out = io.StringIO()
+        with pytest.raises(SystemExit):
+            with profile(out=out):
+                with span("parse"):
+                    raise SystemExit(0)
+        assert "Profile:" in out.getvalue()
+        assert "parse" in out.getvalue()
+        assert profiling._active is None
+
+    def test_writes_pstats_dump(self, tmp_path):
+        path = tmp_path / "run.prof"
+        with profile(str(path), out=io.StringIO()):
+            sum(range(1000))
+        assert pstats.Stats(str(path)).total_calls > 0
+
+    def test_writes_collapsed_stacks(self, tmp_path):
+        path = tmp_path / "run.folded"
+        with profile(str(path), out=io.StringIO()):
+            deadline = time.perf_counter() + 0.1
+            while time.perf_counter() < deadline:
+                pass
+        lines = path.read_text().splitlines()
+        # Other threads left running by earlier tests (e.g. fake API servers) are sampled
+        # too and can tie with or outrank MainThread, so don't rely on line order.
+        main_lines = [line for line in lines if line.startswith("MainThread;")]
+        assert any("test_writes_collapsed_stacks" in line for line in main_lines)
+        assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in main_lines)
+
+
+class TestStackSampler:
+    def test_skips_its_own_thread(self):
+        sampler = StackSampler(interval=0.001)
+        sampler.start()
+        time.sleep(0.05)
+        sampler.stop()
+        assert not any(stack.startswith("stack-sampler") for stack in sampler.stacks)
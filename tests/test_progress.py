@@ -0,0 +1,127 @@
+import io
+
+import pytest
+
+from src.progress import LiveProgress, LogProgress, ProgressDisplay, create_progress
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _TTY(io.StringIO):
+    def isatty(self) -> bool:
+        return True
+
+
+# ---------------------------------------------------------------------------
+# Counters and summary
+# ---------------------------------------------------------------------------
+
+class TestSummary:
+    def test_counts_completed_errors_and_throughput(self):
+        clock = _Clock()
+        display = LogProgress(4, io.StringIO(), clock=clock)
+        display.start("GET /a")
+        display.start("GET /b")
+        clock.now = 2.0
+        display.finish("GET /a", 400)
+        display.fail("GET /b")
+
+        assert display.summary() == "2/4 done · 0 active · 1 error(s) · 200 tok/s · ETA 2s"
+
+    def test_streamed_chunks_count_towards_throughput(self):
+        clock = _Clock()
+        display = LogProgress(1, io.StringIO(), clock=clock)
+        display.start("GET /a")
+        display.update("GET /a", "x" * 400)
+        clock.now = 1.0
+
+        assert "1 active" in display.summary()
+        assert "100 tok/s" in display.summary()
+
+    def test_skipped_endpoints_count_as_done(self):
+        display = LogProgress(3, io.StringIO(), clock=_Clock())
+        display.skip(2)
+        assert display.summary().startswith("2/3 done")
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+class TestRendering:
+    def test_log_progress_is_throttled(self):
+        clock = _Clock()
+        out = io.StringIO()
+        display = LogProgress(100, out, clock=clock)
+        for n in range(50):
+            clock.now = n * 0.5
+            display.finish(f"GET /{n}", 10)
+
+        assert len(out.getvalue().splitlines()) == 2
+
+    def test_live_progress_shows_a_line_per_stream(self):
+        clock = _Clock()
+        out = _TTY()
+        display = LiveProgress(2, out, clock=clock)
+        display.start("GET /a")
+        clock.now = 1.0
+        display.update("GET /a", "x" * 40)
+
+        frame = out.getvalue()
+        assert "0/2 done · 1 active" in frame
+        assert "GET /a" in frame
+        assert "10 tok" in frame
+
+    def test_live_progress_redraws_in_place(self):
+        clock = _Clock()
+        out = _TTY()
+        display = LiveProgress(2, out, clock=clock)
+        display.start("GET /a")
+        clock.now = 1.0
+        display.update("GET /a", "x")
+        clock.now = 2.0
+        display.update("GET /a", "x")
+
+        assert "\x1b[2F\x1b[J" in out.getvalue()
+
+    def test_log_message_is_written_above_live_display(self):
+        out = _TTY()
+        display = LiveProgress(1, out, clock=_Clock())
+        display.log("Warning: skipping GET /a")
+        assert out.getvalue().startswith("Warning: skipping GET /a\n")
+
+    def test_display_is_redrawn_below_every_message(self):
+        clock = _Clock()
+        out = _TTY()
+        display = LiveProgress(1, out, clock=clock)
+        display.start("GET /a")
+        display.log("first")
+        display.log("second")
+
+        assert out.getvalue().endswith("second\n" + "\n".join(display._lines(0.0)) + "\n")
+        assert out.getvalue().count("0/1 done") == 2
+
+    def test_base_display_is_abstract(self):
+        with pytest.raises(TypeError):
+            ProgressDisplay(1, io.StringIO())
+
+    def test_close_renders_final_summary(self):
+        out = io.StringIO()
+        display = LogProgress(1, out, clock=_Clock())
+        display.finish("GET /a", 10)
+        display.close()
+        assert out.getvalue().splitlines()[-1].startswith("1/1 done")
+
+
+class TestCreateProgress:
+    def test_terminal_gets_live_display(self):
+        assert isinstance(create_progress(1, _TTY()), LiveProgress)
+
+    def test_non_terminal_gets_periodic_summaries(self):
+        assert isinstance(create_progress(1, io.StringIO()), LogProgress)
@@ -1,7 +1,14 @@
 import pytest
 
 from src.models import APIEndpoint, APISpec, HTTPMethod, Parameter, RequestBody, ResponseInfo
-from src.prompts import SYSTEM_PROMPT, build_endpoint_prompt, build_overview_prompt
+from src.prompts import (
+    BATCH_SECTION_RE,
+    SYSTEM_PROMPT,
+    build_batch_prompt,
+    build_endpoint_prompt,
+    build_overview_prompt,
+    compress_endpoint,
+)
 
 
 # ---------------------------------------------------------------------------
@@ -152,3 +159,98 @@ class TestBuildOverviewPrompt:
         prompt = build_overview_prompt(spec)
         lower = prompt.lower()
         assert "overview" in lower or "introduction" in lower
+
+
+# ---------------------------------------------------------------------------
+# build_batch_prompt
+# ---------------------------------------------------------------------------
+
+class TestBuildBatchPrompt:
+    def _endpoints(self) -> list[APIEndpoint]:
+        return [
+            APIEndpoint(method=HTTPMethod.GET, path="/api/v1/members", summary="List members"),
+            APIEndpoint(method=HTTPMethod.DELETE, path="/api/v1/members/{id}"),
+        ]
+
+    def test_numbers_every_endpoint(self):
+        prompt = build_batch_prompt(self._endpoints())
+        assert "--- Endpoint 1 ---" in prompt
+        assert "--- Endpoint 2 ---" in prompt
+        assert "**Path:** /api/v1/members/{id}" in prompt
+
+    def test_asks_for_section_markers(self):
+        assert "=== DOC n ===" in build_batch_prompt(self._endpoints())
+
+    def test_section_regex_matches_marker_lines_only(self):
+        text = "=== DOC 1 ===\nBody mentioning === DOC 2 === inline\n=== DOC 2 ===\nMore"
+        assert [m.group(1) for m in BATCH_SECTION_RE.finditer(text)] == ["1", "2"]
+
+
+# ---------------------------------------------------------------------------
+# compress_endpoint
+# ---------------------------------------------------------------------------
+
+class TestCompressEndpoint:
+    def _endpoint(self) -> APIEndpoint:
+        nested = "{ id: string, owner: { name: string, address: { city: string, zip: string } } }"
+        return APIEndpoint(
+            method=HTTPMethod.GET,
+            path="/api/v1/accounts/{id}",
+            parameters=[
+                Parameter(name="id", location="path", required=True, description="Account ID"),
+                Parameter(
+                    name="region",
+                    location="query",
+                    description="Region the account is hosted in, used for data residency routing",
+                    enum=[f"region-{n}" for n in range(30)],
+                ),
+            ],
+            responses=[ResponseInfo(status_code="200", description="OK", schema_summary=nested)],
+        )
+
+    def _tokens(self, endpoint: APIEndpoint) -> int:
+        from src.utils import estimate_tokens
+
+        return estimate_tokens(build_endpoint_prompt(endpoint))
+
+    def test_fitting_endpoint_is_unchanged(self):
+        endpoint = self._endpoint()
+        compressed, steps = compress_endpoint(endpoint, 100_000)
+        assert compressed is endpoint
+        assert steps == []
+
+    def test_enums_elided_first(self):
+        endpoint = self._endpoint()
+        elided = endpoint.model_copy(deep=True)
+        elided.parameters[1].enum = elided.parameters[1].enum[:5] + ["… (+25 more)"]
+
+        compressed, steps = compress_endpoint(endpoint, self._tokens(elided))
+
+        assert steps == ["enum lists elided"]
+        assert compressed.parameters[1].enum[-1] == "… (+25 more)"
+        assert len(endpoint.parameters[1].enum) == 30
+
+    def test_optional_descriptions_dropped_but_required_kept(self):
+        compressed, steps = compress_endpoint(self._endpoint(), 1)
+        assert "optional parameter descriptions dropped" in steps
+        assert compressed.parameters[0].description == "Account ID"
+        assert compressed.parameters[1].description is None
+
+    def test_schemas_collapsed_progressively(self):
+        endpoint = self._endpoint()
+        shallow = endpoint.model_copy(deep=True)
+        shallow.parameters[1].enum = shallow.parameters[1].enum[:5] + ["… (+25 more)"]
+        shallow.parameters[1].description = None
+        shallow.responses[0].schema_summary = (
+            "{ id: string, owner: { name: string, address: {…} } }"
+        )
+
+        compressed, steps = compress_endpoint(endpoint, self._tokens(shallow))
+
+        assert steps[-1] == "schemas collapsed to depth 2"
+        assert compressed.responses[0].schema_summary == shallow.responses[0].schema_summary
+
+    def test_returns_most_compressed_form_when_budget_unreachable(self):
+        compressed, steps = compress_endpoint(self._endpoint(), 1)
+        assert steps[-1] == "schemas collapsed to depth 0"
+        assert compressed.responses[0].schema_summary == "{…}"
@@ -0,0 +1,165 @@
+import json
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+import src.generator as generator_module
+from src.fakeapi import FakeAPIConfig, FakeAPIServer, Latency
+from src.server import DocServer, DocService
+
+MODEL = "claude-sonnet-4-6"
+SPEC_TEXT = (Path(__file__).parent / "fixtures" / "rewards-api-spec.json").read_text()
+
+
+@pytest.fixture
+def fake_api():
+    previous = generator_module.client
+    servers = []
+
+    def start(**config):
+        server = FakeAPIServer(FakeAPIConfig(output_tokens=40, **config)).start()
+        servers.append(server)
+        generator_module.configure_client(base_url=server.base_url)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+    generator_module.client = previous
+
+
+@pytest.fixture
+def doc_server():
+    with DocServer(DocService(MODEL, concurrency=4), port=0) as server:
+        yield server
+
+
+def _request(server, method, path, body=None):
+    request = urllib.request.Request(
+        server.base_url + path, data=body.encode("utf-8") if body else None, method=method
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, response.read().decode("utf-8")
+    except urllib.error.HTTPError as exc:
+        return exc.code, exc.read().decode("utf-8")
+
+
+def _events(server, job_id):
+    status, body = _request(server, "GET", f"/jobs/{job_id}/events")
+    assert status == 200
+    return [json.loads(line) for line in body.splitlines()]
+
+
+# ---------------------------------------------------------------------------
+# Jobs
+# ---------------------------------------------------------------------------
+
+class TestJobs:
+    def test_post_stream_and_fetch_output(self, fake_api, doc_server):
+        fake_api()
+        status, body = _request(doc_server, "POST", "/jobs", SPEC_TEXT)
+        assert status == 202
+        job = json.loads(body)
+        assert job["endpoints"] == 6
+
+        events = _events(doc_server, job["id"])
+        assert [e["index"] for e in events[:-1]] == list(range(6))
+        assert events[0]["endpoint_ref"] == "GET /api/v1/members/{memberId}"
+        final = events[-1]["job"]
+        assert final["status"] == "done"
+        assert final["requests"] == 7
+        assert final["cost_usd"] > 0
+
+        status, output = _request(doc_server, "GET", f"/jobs/{job['id']}/output")
+        assert status == 200
+        assert output.startswith("# Rewards API")
+
+    def test_repeat_spec_uses_shared_caches(self, fake_api, doc_server):
+        api = fake_api()
+        first = json.loads(_request(doc_server, "POST", "/jobs", SPEC_TEXT)[1])
+        _events(doc_server, first["id"])
+        second = json.loads(_request(doc_server, "POST", "/jobs?format=html", SPEC_TEXT)[1])
+        final = _events(doc_server, second["id"])[-1]["job"]
+
+        assert final["status"] == "done"
+        assert final["requests"] == 0 and final["cost_usd"] == 0
+        assert api.stats["status_200"] == 7
+        stats = json.loads(_request(doc_server, "GET", "/stats")[1])
+        assert stats["spec_cache"]["hits"] == 1
+        assert stats["doc_cache"]["hits"] == 7
+        status, output = _request(doc_server, "GET", f"/jobs/{second['id']}/output")
+        assert status == 200 and "<html" in output
+
+    def test_poll_docs_since(self, fake_api, doc_server):
+        fake_api()
+        job = json.loads(_request(doc_server, "POST", "/jobs", SPEC_TEXT)[1])
+        _events(doc_server, job["id"])
+
+        docs = json.loads(_request(doc_server, "GET", f"/jobs/{job['id']}/docs?since=4")[1])
+        assert [d["index"] for d in docs] == [4, 5]
+        assert docs[1]["endpoint_ref"] == "GET /api/v1/rewards"
+
+    def test_output_before_done_is_409(self, fake_api, doc_server):
+        fake_api(latency=Latency("fixed", 0.5))
+        job = json.loads(_request(doc_server, "POST", "/jobs", SPEC_TEXT)[1])
+
+        assert _request(doc_server, "GET", f"/jobs/{job['id']}/output")[0] == 409
+        _events(doc_server, job["id"])
+
+    def test_oldest_finished_jobs_are_dropped(self, fake_api):
+        fake_api()
+        with DocServer(DocService(MODEL, job_retention=1), port=0) as server:
+            first = json.loads(_request(server, "POST", "/jobs", SPEC_TEXT)[1])
+            _events(server, first["id"])
+            second = json.loads(_request(server, "POST", "/jobs", SPEC_TEXT)[1])
+            _events(server, second["id"])
+
+            assert _request(server, "GET", f"/jobs/{first['id']}")[0] == 404
+            assert _request(server, "GET", f"/jobs/{second['id']}")[0] == 200
+            stats = json.loads(_request(server, "GET", "/stats")[1])
+            assert stats["jobs"] == {"done": 1}
+            assert stats["cost_usd"] > 0
+
+    def test_failed_job_reports_error(self, fake_api, doc_server):
+        fake_api(error_rates={400: 1.0})
+        job = json.loads(_request(doc_server, "POST", "/jobs", SPEC_TEXT)[1])
+        final = _events(doc_server, job["id"])[-1]["job"]
+
+        assert final["status"] == "failed"
+        assert "BadRequestError" in final["error"]
+
+
+# ---------------------------------------------------------------------------
+# Errors
+# ---------------------------------------------------------------------------
+
+class TestErrors:
+    def test_invalid_spec_is_400(self, doc_server):
+        status, body = _request(doc_server, "POST", "/jobs", "paths: [")
+        assert status == 400
+        assert "Failed to parse spec" in json.loads(body)["error"]
+
+    def test_unknown_format_is_400(self, doc_server):
+        assert _request(doc_server, "POST", "/jobs?format=pdf", SPEC_TEXT)[0] == 400
+
+    @pytest.mark.parametrize("since", ["abc", "-1"])
+    def test_bad_since_is_400(self, fake_api, doc_server, since):
+        fake_api()
+        job = json.loads(_request(doc_server, "POST", "/jobs", SPEC_TEXT)[1])
+        _events(doc_server, job["id"])
+
+        status, body = _request(doc_server, "GET", f"/jobs/{job['id']}/docs?since={since}")
+        assert status == 400
+        assert "since" in json.loads(body)["error"]
+
+    def test_unknown_model_is_400(self, doc_server):
+        status, body = _request(doc_server, "POST", "/jobs?model=bogus", SPEC_TEXT)
+        assert status == 400
+        assert "bogus" in json.loads(body)["error"]
+        assert doc_server.service.jobs == {}
+
+    def test_unknown_job_is_404(self, doc_server):
+        assert _request(doc_server, "GET", "/jobs/nope")[0] == 404
@@ -0,0 +1,53 @@
+import pytest
+
+from src.models import GeneratedDoc
+from src.store import DocRecord, SpooledDocStore
+
+
+def _doc(ref: str, markdown: str) -> GeneratedDoc:
+    return GeneratedDoc(
+        endpoint_ref=ref, markdown=markdown, tokens_used=42, model="claude-sonnet-4-6"
+    )
+
+
+class TestDocRecord:
+    def test_is_slotted(self):
+        record = DocRecord(endpoint_ref="GET /a", offset=0, length=1, tokens_used=1, model="m")
+        assert not hasattr(record, "__dict__")
+
+
+class TestSpooledDocStore:
+    def test_round_trips_docs_in_order(self):
+        docs = [_doc("GET /a", "# A\nbody"), _doc("POST /b", "unicode — ✓")]
+        with SpooledDocStore() as store:
+            for doc in docs:
+                store.append(doc)
+            assert list(store) == docs
+
+    def test_can_be_iterated_repeatedly(self):
+        with SpooledDocStore() as store:
+            store.append(_doc("GET /a", "body"))
+            assert [d.endpoint_ref for d in store] == [d.endpoint_ref for d in store]
+
+    def test_len_and_records(self):
+        with SpooledDocStore() as store:
+            store.append(_doc("GET /a", "abc"))
+            store.append(_doc("GET /b", "defg"))
+            assert len(store) == 2
+            assert store.records[1].offset == 3
+            assert store.records[1].length == 4
+
+    def test_read_after_interleaved_iteration(self):
+        with SpooledDocStore() as store:
+            store.append(_doc("GET /a", "first"))
+            iterator = iter(store)
+            assert next(iterator).markdown == "first"
+            store.append(_doc("GET /b", "second"))
+            assert store.read(store.records[1]) == "second"
+
+    def test_close_releases_file(self):
+        store = SpooledDocStore()
+        store.append(_doc("GET /a", "body"))
+        store.close()
+        with pytest.raises(ValueError):
+            list(store)
@@ -0,0 +1,87 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.telemetry import RequestStats, RunRecorder, percentile, write_report
+
+
+# ---------------------------------------------------------------------------
+# percentile
+# ---------------------------------------------------------------------------
+
+class TestPercentile:
+    def test_interpolates_between_ranks(self):
+        assert percentile([1, 2, 3, 4], 50) == pytest.approx(2.5)
+
+    def test_extremes(self):
+        values = [5.0, 1.0, 3.0]
+        assert percentile(values, 0) == 1.0
+        assert percentile(values, 100) == 5.0
+
+    def test_empty_is_none(self):
+        assert percentile([], 90) is None
+
+
+# ---------------------------------------------------------------------------
+# RequestStats
+# ---------------------------------------------------------------------------
+
+class TestRequestStats:
+    def test_first_token_recorded_once(self):
+        stats = RequestStats("GET /a", "m", started=0.0)
+        stats.mark_first_token()
+        first = stats.ttft_seconds
+        stats.mark_first_token()
+        assert stats.ttft_seconds == first
+
+    def test_cache_usage_ignores_missing_fields(self):
+        stats = RequestStats("GET /a", "m")
+        usage = MagicMock(spec=["cache_read_input_tokens"], cache_read_input_tokens=120)
+        stats.add_cache_usage(usage)
+        stats.add_cache_usage(usage)
+        assert stats.cache_read_tokens == 240
+        assert stats.cache_creation_tokens == 0
+
+    def test_stop_records_error_class(self):
+        stats = RequestStats("GET /a", "m")
+        stats.stop("error", ValueError("boom"))
+        assert stats.status == "error"
+        assert stats.error == "ValueError"
+        assert "started" not in stats.to_dict()
+
+
+# ---------------------------------------------------------------------------
+# RunRecorder
+# ---------------------------------------------------------------------------
+
+def _stats(label, model, latency, output_tokens, **kwargs):
+    stats = RequestStats(label, model, **kwargs)
+    stats.latency_seconds = latency
+    stats.output_tokens = output_tokens
+    return stats
+
+
+class TestRunRecorder:
+    def test_report_summarizes_requests_and_models(self):
+        recorder = RunRecorder()
+        recorder.record(_stats("GET /a", "big", 1.0, 100, retries=1, wait_seconds=2.0))
+        recorder.record(_stats("GET /b", "big", 3.0, 300))
+        recorder.record(_stats("GET /c", "small", 2.0, 50, status="error"))
+
+        report = recorder.report(wall_seconds=5.0)
+
+        assert report["requests"] == 3
+        assert report["errors"] == 1
+        assert report["retries"] == 1
+        assert report["wait_seconds"] == 2.0
+        assert report["latency_seconds"]["p50"] == pytest.approx(2.0)
+        assert report["output_tokens_per_second"] == pytest.approx(90.0)
+        assert report["models"]["big"]["requests"] == 2
+        assert report["models"]["small"]["tokens"]["output"] == 50
+        assert [r["label"] for r in report["requests_detail"]] == ["GET /a", "GET /b", "GET /c"]
+
+    def test_write_report_is_json(self, tmp_path):
+        path = tmp_path / "reports" / "run.json"
+        write_report(str(path), RunRecorder().report(wall_seconds=1.0))
+        assert json.loads(path.read_text())["requests"] == 0
@@ -1,6 +1,19 @@
 import re
 import pytest
-from src.utils import PRICING, estimate_cost, format_cost, sanitize_anchor, create_progress_bar
+from src.utils import (
+    PRICING,
+    AnchorAllocator,
+    HeuristicTokenEstimator,
+    MemoizedTokenEstimator,
+    ReconciledTokenEstimator,
+    atomic_write,
+    content_hash,
+    create_progress_bar,
+    estimate_cost,
+    estimate_tokens,
+    format_cost,
+    sanitize_anchor,
+)
 
 
 class TestPricing:
@@ -73,9 +86,150 @@ class TestSanitizeAnchor:
         assert result == ""
 
 
+class TestAnchorAllocator:
+    def test_first_use_keeps_plain_slug(self):
+        assert AnchorAllocator().allocate("GET /users/{id}") == "get-usersid"
+
+    def test_colliding_refs_get_numbered_suffixes(self):
+        allocator = AnchorAllocator()
+        assert allocator.allocate("GET /users/{id}") == "get-usersid"
+        assert allocator.allocate("GET /users/id") == "get-usersid-1"
+        assert allocator.allocate("GET /users/(id)") == "get-usersid-2"
+
+    def test_suffix_does_not_reuse_literal_heading(self):
+        allocator = AnchorAllocator()
+        allocator.allocate("foo")
+        allocator.allocate("foo-1")
+        assert allocator.allocate("foo") == "foo-2"
+
+    def test_keeps_underscores_like_github(self):
+        assert AnchorAllocator().allocate("GET /user_id") == "get-user_id"
+
+    def test_reserve_headings_skips_fenced_code(self):
+        allocator = AnchorAllocator()
+        allocator.reserve_headings("## Example\n```bash\n# not a heading\n```\n")
+        assert allocator.allocate("Example") == "example-1"
+        assert allocator.allocate("not a heading") == "not-a-heading"
+
+
 class TestCreateProgressBar:
     def test_standard_progress(self):
         assert create_progress_bar(3, 12) == "[3/12] Generating..."
 
     def test_single_item(self):
         assert create_progress_bar(1, 1) == "[1/1] Generating..."
+
+
+class TestContentHash:
+    def test_is_deterministic(self):
+        assert content_hash("a", "b") == content_hash("a", "b")
+
+    def test_has_algorithm_prefix(self):
+        assert content_hash("a").startswith("sha256:")
+
+    def test_part_boundaries_matter(self):
+        assert content_hash("ab", "c") != content_hash("a", "bc")
+
+
+class TestAtomicWrite:
+    def test_replaces_file_on_success(self, tmp_path):
+        path = tmp_path / "docs.md"
+        path.write_text("old", encoding="utf-8")
+        with atomic_write(str(path)) as f:
+            f.write("new")
+            assert path.read_text(encoding="utf-8") == "old"
+
+        assert path.read_text(encoding="utf-8") == "new"
+        assert [p.name for p in tmp_path.iterdir()] == ["docs.md"]
+
+    def test_keeps_old_file_on_error(self, tmp_path):
+        path = tmp_path / "docs.md"
+        path.write_text("old", encoding="utf-8")
+        with pytest.raises(ValueError):
+            with atomic_write(str(path)) as f:
+                f.write("partial")
+                raise ValueError("boom")
+
+        assert path.read_text(encoding="utf-8") == "old"
+        assert [p.name for p in tmp_path.iterdir()] == ["docs.md"]
+
+
+class TestHeuristicTokenEstimator:
+    def test_plain_word_is_one_token(self):
+        assert HeuristicTokenEstimator().count("point", "claude-sonnet-4-6") == 1
+
+    def test_symbols_cost_more_than_chars_over_four(self):
+        schema = "{ id: string, tags: array of string, meta: { a: b } }"
+        assert HeuristicTokenEstimator().count(schema, "claude-sonnet-4-6") > len(schema) // 4
+
+    def test_unknown_family_uses_default_coefficients(self):
+        estimator = HeuristicTokenEstimator()
+        expected = estimator.count("hello world", "claude-x")
+        assert estimator.count("hello world", "other-model") == expected
+
+    def test_never_returns_zero(self):
+        assert HeuristicTokenEstimator().count("", "claude-sonnet-4-6") == 1
+
+
+class TestReconciledTokenEstimator:
+    class _Fixed:
+        def count(self, text, model):
+            return 100
+
+    def test_samples_then_scales(self):
+        calls = []
+
+        def counter(text, model):
+            calls.append(text)
+            return 150
+
+        estimator = ReconciledTokenEstimator(self._Fixed(), counter, sample_size=2)
+        assert estimator.count("a", "m") == 150
+        assert estimator.count("b", "m") == 150
+        assert estimator.count("c", "m") == 150
+        assert calls == ["a", "b"]
+
+    def test_counter_failure_falls_back_to_base(self):
+        def counter(text, model):
+            raise ConnectionError("offline")
+
+        estimator = ReconciledTokenEstimator(self._Fixed(), counter)
+        assert estimator.count("a", "m") == 100
+        assert estimator.count("b", "m") == 100
+
+
+class TestMemoizedTokenEstimator:
+    def test_counts_each_prompt_once(self):
+        calls = []
+
+        class Counting:
+            def count(self, text, model):
+                calls.append((text, model))
+                return len(text)
+
+        estimator = MemoizedTokenEstimator(Counting())
+        assert estimator.count("abc", "m") == 3
+        assert estimator.count("abc", "m") == 3
+        assert estimator.count("abc", "other") == 3
+        assert calls == [("abc", "m"), ("abc", "other")]
+
+    def test_evicts_least_recently_used(self):
+        calls = []
+
+        class Counting:
+            def count(self, text, model):
+                calls.append(text)
+                return len(text)
+
+        estimator = MemoizedTokenEstimator(Counting(), max_entries=2)
+        for text in ["a", "bb", "a", "ccc", "a", "bb"]:
+            estimator.count(text, "m")
+        assert calls == ["a", "bb", "ccc", "bb"]
+
+
+class TestEstimateTokens:
+    def test_positive_for_text(self):
+        assert estimate_tokens("Document the following API endpoint") > 0
+
+    def test_accepts_model(self):
+        assert estimate_tokens("text", "claude-haiku-4-5-20251001") >= 1
@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+
+import pytest
+
+from src.watch import FileWatcher
+
+
+def _write_later(path, contents, delay=0.05):
+    """Write each string in contents to path, delay seconds apart, on a background thread."""
+    def run():
+        for text in contents:
+            time.sleep(delay)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+@pytest.fixture(params=["inotify", "polling"])
+def watcher(request, tmp_path):
+    path = tmp_path / "spec.yaml"
+    path.write_text("a", encoding="utf-8")
+    w = FileWatcher(
+        str(path), debounce=0.1, poll_interval=0.02, use_inotify=request.param == "inotify"
+    )
+    if w.backend != request.param:
+        w.close()
+        pytest.skip("inotify is not available")
+    yield w
+    w.close()
+
+
+class TestFileWatcher:
+    def test_detects_change(self, watcher):
+        thread = _write_later(watcher.path, ["b"])
+        assert watcher.wait(timeout=5) is True
+        thread.join()
+
+    def test_times_out_without_change(self, watcher):
+        assert watcher.wait(timeout=0.2) is False
+
+    def test_unchanged_content_is_ignored(self, watcher):
+        thread = _write_later(watcher.path, ["a"])
+        assert watcher.wait(timeout=0.5) is False
+        thread.join()
+
+    def test_burst_of_saves_is_debounced(self, watcher):
+        thread = _write_later(watcher.path, ["b", "c", "d"], delay=0.03)
+        assert watcher.wait(timeout=5) is True
+        thread.join()
+
+        assert watcher.wait(timeout=0.3) is False
+        with open(watcher.path, encoding="utf-8") as f:
+            assert f.read() == "d"
+
+    def test_replace_by_rename_is_detected(self, watcher):
+        tmp = watcher.path + ".new"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("renamed")
+        threading.Timer(0.05, os.replace, (tmp, watcher.path)).start()
+        assert watcher.wait(timeout=5) is True
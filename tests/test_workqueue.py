@@ -0,0 +1,231 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import src.generator as generator_module
+from src.fakeapi import FakeAPIConfig, FakeAPIServer
+from src.main import main
+from src.models import APIEndpoint, APISpec, HTTPMethod
+from src.workqueue import Job, WorkQueue, assemble, build_jobs, work
+
+MODEL = "claude-sonnet-4-6"
+FIXTURE = Path(__file__).parent / "fixtures" / "rewards-api-spec.json"
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = WorkQueue(str(tmp_path / "queue.db"))
+    yield q
+    q.close()
+
+
+def _spec(count=3):
+    return APISpec(
+        title="T", version="2", endpoints=[
+            APIEndpoint(path=f"/items/{n}", method=HTTPMethod.GET) for n in range(count)
+        ],
+    )
+
+
+def _enqueue(queue, count=3, order=None):
+    spec = _spec(count)
+    jobs = build_jobs(
+        spec, [MODEL] * count, [f"prompt {n}" for n in range(count)], [500] * count,
+        "overview prompt", MODEL, order,
+    )
+    queue.enqueue(jobs, {"title": "T", "version": "2", "model": MODEL, "input_hash": "h1"})
+    return jobs
+
+
+# ---------------------------------------------------------------------------
+# WorkQueue
+# ---------------------------------------------------------------------------
+
+class TestWorkQueue:
+    def test_enqueue_is_idempotent_for_the_same_run(self, queue):
+        _enqueue(queue)
+        assert queue.enqueue([Job(0, "GET /x", MODEL, "p", 10)], {"input_hash": "h1"}) == 0
+        assert queue.counts()["queued"] == 4
+
+    def test_enqueue_rejects_a_different_run(self, queue):
+        _enqueue(queue)
+        with pytest.raises(ValueError):
+            queue.enqueue([Job(0, "GET /x", MODEL, "p", 10)], {"input_hash": "h2"})
+
+    def test_claims_overview_first_then_priority_order(self, queue):
+        _enqueue(queue, order=[2, 0, 1])
+        refs = [queue.claim("w").endpoint_ref for _ in range(4)]
+
+        assert refs == ["overview", "GET /items/2", "GET /items/0", "GET /items/1"]
+        assert queue.claim("w") is None
+
+    def test_expired_lease_is_reclaimed_and_late_result_rejected(self, queue):
+        _enqueue(queue, count=1)
+        queue.claim("a", lease_seconds=100, now=1000.0)
+        job = queue.claim("a", lease_seconds=10, now=1000.0)
+
+        assert queue.claim("b", now=1005.0) is None
+        taken = queue.claim("b", now=1011.0)
+        assert taken.id == job.id and taken.attempts == 2
+        assert queue.complete(job, "a", "late", 1, 1) is False
+        assert queue.complete(taken, "b", "doc", 1, 1) is True
+
+    def test_renew_keeps_the_lease(self, queue):
+        _enqueue(queue, count=0)
+        job = queue.claim("a", lease_seconds=0)
+
+        assert queue.renew(job, "a", lease_seconds=100)
+        assert queue.claim("b") is None
+        assert not queue.renew(job, "b")
+
+    def test_fail_requeues_until_max_attempts(self, queue):
+        _enqueue(queue, count=0)
+        for attempt in range(3):
+            job = queue.claim("w")
+            assert job.attempts == attempt + 1
+            queue.fail(job, "w", "boom", max_attempts=3)
+
+        assert queue.claim("w") is None
+        assert queue.counts()["failed"] == 1
+
+    def test_expired_lease_fails_after_max_attempts(self, queue):
+        _enqueue(queue, count=0)
+        queue.claim("w", lease_seconds=1, max_attempts=1, now=0.0)
+
+        assert queue.claim("w", max_attempts=1, now=10.0) is None
+        assert queue.counts()["failed"] == 1
+
+
+# ---------------------------------------------------------------------------
+# work / assemble
+# ---------------------------------------------------------------------------
+
+class TestWorkAndAssemble:
+    def test_work_drains_queue_and_assemble_keeps_spec_order(self, queue):
+        _enqueue(queue, order=[2, 1, 0])
+        completed = []
+
+        def fake_complete(messages, model, stream, max_tokens):
+            return f"doc for {messages[0]['content']}", 100, 20, True
+
+        with patch.object(generator_module, "_complete", side_effect=fake_complete):
+            done = work(queue, "w", concurrency=2, on_done=lambda job, ok: completed.append(ok))
+        result, overview = assemble(queue)
+
+        assert done == 4 and all(completed)
+        assert overview == "doc for overview prompt"
+        assert [d.endpoint_ref for d in result.docs] == [f"GET /items/{n}" for n in range(3)]
+        assert result.docs[0].markdown == "doc for prompt 0"
+        assert result.total_tokens == 480
+        assert result.model_usage[MODEL].docs == 3
+        assert (result.api_title, result.api_version) == ("T", "2")
+
+    def test_failed_jobs_are_pending(self, queue):
+        _enqueue(queue, count=2)
+
+        def fake_complete(messages, model, stream, max_tokens):
+            if messages[0]["content"] == "prompt 1":
+                raise ValueError("bad")
+            return "doc", 1, 1, True
+
+        with patch.object(generator_module, "_complete", side_effect=fake_complete):
+            work(queue, "w", max_attempts=2)
+        result, _ = assemble(queue)
+
+        assert [d.endpoint_ref for d in result.docs] == ["GET /items/0"]
+        assert result.pending == ["GET /items/1"]
+
+    def test_assemble_rejects_an_empty_queue(self, queue):
+        with pytest.raises(ValueError, match="holds no run"):
+            assemble(queue)
+
+    def test_assemble_rejects_unfinished_jobs(self, queue):
+        _enqueue(queue)
+        with pytest.raises(ValueError, match="4 unfinished"):
+            assemble(queue)
+
+    def test_authentication_error_stops_the_worker(self, queue):
+        _enqueue(queue, count=1)
+        with patch.object(generator_module, "_complete", side_effect=RuntimeError("bad key")):
+            with pytest.raises(RuntimeError):
+                work(queue, "w")
+        assert queue.counts()["queued"] == 2
+
+
+# ---------------------------------------------------------------------------
+# Several worker processes
+# ---------------------------------------------------------------------------
+
+class TestProcesses:
+    def _main(self, *args):
+        with patch.object(sys, "argv", ["main", str(FIXTURE), "-y", *args]):
+            with patch("builtins.print"):
+                try:
+                    main()
+                except SystemExit as exc:
+                    assert exc.code == 0
+
+    def _worker(self, *args):
+        env = dict(os.environ, ANTHROPIC_API_KEY="test-key")
+        return subprocess.Popen(
+            [sys.executable, "-m", "src.main", str(FIXTURE), "-y", *args],
+            cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+        )
+
+    def test_enqueue_work_finalize_across_processes(self, tmp_path):
+        queue_path = str(tmp_path / "queue.db")
+        output = str(tmp_path / "docs.md")
+        common = ["--queue", queue_path, "-o", output]
+        self._main(*common, "--enqueue")
+
+        with FakeAPIServer(FakeAPIConfig(output_tokens=50)) as server:
+            workers = [
+                self._worker(
+                    *common, "--work", "--base-url", server.base_url, "--worker-id", f"w{n}"
+                )
+                for n in range(3)
+            ]
+            logs = [w.communicate(timeout=60)[0] for w in workers]
+            requests = server.stats["status_200"]
+
+        assert all(w.returncode == 0 for w in workers), logs
+        assert requests == 7
+        done = [line for log in logs for line in log.splitlines() if "Done:" in line]
+        assert len(done) == 7
+        self._main(*common, "--finalize")
+        text = Path(output).read_text(encoding="utf-8")
+        assert "### GET /api/v1/members/{memberId}" in text
+        assert "pending" not in text.lower()
+
+    def test_enqueue_does_not_prompt(self, tmp_path):
+        queue_path = tmp_path / "queue.db"
+        argv = ["main", str(FIXTURE), "--queue", str(queue_path), "--enqueue"]
+        with patch.object(sys, "argv", argv), patch("builtins.print"):
+            with patch("builtins.input", side_effect=AssertionError("prompted")):
+                with pytest.raises(SystemExit) as exc_info:
+                    main()
+
+        assert exc_info.value.code == 0
+        assert WorkQueue(str(queue_path)).meta()["input_hash"]
+
+    def test_finalize_rejects_a_changed_spec(self, tmp_path, capsys):
+        queue_path = str(tmp_path / "queue.db")
+        output = tmp_path / "docs.md"
+        self._main("--queue", queue_path, "-o", str(output), "--enqueue")
+
+        argv = [
+            "main", str(FIXTURE), "-y", "--queue", queue_path, "-o", str(output), "--finalize",
+            "--model", "claude-haiku-4-5-20251001",
+        ]
+        with patch.object(sys, "argv", argv):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+
+        assert exc_info.value.code == 1
+        assert "different inputs" in capsys.readouterr().err
+        assert not output.exists()